@@ -2,20 +2,86 @@ from flask import Flask # comentario
 from config import Config
 from models import db
 from routes.routes import main # otro comentario
+from services import (
+    worker_service, reporting_service, archive_service, cache_service, assets_service,
+    server_service, stock_service, ratelimit_service, idempotency_service,
+    singleflight_service, profiling_service, catalog_service, sharding_service,
+    database_service, email_filter_service, export_service, dashboard_service,
+    schema_service
+)
 
-def create_app():
+def create_app(**config):
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.update(config)
+    
+    # Pool de una conexión por hilo si la base es un archivo SQLite
+    database_service.configure(app)
     
     # Inicializar base de datos
     db.init_app(app)
     
+    # PRAGMAs del perfil de SQLite y comandos `flask sqlite pragmas|bench`
+    database_service.init_app(app)
+    
+    # Shards de pedidos (si PEDIDOS_SHARDS no está vacío)
+    sharding_service.init_app(app)
+    
+    # Caché de fragmentos HTML y de bytecode de Jinja
+    cache_service.init_app(app)
+    
+    # Instantánea del catálogo mapeada en memoria
+    catalog_service.init_app(app)
+    
+    # Lecturas simultáneas iguales comparten un solo cálculo
+    singleflight_service.init_app(app)
+    
+    # Estadísticas del dashboard en paralelo con presupuesto de tiempo
+    dashboard_service.init_app(app)
+    
+    # Perfilado de peticiones con cabecera firmada o por muestreo
+    profiling_service.init_app(app)
+    
+    # Estáticos con huella de contenido y variantes precomprimidas
+    assets_service.init_app(app)
+    
+    # Token buckets por cliente y globales para las escrituras (429 + Retry-After)
+    ratelimit_service.init_app(app)
+    
     # Registrar blueprints
     app.register_blueprint(main)
     
+    # Comando `flask worker` para el procesamiento en segundo plano
+    worker_service.init_app(app)
+    
+    # Comandos `flask reportes rebuild|refresh`
+    reporting_service.init_app(app)
+    
+    # Comandos `flask archivo run|particiones`
+    archive_service.init_app(app)
+    
+    # Comandos `flask stock expirar|conciliar`
+    stock_service.init_app(app)
+    
+    # Comando `flask exportar pedidos`
+    export_service.init_app(app)
+    
+    # Comando `flask idempotencia purgar`
+    idempotency_service.init_app(app)
+    
+    # Comandos `flask serve` (servidor multiproceso) y `flask bench`
+    server_service.init_app(app)
+    
+    # Comandos `flask esquema pendientes|actualizar` para tablas ya desplegadas
+    schema_service.init_app(app)
+    
     # Crear tablas
     with app.app_context():
         db.create_all()
+    schema_service.warn_pending(app)
+    
+    # Filtro de Bloom de emails para el alta de usuarios (tras crear las tablas)
+    email_filter_service.init_app(app)
     
     return app
 
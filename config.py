@@ -5,10 +5,116 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'clave-por-defecto'
-    SQLALCHEMY_DATABASE_URI = (
+    # URI completa (p. ej. sqlite:////var/lib/app/app.db); sin ella, MySQL con MYSQL_*
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or (
         f"mysql+pymysql://{os.environ.get('MYSQL_USER')}:"
         f"{os.environ.get('MYSQL_PASSWORD')}@"
         f"{os.environ.get('MYSQL_HOST')}/"
         f"{os.environ.get('MYSQL_DATABASE')}"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Perfil de rendimiento si la base es un archivo SQLite (services/database_service.py)
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -65536))  # negativo = KiB
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+    SQLITE_POOL = os.environ.get('SQLITE_POOL', 'queue')  # queue | thread
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 32))
+    
+    # Control de admisión de escrituras (services/ratelimit_service.py)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # memory | sqlite
+    RATE_LIMIT_STORE_PATH = os.environ.get('RATE_LIMIT_STORE_PATH')
+    RATE_LIMIT_CLIENT_HEADER = os.environ.get('RATE_LIMIT_CLIENT_HEADER')
+    RATE_LIMIT_CLIENT_RATE = float(os.environ.get('RATE_LIMIT_CLIENT_RATE', 5))
+    RATE_LIMIT_CLIENT_BURST = int(os.environ.get('RATE_LIMIT_CLIENT_BURST', 20))
+    RATE_LIMIT_GLOBAL_RATE = float(os.environ.get('RATE_LIMIT_GLOBAL_RATE', 50))
+    RATE_LIMIT_GLOBAL_BURST = int(os.environ.get('RATE_LIMIT_GLOBAL_BURST', 100))
+    
+    # Claves Idempotency-Key en la creación de pedidos (services/idempotency_service.py)
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 86400))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+    IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+    
+    # Filtro de Bloom de emails en el alta de usuarios (services/email_filter_service.py)
+    EMAIL_FILTER_ENABLED = os.environ.get('EMAIL_FILTER_ENABLED', '1') == '1'
+    EMAIL_FILTER_FP_RATE = float(os.environ.get('EMAIL_FILTER_FP_RATE', 0.01))
+    EMAIL_FILTER_MIN_CAPACITY = int(os.environ.get('EMAIL_FILTER_MIN_CAPACITY', 10000))
+    
+    # Carga anticipada de relaciones del ORM: selectin | joined (models/base_model.py)
+    ORM_EAGER_LOADING = os.environ.get('ORM_EAGER_LOADING', 'selectin')
+    
+    # Shards de pedidos por usuario_id (services/sharding_service.py); vacío = sin shards
+    PEDIDOS_SHARDS = [uri.strip() for uri in os.environ.get('PEDIDOS_SHARDS', '').split(',')
+                      if uri.strip()]
+    
+    # Reintentos de escrituras ante deadlocks y conexiones perdidas (models/base_model.py)
+    WRITE_RETRY_ATTEMPTS = int(os.environ.get('WRITE_RETRY_ATTEMPTS', 3))
+    WRITE_RETRY_BACKOFF = float(os.environ.get('WRITE_RETRY_BACKOFF', 0.05))
+    
+    # Procesamiento de pedidos en segundo plano (services/worker_service.py)
+    ASYNC_ORDER_PROCESSING = os.environ.get('ASYNC_ORDER_PROCESSING', '1') == '1'
+    WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', 4))
+    WORKER_POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', 1.0))
+    WORKER_LEASE_SECONDS = int(os.environ.get('WORKER_LEASE_SECONDS', 60))
+    # Webhook que recibe cada pedido creado; vacío = sin notificaciones
+    ORDER_WEBHOOK_URL = os.environ.get('ORDER_WEBHOOK_URL')
+    ORDER_WEBHOOK_TIMEOUT = float(os.environ.get('ORDER_WEBHOOK_TIMEOUT', 5))
+    
+    # Feed de cambios de pedidos /api/pedidos/changes (models/evento_pedido_model.py)
+    OUTBOX_GAP_GRACE_SECONDS = float(os.environ.get('OUTBOX_GAP_GRACE_SECONDS', 10))
+    OUTBOX_STREAM_MAX_SECONDS = int(os.environ.get('OUTBOX_STREAM_MAX_SECONDS', 300))
+    
+    # Duración de las reservas de stock en segundos (models/reserva_stock_model.py)
+    STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', 900))
+    
+    # Reportes de ventas (services/reporting_service.py)
+    REPORTS_REFRESH_ON_READ = os.environ.get('REPORTS_REFRESH_ON_READ', '1') == '1'
+    REPORTS_MAX_BATCHES = int(os.environ.get('REPORTS_MAX_BATCHES', 10))
+    
+    # Archivado de pedidos cerrados (services/archive_service.py)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_PAUSE_SECONDS = float(os.environ.get('ARCHIVE_PAUSE_SECONDS', 0.1))
+    
+    # Exportación masiva de pedidos por meses (services/export_service.py)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+    
+    # Caché de fragmentos y de plantillas (services/cache_service.py)
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', '1') == '1'
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 60))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 256))
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    
+    # Coalescencia de lecturas simultáneas (services/singleflight_service.py)
+    SINGLEFLIGHT_ENABLED = os.environ.get('SINGLEFLIGHT_ENABLED', '1') == '1'
+    SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_TIMEOUT', 5))
+    SINGLEFLIGHT_SHARED = os.environ.get('SINGLEFLIGHT_SHARED', '0') == '1'
+    SINGLEFLIGHT_DIR = os.environ.get('SINGLEFLIGHT_DIR')
+    
+    # Estadísticas del dashboard en paralelo (services/dashboard_service.py)
+    DASHBOARD_PARALLEL = os.environ.get('DASHBOARD_PARALLEL', '1') == '1'
+    DASHBOARD_BUDGET_MS = int(os.environ.get('DASHBOARD_BUDGET_MS', 500))
+    DASHBOARD_WORKERS = int(os.environ.get('DASHBOARD_WORKERS', 3))
+    
+    # Perfilado de peticiones bajo demanda (services/profiling_service.py)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+    PROFILING_SECRET = os.environ.get('PROFILING_SECRET')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_DIR = os.environ.get('PROFILING_DIR')
+    
+    # Instantánea del catálogo compartida entre procesos (services/catalog_service.py)
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', '1') == '1'
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH')
+    
+    # Estáticos con huella de contenido (services/assets_service.py)
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', '1') == '1'
+    
+    # Servidor multiproceso `flask serve` (services/server_service.py)
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 2))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 1))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 0))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 0))
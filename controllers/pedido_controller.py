@@ -1,7 +1,12 @@
-from flask import request, flash, redirect, url_for, render_template
+from flask import request, flash, redirect, url_for, render_template, jsonify, Response, stream_with_context, current_app
+import json
+import time
+from models import db
 from models.pedido_model import Pedido
 from models.usuario_model import Usuario
-from models.producto_model import Producto
+from models.evento_pedido_model import EventoPedido
+from services import idempotency_service
+from services.catalog_service import catalog_snapshot
 
 class PedidoController:
     """Controller para manejar la lógica de pedidos"""
@@ -10,9 +15,11 @@ class PedidoController:
     def index():
         """Mostrar lista de pedidos"""
         try:
-            pedidos = Pedido.get_orders_with_details()
+            include_archived = request.args.get('archivados') == '1'
+            pedidos = Pedido.get_orders_with_details(include_archived=include_archived)
             usuarios = Usuario.get_all()
-            productos = Producto.get_available_products()
+            # El selector de productos se sirve desde la instantánea compartida
+            productos = catalog_snapshot.available()
             
             return render_template('pedidos.html', 
                                  pedidos=pedidos, 
@@ -33,18 +40,28 @@ class PedidoController:
             usuario_id = request.form.get('usuario_id')
             producto_id = request.form.get('producto_id')
             cantidad = request.form.get('cantidad')
+            reserva_id = request.form.get('reserva_id')
             
             # Validar datos básicos
             try:
                 usuario_id = int(usuario_id) if usuario_id else None
                 producto_id = int(producto_id) if producto_id else None
                 cantidad = int(cantidad) if cantidad else None
+                reserva_id = int(reserva_id) if reserva_id else None
             except ValueError:
                 flash('Datos inválidos en el formulario', 'error')
                 return redirect(url_for('main.pedidos'))
             
+            # Con Idempotency-Key los reintentos del cliente no duplican el pedido
+            clave = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+            if clave:
+                return PedidoController._create_idempotent(
+                    clave, usuario_id, producto_id, cantidad, reserva_id
+                )
+            
             # Crear pedido usando el modelo
-            pedido, mensaje = Pedido.create_order(usuario_id, producto_id, cantidad)
+            pedido, mensaje = Pedido.create_order(usuario_id, producto_id, cantidad,
+                                                  reserva_id=reserva_id)
             
             if pedido:
                 flash(mensaje, 'success')
@@ -56,24 +73,117 @@ class PedidoController:
         # Si es GET, mostrar el formulario
         return PedidoController.index()
     
+    @staticmethod
+    def _create_idempotent(clave, usuario_id, producto_id, cantidad, reserva_id):
+        """Crear el pedido una sola vez por Idempotency-Key"""
+        if len(clave) > idempotency_service.LONGITUD_MAXIMA:
+            return jsonify({'error': 'Idempotency-Key demasiado larga'}), 400
+        
+        def ejecutar(registro):
+            pedido, mensaje = Pedido.create_order(usuario_id, producto_id, cantidad,
+                                                  reserva_id=reserva_id,
+                                                  clave_idempotencia=registro)
+            return {'exito': pedido is not None,
+                    'pedido_id': pedido.id if pedido else None,
+                    'mensaje': mensaje}
+        
+        datos = {'usuario_id': usuario_id, 'producto_id': producto_id,
+                 'cantidad': cantidad, 'reserva_id': reserva_id}
+        resultado, situacion = idempotency_service.run_once(clave, 'pedidos.crear', datos, ejecutar)
+        
+        if situacion == 'conflicto':
+            return jsonify({'error': 'La Idempotency-Key ya se usó con otros datos'}), 422
+        if situacion == 'en_proceso':
+            respuesta = jsonify({'error': 'Hay una petición con la misma Idempotency-Key en curso'})
+            respuesta.status_code = 409
+            respuesta.headers['Retry-After'] = '1'
+            return respuesta
+        
+        flash(resultado['mensaje'], 'success' if resultado['exito'] else 'error')
+        respuesta = redirect(url_for('main.pedidos'))
+        if resultado.get('pedido_id'):
+            respuesta.headers['X-Pedido-Id'] = str(resultado['pedido_id'])
+        if situacion == 'repetida':
+            respuesta.headers['Idempotent-Replayed'] = 'true'
+        return respuesta
+    
+    @staticmethod
+    def _history_args():
+        """Página y tamaño de página de la petición"""
+        pagina = request.args.get('pagina', 1, type=int)
+        por_pagina = request.args.get('por_pagina', 20, type=int)
+        return max(pagina, 1), min(max(por_pagina, 1), 100)
+    
     @staticmethod
     def get_by_user():
-        """Obtener pedidos de un usuario específico"""
+        """Historial paginado de pedidos de un usuario
+        
+        Con `archivados=1` también se muestran, aparte, sus pedidos archivados.
+        """
         usuario_id = request.args.get('usuario_id')
         if usuario_id:
             try:
                 usuario_id = int(usuario_id)
-                pedidos = Pedido.get_by_user(usuario_id)
-                usuario = Usuario.get_by_id(usuario_id)
-                
-                return render_template('pedidos_usuario.html', 
-                                     pedidos=pedidos, 
-                                     usuario=usuario)
             except ValueError:
                 flash('ID de usuario inválido', 'error')
+                return redirect(url_for('main.pedidos'))
+            
+            pagina, por_pagina = PedidoController._history_args()
+            usuario, paginacion = Pedido.get_user_history(usuario_id, pagina, por_pagina)
+            if usuario is None:
+                flash('Usuario no encontrado', 'error')
+                return redirect(url_for('main.pedidos'))
+            
+            incluir_archivados = request.args.get('archivados') == '1'
+            archivados = Pedido.get_archived_history(usuario_id) if incluir_archivados else None
+            return render_template('pedidos_usuario.html',
+                                 usuario=usuario,
+                                 pedidos=paginacion.items,
+                                 paginacion=paginacion,
+                                 archivados=archivados)
         
         return redirect(url_for('main.pedidos'))
     
+    @staticmethod
+    def _product_summary(producto):
+        """Id, nombre y precio del producto de un pedido; None si el producto ya no existe"""
+        if producto is None:
+            return None
+        return {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'precio': float(producto.precio)
+        }
+    
+    @staticmethod
+    def user_history_api(usuario_id):
+        """Historial paginado de pedidos de un usuario en JSON (con `archivados=1`, también los archivados)"""
+        pagina, por_pagina = PedidoController._history_args()
+        usuario, paginacion = Pedido.get_user_history(usuario_id, pagina, por_pagina)
+        if usuario is None:
+            return jsonify({'error': 'Usuario no encontrado'}), 404
+        
+        pedidos = []
+        for pedido in paginacion.items:
+            datos = pedido.to_dict()
+            datos['producto'] = PedidoController._product_summary(pedido.producto)
+            pedidos.append(datos)
+        respuesta = {
+            'usuario': usuario.to_dict(),
+            'pedidos': pedidos,
+            'pagina': paginacion.page,
+            'por_pagina': paginacion.per_page,
+            'total': paginacion.total,
+            'paginas': paginacion.pages
+        }
+        if request.args.get('archivados') == '1':
+            respuesta['archivados'] = []
+            for pedido, producto in Pedido.get_archived_history(usuario_id):
+                datos = pedido.to_dict()
+                datos['producto'] = PedidoController._product_summary(producto)
+                respuesta['archivados'].append(datos)
+        return jsonify(respuesta)
+    
     @staticmethod
     def update_status():
         """Actualizar estado de un pedido"""
@@ -98,6 +208,67 @@ class PedidoController:
         
         return redirect(url_for('main.pedidos'))
     
+    @staticmethod
+    def _get_bulk_ids(datos):
+        """Leer la lista de pedido_ids de un JSON o formulario (lanza ValueError)"""
+        if hasattr(datos, 'getlist'):
+            pedido_ids = datos.getlist('pedido_ids')
+            if len(pedido_ids) == 1:
+                pedido_ids = pedido_ids[0]
+        else:
+            pedido_ids = datos.get('pedido_ids') or []
+        if isinstance(pedido_ids, str):
+            pedido_ids = [p for p in pedido_ids.split(',') if p.strip()]
+        
+        try:
+            return [int(p) for p in pedido_ids]
+        except TypeError:
+            raise ValueError('IDs de pedido inválidos')
+    
+    @staticmethod
+    def _bulk_response(resultados, mensaje):
+        """Respuesta JSON común para las operaciones masivas"""
+        if resultados is None:
+            return jsonify({'error': mensaje}), 400
+        
+        return jsonify({
+            'mensaje': mensaje,
+            'actualizados': sum(1 for r in resultados.values() if r['exito']),
+            'resultados': {str(k): v for k, v in resultados.items()}
+        })
+    
+    @staticmethod
+    def bulk_update_status():
+        """Actualizar el estado de muchos pedidos en una sola operación"""
+        datos = request.get_json(silent=True) or request.form
+        nuevo_estado = datos.get('estado')
+        estado_actual = datos.get('estado_actual') or None
+        
+        try:
+            pedido_ids = PedidoController._get_bulk_ids(datos)
+        except ValueError:
+            return jsonify({'error': 'IDs de pedido inválidos'}), 400
+        
+        resultados, mensaje = Pedido.bulk_update_status(
+            nuevo_estado, pedido_ids=pedido_ids, estado_actual=estado_actual
+        )
+        return PedidoController._bulk_response(resultados, mensaje)
+    
+    @staticmethod
+    def bulk_cancel():
+        """Cancelar muchos pedidos (por ids o por producto) restaurando stock"""
+        datos = request.get_json(silent=True) or request.form
+        
+        try:
+            pedido_ids = PedidoController._get_bulk_ids(datos)
+            producto_id = datos.get('producto_id')
+            producto_id = int(producto_id) if producto_id not in (None, '') else None
+        except (ValueError, TypeError):
+            return jsonify({'error': 'IDs inválidos'}), 400
+        
+        resultados, mensaje = Pedido.bulk_cancel(pedido_ids=pedido_ids, producto_id=producto_id)
+        return PedidoController._bulk_response(resultados, mensaje)
+    
     @staticmethod
     def cancel():
         """Cancelar un pedido"""
@@ -121,13 +292,75 @@ class PedidoController:
         
         return redirect(url_for('main.pedidos'))
     
+    @staticmethod
+    def changes():
+        """Feed de cambios de pedidos a partir de un cursor
+        
+        Con ?wait=N se hace long-polling hasta N segundos (máx. 30) si no hay
+        eventos nuevos. Con Accept: text/event-stream se abre un stream SSE que
+        continúa desde ?since o desde la cabecera Last-Event-ID.
+        """
+        try:
+            since = int(request.args.get('since') or request.headers.get('Last-Event-ID') or 0)
+            # Un límite <= 0 llegaría al LIMIT (en SQLite, -1 es sin límite)
+            limite = max(1, min(int(request.args.get('limit', 100)), 1000))
+            espera = max(0.0, min(float(request.args.get('wait', 0)), 30))
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos'}), 400
+        
+        if request.accept_mimetypes.best == 'text/event-stream':
+            return Response(
+                stream_with_context(PedidoController._stream_changes(since, limite)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        limite_espera = time.monotonic() + espera
+        eventos = EventoPedido.get_since(since, limite)
+        while not eventos and time.monotonic() < limite_espera:
+            time.sleep(0.5)
+            db.session.rollback()  # ver filas confirmadas por otros procesos
+            eventos = EventoPedido.get_since(since, limite)
+        
+        cursor = eventos[-1].id if eventos else since
+        return jsonify({
+            'eventos': [evento.to_dict() for evento in eventos],
+            'cursor': cursor
+        })
+    
+    @staticmethod
+    def _stream_changes(since, limite, intervalo=1.0, heartbeat=15, duracion=None):
+        """Generador SSE: emite eventos nuevos y un comentario de heartbeat
+        
+        El stream se cierra tras `duracion` segundos (OUTBOX_STREAM_MAX_SECONDS)
+        para no ocupar un hilo indefinidamente; el cliente SSE se reconecta
+        solo y continúa desde Last-Event-ID.
+        """
+        if duracion is None:
+            duracion = current_app.config.get('OUTBOX_STREAM_MAX_SECONDS', 300)
+        cursor = since
+        fin = time.monotonic() + duracion
+        ultimo_envio = time.monotonic()
+        while time.monotonic() < fin:
+            db.session.rollback()
+            eventos = EventoPedido.get_since(cursor, limite)
+            for evento in eventos:
+                cursor = evento.id
+                yield f"id: {evento.id}\nevent: {evento.tipo}\ndata: {json.dumps(evento.to_dict())}\n\n"
+            if eventos:
+                ultimo_envio = time.monotonic()
+                continue
+            if time.monotonic() - ultimo_envio >= heartbeat:
+                ultimo_envio = time.monotonic()
+                yield ": heartbeat\n\n"
+            time.sleep(min(intervalo, max(0, fin - time.monotonic())))
+    
     @staticmethod
     def get_stats():
         """Obtener estadísticas de pedidos"""
-        pedidos = Pedido.get_all()
         return {
-            'total_pedidos': len(pedidos),
-            'pedidos_pendientes': len(Pedido.get_by_status('pendiente')),
-            'pedidos_entregados': len(Pedido.get_by_status('entregado')),
-            'revenue_total': sum([float(p.precio_total) for p in pedidos])
+            'total_pedidos': Pedido.count_by_status(include_archived=True),
+            'pedidos_pendientes': Pedido.count_by_status('pendiente'),
+            'pedidos_entregados': Pedido.count_by_status('entregado', include_archived=True),
+            'revenue_total': float(Pedido.total_revenue(include_archived=True))
         }
\ No newline at end of file
@@ -1,15 +1,33 @@
 from flask import request, flash, redirect, url_for, render_template
+from markupsafe import Markup
 from models.producto_model import Producto
+from services.cache_service import fragment_cache
+from services.catalog_service import catalog_snapshot
 
 class ProductoController:
     """Controller para manejar la lógica de productos"""
     
+    @staticmethod
+    def _tabla(nombre, params, consulta):
+        """Tabla de productos renderizada, servida desde la caché de fragmentos
+        
+        Devuelve un diccionario con el HTML y el número de productos; en un
+        acierto de caché no se consulta la base de datos.
+        """
+        def render():
+            productos = consulta()
+            return {
+                'html': Markup(render_template('_productos_tabla.html', productos=productos)),
+                'total': len(productos)
+            }
+        return fragment_cache.get_or_render(nombre, ['productos'], params, render)
+    
     @staticmethod
     def index():
         """Mostrar lista de productos"""
         try:
-            productos = Producto.get_all()
-            return render_template('productos.html', productos=productos)
+            tabla = ProductoController._tabla('productos.index', {}, Producto.get_all)
+            return render_template('productos.html', tabla_productos=tabla['html'])
         except Exception as e:
             flash(f'Error al cargar productos: {str(e)}', 'error')
             return render_template('productos.html', productos=[])
@@ -57,28 +75,33 @@ class ProductoController:
         """Buscar productos por nombre"""
         query = request.args.get('q', '').strip()
         if query:
-            productos = Producto.search_by_name(query)
-            flash(f'Se encontraron {len(productos)} producto(s)', 'info')
+            tabla = ProductoController._tabla(
+                'productos.search', {'q': query}, lambda: Producto.search_by_name(query)
+            )
+            flash(f'Se encontraron {tabla["total"]} producto(s)', 'info')
         else:
-            productos = Producto.get_all()
+            tabla = ProductoController._tabla('productos.index', {}, Producto.get_all)
         
-        return render_template('productos.html', productos=productos, search_query=query)
+        return render_template('productos.html', tabla_productos=tabla['html'], search_query=query)
     
     @staticmethod
     def get_available():
-        """Obtener productos disponibles para pedidos"""
-        return Producto.get_available_products()
+        """Obtener productos disponibles para pedidos (desde la instantánea del catálogo)"""
+        return catalog_snapshot.available()
     
     @staticmethod
     def get_by_category():
         """Obtener productos por categoría"""
         categoria = request.args.get('categoria', '')
         if categoria:
-            productos = Producto.get_by_category(categoria)
+            tabla = ProductoController._tabla(
+                'productos.categoria', {'categoria': categoria},
+                lambda: Producto.get_by_category(categoria)
+            )
         else:
-            productos = Producto.get_all()
+            tabla = ProductoController._tabla('productos.index', {}, Producto.get_all)
         
-        return render_template('productos.html', productos=productos, categoria_filtro=categoria)
+        return render_template('productos.html', tabla_productos=tabla['html'], categoria_filtro=categoria)
     
     @staticmethod
     def get_stats():
@@ -0,0 +1,41 @@
+from flask import request, jsonify, current_app
+from datetime import date
+from services import reporting_service
+
+class ReporteController:
+    """Controller para los reportes de ventas"""
+    
+    @staticmethod
+    def _refresh():
+        """Acumular eventos pendientes antes de leer, si está habilitado"""
+        if current_app.config.get('REPORTS_REFRESH_ON_READ', True):
+            reporting_service.refresh_rollups(max_lotes=current_app.config.get('REPORTS_MAX_BATCHES', 10))
+    
+    @staticmethod
+    def ventas():
+        """Reporte de ventas por día, semana, producto o categoría"""
+        agrupacion = request.args.get('agrupacion', 'dia')
+        try:
+            desde = request.args.get('desde')
+            hasta = request.args.get('hasta')
+            desde = date.fromisoformat(desde) if desde else None
+            hasta = date.fromisoformat(hasta) if hasta else None
+            
+            ReporteController._refresh()
+            filas = reporting_service.sales_report(agrupacion, desde, hasta)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'agrupacion': agrupacion,
+            'desde': desde.isoformat() if desde else None,
+            'hasta': hasta.isoformat() if hasta else None,
+            'filas': filas,
+            'total_ingresos': round(sum(f['ingresos'] for f in filas), 2)
+        })
+    
+    @staticmethod
+    def estados():
+        """Reporte de pedidos por estado"""
+        ReporteController._refresh()
+        return jsonify(reporting_service.status_report())
@@ -0,0 +1,82 @@
+from flask import request, jsonify
+from models.producto_model import Producto
+from models.movimiento_stock_model import MovimientoStock
+from models.reserva_stock_model import ReservaStock
+
+class StockController:
+    """Controller para reservas y movimientos de stock"""
+    
+    @staticmethod
+    def reserve():
+        """Reservar stock de un producto durante el checkout"""
+        datos = request.get_json(silent=True) or request.form
+        try:
+            producto_id = int(datos.get('producto_id'))
+            usuario_id = datos.get('usuario_id')
+            usuario_id = int(usuario_id) if usuario_id not in (None, '') else None
+            ttl = datos.get('ttl')
+            ttl = int(ttl) if ttl not in (None, '') else None
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Datos de reserva inválidos'}), 400
+        
+        reserva, mensaje = ReservaStock.reserve(producto_id, datos.get('cantidad'),
+                                                usuario_id=usuario_id, ttl=ttl)
+        if not reserva:
+            return jsonify({'error': mensaje}), 409 if mensaje == "Stock insuficiente" else 400
+        return jsonify({'mensaje': mensaje, 'reserva': reserva.to_dict()}), 201
+    
+    @staticmethod
+    def release(reserva_id):
+        """Liberar una reserva activa"""
+        reserva = ReservaStock.get_by_id(reserva_id)
+        if not reserva:
+            return jsonify({'error': 'Reserva no encontrada'}), 404
+        
+        success, mensaje = reserva.release()
+        if not success:
+            return jsonify({'error': mensaje}), 409
+        return jsonify({'mensaje': mensaje, 'reserva': reserva.to_dict()})
+    
+    @staticmethod
+    def bulk_adjust():
+        """Ajuste masivo de stock tras un recuento (CSV, JSON por líneas o lista JSON)"""
+        from services.stock_service import read_adjustments
+        
+        tipo = request.mimetype
+        try:
+            if tipo == 'application/json':
+                datos = request.get_json(silent=True)
+                if not isinstance(datos, list):
+                    return jsonify({'error': 'Se esperaba una lista de ajustes'}), 400
+                filas = ((d.get('producto_id'), d.get('stock'), d.get('delta'))
+                         if isinstance(d, dict) else (None, None, None) for d in datos)
+            else:
+                # El cuerpo se lee por líneas mientras se aplican los lotes
+                lineas = (linea.decode('utf-8') for linea in request.stream)
+                formato = 'ndjson' if tipo == 'application/x-ndjson' else 'csv'
+                filas = read_adjustments(lineas, formato)
+            
+            resumen, mensaje = MovimientoStock.apply_bulk(filas, motivo=request.args.get('motivo'))
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({'error': str(e)}), 400
+        if resumen is None:
+            return jsonify({'error': mensaje}), 500
+        return jsonify({'mensaje': mensaje, 'resumen': resumen})
+    
+    @staticmethod
+    def movements(producto_id):
+        """Últimos movimientos de stock de un producto y su saldo"""
+        producto = Producto.get_by_id(producto_id)
+        if not producto:
+            return jsonify({'error': 'Producto no encontrado'}), 404
+        
+        try:
+            limite = max(1, min(int(request.args.get('limite', 100)), 1000))
+        except ValueError:
+            return jsonify({'error': 'Límite inválido'}), 400
+        
+        return jsonify({
+            'producto_id': producto.id,
+            'stock': producto.stock,
+            'movimientos': [m.to_dict() for m in MovimientoStock.get_by_product(producto.id, limite)]
+        })
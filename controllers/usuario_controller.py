@@ -1,15 +1,28 @@
 from flask import request, flash, redirect, url_for, render_template
+from markupsafe import Markup
 from models.usuario_model import Usuario
+from services.cache_service import fragment_cache
 
 class UsuarioController:
     """Controller para manejar la lógica de usuarios"""
     
+    @staticmethod
+    def _tabla(nombre, params, consulta):
+        """Tabla de usuarios renderizada, servida desde la caché de fragmentos"""
+        def render():
+            usuarios = consulta()
+            return {
+                'html': Markup(render_template('_usuarios_tabla.html', usuarios=usuarios)),
+                'total': len(usuarios)
+            }
+        return fragment_cache.get_or_render(nombre, ['usuarios'], params, render)
+    
     @staticmethod
     def index():
         """Mostrar lista de usuarios"""
         try:
-            usuarios = Usuario.get_all()
-            return render_template('usuarios.html', usuarios=usuarios)
+            tabla = UsuarioController._tabla('usuarios.index', {}, Usuario.get_all)
+            return render_template('usuarios.html', tabla_usuarios=tabla['html'])
         except Exception as e:
             flash(f'Error al cargar usuarios: {str(e)}', 'error')
             return render_template('usuarios.html', usuarios=[])
@@ -41,12 +54,14 @@ class UsuarioController:
         """Buscar usuarios por nombre"""
         query = request.args.get('q', '').strip()
         if query:
-            usuarios = Usuario.search_by_name(query)
-            flash(f'Se encontraron {len(usuarios)} usuario(s)', 'info')
+            tabla = UsuarioController._tabla(
+                'usuarios.search', {'q': query}, lambda: Usuario.search_by_name(query)
+            )
+            flash(f'Se encontraron {tabla["total"]} usuario(s)', 'info')
         else:
-            usuarios = Usuario.get_all()
+            tabla = UsuarioController._tabla('usuarios.index', {}, Usuario.get_all)
         
-        return render_template('usuarios.html', usuarios=usuarios, search_query=query)
+        return render_template('usuarios.html', tabla_usuarios=tabla['html'], search_query=query)
     
     @staticmethod
     def get_stats():
@@ -1,9 +1,141 @@
+from flask import current_app, has_app_context
 from models import db
 from datetime import datetime
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError, DBAPIError, OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+import random
+import threading
+import time
+
+# Códigos de error de MySQL que se resuelven reintentando la transacción:
+# 1205 lock wait timeout, 1213 deadlock, 2006 server has gone away, 2013 lost connection
+CODIGOS_TRANSITORIOS = {1205, 1213, 2006, 2013}
+
+MENSAJE_CONFLICTO = "El registro fue modificado por otra operación. Recárguelo e intente de nuevo"
+
+# Estrategias de carga anticipada de relaciones (ver BaseModel.eager)
+ESTRATEGIAS_CARGA = {'selectin': selectinload, 'joined': joinedload}
+
+# Contadores de escrituras (ver get_write_stats)
+_write_stats = {'conflictos': 0, 'reintentos': 0, 'reintentos_agotados': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(contador):
+    with _stats_lock:
+        _write_stats[contador] += 1
+
+
+def get_write_stats():
+    """Conflictos de versión y reintentos por errores transitorios desde el arranque"""
+    with _stats_lock:
+        return dict(_write_stats)
+
+
+def is_transient_error(error):
+    """Indicar si un error de base de datos desaparece al reintentar"""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    if isinstance(error, OperationalError):
+        args = getattr(error.orig, 'args', ())
+        if args and args[0] in CODIGOS_TRANSITORIOS:
+            return True
+        # SQLite: otra conexión tiene la base bloqueada
+        return 'database is locked' in str(error.orig)
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flushed(session, flush_context):
+    # La transacción ya contiene escrituras que un reintento no repetiría
+    session.info['escrituras_previas'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_statement_writes(orm_execute_state):
+    # UPDATE/DELETE/INSERT ejecutados con session.execute() no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['escrituras_previas'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _clear_flushed(session):
+    session.info.pop('escrituras_previas', None)
+
+
+def _has_writes(session):
+    """Indicar si la sesión tiene escrituras ejecutadas o pendientes de flush"""
+    return bool(session.info.get('escrituras_previas') or session.new
+                or session.dirty or session.deleted)
+
+
+def run_in_transaction(unidad, error='guardar'):
+    """Ejecutar una unidad de trabajo y hacer commit, repitiéndola ante errores transitorios
+    
+    `unidad` hace todas las escrituras de la operación sin commit y devuelve
+    (exito, resultado). Si exito es False se hace rollback y se devuelve tal
+    cual. Tras un deadlock, lock wait timeout o conexión perdida se hace
+    rollback y se vuelve a llamar a `unidad` desde el principio, así que debe
+    leer de nuevo lo que necesite. Solo se reintenta si la sesión no tenía
+    escrituras anteriores a la unidad: el rollback también las descartaría.
+    """
+    config = current_app.config if has_app_context() else {}
+    max_intentos = max(1, config.get('WRITE_RETRY_ATTEMPTS', 3))
+    espera_base = config.get('WRITE_RETRY_BACKOFF', 0.05)
+    
+    reintentable = not _has_writes(db.session)
+    for intento in range(1, max_intentos + 1):
+        try:
+            exito, resultado = unidad()
+            if not exito:
+                db.session.rollback()
+                return False, resultado
+            db.session.commit()
+            return True, resultado
+        except StaleDataError:
+            db.session.rollback()
+            _count('conflictos')
+            return False, MENSAJE_CONFLICTO
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if not (reintentable and is_transient_error(e)):
+                return False, f"Error al {error}: {str(e)}"
+            if intento == max_intentos:
+                _count('reintentos_agotados')
+                return False, f"Error al {error}: {str(e)}"
+            _count('reintentos')
+            # Backoff exponencial con jitter completo
+            time.sleep(random.uniform(0, espera_base * 2 ** (intento - 1)))
+
 
 class BaseModel:
-    """Clase base para todos los modelos con operaciones CRUD comunes"""
+    """Clase base para todos los modelos con operaciones CRUD comunes
+    
+    save, update y delete reintentan la transacción ante errores transitorios
+    (deadlock, lock wait timeout, conexión perdida) con una espera aleatoria
+    creciente. Los modelos con columna `version` usan bloqueo optimista: si
+    otra operación modificó el registro, la escritura falla con un conflicto
+    en lugar de sobrescribir el cambio.
+    """
+    
+    @classmethod
+    def eager(cls, *relaciones, estrategia=None):
+        """Opciones para cargar `relaciones` junto con la consulta
+        
+        La estrategia es 'selectin' (una consulta IN por relación) o 'joined'
+        (JOIN en la misma consulta); por defecto ORM_EAGER_LOADING. Evita una
+        consulta por fila al recorrer las relaciones.
+        """
+        if estrategia is None and has_app_context():
+            estrategia = current_app.config.get('ORM_EAGER_LOADING')
+        estrategia = estrategia or 'selectin'
+        if estrategia not in ESTRATEGIAS_CARGA:
+            raise ValueError(f"Estrategia de carga inválida: {estrategia}. "
+                             f"Válidas: {sorted(ESTRATEGIAS_CARGA)}")
+        return [ESTRATEGIAS_CARGA[estrategia](relacion) for relacion in relaciones]
     
     @classmethod
     def get_all(cls):
@@ -32,34 +164,31 @@ class BaseModel:
             print(f"Error al contar registros: {e}")
             return 0
     
+    def _write(self, aplicar, accion, error):
+        """Aplicar un cambio y hacer commit, reintentando los errores transitorios
+        
+        Solo se reintenta si la transacción no contenía otras escrituras: tras
+        el rollback se pierden, y repetir únicamente `aplicar` dejaría la
+        operación a medias. Las operaciones con varias escrituras usan
+        run_in_transaction con toda la unidad de trabajo.
+        """
+        def unidad():
+            aplicar()
+            return True, f"Registro {accion} exitosamente"
+        return run_in_transaction(unidad, error)
+    
     def save(self):
         """Guardar el registro actual"""
-        try:
-            db.session.add(self)
-            db.session.commit()
-            return True, "Registro guardado exitosamente"
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            return False, f"Error al guardar: {str(e)}"
+        return self._write(lambda: db.session.add(self), 'guardado', 'guardar')
     
     def delete(self):
         """Eliminar el registro actual"""
-        try:
-            db.session.delete(self)
-            db.session.commit()
-            return True, "Registro eliminado exitosamente"
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            return False, f"Error al eliminar: {str(e)}"
+        return self._write(lambda: db.session.delete(self), 'eliminado', 'eliminar')
     
     def update(self, **kwargs):
         """Actualizar campos del registro"""
-        try:
+        def aplicar():
             for key, value in kwargs.items():
                 if hasattr(self, key):
                     setattr(self, key, value)
-            db.session.commit()
-            return True, "Registro actualizado exitosamente"
-        except SQLAlchemyError as e:
-            db.session.rollback()
-            return False, f"Error al actualizar: {str(e)}"
\ No newline at end of file
+        return self._write(aplicar, 'actualizado', 'actualizar')
@@ -0,0 +1,166 @@
+import hashlib
+import math
+import threading
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class BloomFilter:
+    """Filtro de Bloom: responde "seguro que no está" o "puede que esté"
+
+    Con `capacidad` elementos la probabilidad de falso positivo es `tasa_fp`;
+    por encima de esa cantidad crece. No hay falsos negativos.
+    """
+
+    def __init__(self, capacidad, tasa_fp=0.01):
+        if not 0 < tasa_fp < 1:
+            raise ValueError("La tasa de falsos positivos debe estar entre 0 y 1")
+        self.capacidad = max(1, int(capacidad))
+        self.tasa_fp = tasa_fp
+        self.num_bits = max(8, math.ceil(-self.capacidad * math.log(tasa_fp) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacidad * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.elementos = 0
+
+    def _positions(self, valor):
+        # Doble hashing (Kirsch-Mitzenmacher): k posiciones a partir de dos hashes de 64 bits
+        digest = hashlib.blake2b(valor.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, valor):
+        for posicion in self._positions(valor):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.bits[posicion >> 3] & (1 << (posicion & 7))
+                   for posicion in self._positions(valor))
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def estimated_fp_rate(self):
+        """Probabilidad de falso positivo con los elementos actuales"""
+        return (1 - math.exp(-self.num_hashes * self.elementos / self.num_bits)) ** self.num_hashes
+
+
+class EmailFilter:
+    """Emails registrados, para saltarse la consulta previa en el alta de usuarios
+
+    Si el filtro dice que el email seguro que no está registrado,
+    Usuario.create_user inserta directamente y la restricción UNIQUE decide
+    en caso de carrera. Si puede que esté, se consulta la base como antes.
+    Se construye al arrancar (services/email_filter_service.py) o en la
+    primera consulta, y cada alta o cambio de email lo añade. Los emails
+    borrados siguen en el filtro: solo cuestan una consulta de más.
+
+    Cada proceso tiene su propio filtro; un email dado de alta en otro
+    proceso puede no estar, y entonces lo detecta la restricción UNIQUE.
+    """
+
+    def __init__(self):
+        self.habilitado = False
+        self.tasa_fp = 0.01
+        self.capacidad_minima = 10000
+        self._filtro = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, config):
+        """Leer la configuración de la aplicación y descartar el filtro actual"""
+        self.habilitado = config.get('EMAIL_FILTER_ENABLED', True)
+        self.tasa_fp = config.get('EMAIL_FILTER_FP_RATE', 0.01)
+        self.capacidad_minima = config.get('EMAIL_FILTER_MIN_CAPACITY', 10000)
+        with self._lock:
+            self._filtro = None
+
+    def reset_stats(self):
+        """Reiniciar los contadores"""
+        self._stats = {'consultas': 0, 'ahorradas': 0, 'falsos_positivos': 0,
+                       'conflictos': 0, 'reconstrucciones': 0}
+
+    def _count(self, contador):
+        with self._lock:
+            self._stats[contador] += 1
+
+    def rebuild(self):
+        """Construir el filtro con los emails de la base (requiere contexto de aplicación)
+
+        Se dimensiona para el doble de los usuarios actuales; al superar esa
+        capacidad se reconstruye en la siguiente consulta.
+        """
+        from models import db
+        from models.usuario_model import Usuario
+
+        total = db.session.query(Usuario.id).count()
+        filtro = BloomFilter(max(self.capacidad_minima, total * 2), self.tasa_fp)
+        for (email,) in db.session.query(Usuario.email).yield_per(5000):
+            filtro.add(email.lower())
+        with self._lock:
+            self._filtro = filtro
+            self._stats['reconstrucciones'] += 1
+        return filtro
+
+    def _current(self):
+        filtro = self._filtro
+        if filtro is None or filtro.elementos > filtro.capacidad:
+            try:
+                filtro = self.rebuild()
+            except SQLAlchemyError as e:
+                from models import db
+                db.session.rollback()
+                print(f"No se pudo construir el filtro de emails: {e}")
+                return None
+        return filtro
+
+    def add(self, email):
+        """Añadir un email registrado (no hace nada si aún no hay filtro)"""
+        filtro = self._filtro
+        if filtro is not None and email:
+            with self._lock:
+                filtro.add(email.lower())
+
+    def definitely_new(self, email):
+        """True si el email seguro que no está registrado (se ahorra la consulta)"""
+        if not self.habilitado:
+            return False
+        filtro = self._current()
+        if filtro is None:
+            return False
+        self._count('consultas')
+        if email.lower() in filtro:
+            return False
+        self._count('ahorradas')
+        return True
+
+    def record_false_positive(self):
+        """El filtro dijo "puede que esté" y la consulta no lo encontró"""
+        if self.habilitado and self._filtro is not None:
+            self._count('falsos_positivos')
+
+    def record_conflict(self):
+        """Un email "seguro nuevo" chocó con la restricción UNIQUE (alta en otro proceso)"""
+        self._count('conflictos')
+
+    def stats(self):
+        """Contadores, memoria y ocupación del filtro del proceso actual"""
+        with self._lock:
+            stats = dict(self._stats)
+            filtro = self._filtro
+        stats['habilitado'] = self.habilitado
+        stats['tasa_fp_objetivo'] = self.tasa_fp
+        if filtro is not None:
+            stats.update({
+                'elementos': filtro.elementos,
+                'capacidad': filtro.capacidad,
+                'bits': filtro.num_bits,
+                'hashes': filtro.num_hashes,
+                'memoria_bytes': filtro.memory_bytes,
+                'tasa_fp_estimada': round(filtro.estimated_fp_rate(), 6)
+            })
+        return stats
+
+
+email_filter = EmailFilter()
@@ -0,0 +1,142 @@
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, delete
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import json
+import uuid
+
+class ClaveIdempotencia(BaseModel, db.Model):
+    """Claves Idempotency-Key ya vistas y el resultado de su primera ejecución
+
+    La fila se inserta (estado 'en_proceso') antes de ejecutar la operación;
+    la clave primaria garantiza que solo una petición la ejecuta. El resultado
+    se guarda en la misma transacción que la operación ('completada'), así que
+    nunca queda un pedido creado sin su resultado registrado. Cada reclamación
+    recibe un token nuevo: si otra petición retoma la clave tras el lease, las
+    escrituras de la anterior ya no coinciden con el token y no tienen efecto.
+    """
+    __tablename__ = 'claves_idempotencia'
+
+    ESTADOS_VALIDOS = ['en_proceso', 'completada']
+
+    clave = db.Column(db.String(100), primary_key=True)
+    alcance = db.Column(db.String(50), nullable=False)
+    huella = db.Column(db.String(64), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='en_proceso')
+    resultado = db.Column(db.Text)
+    token = db.Column(db.String(32))
+    expira_en = db.Column(db.DateTime, nullable=False, index=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ClaveIdempotencia {self.clave} {self.estado}>'
+
+    @classmethod
+    def claim(cls, clave, alcance, huella, ttl=86400, lease_segundos=60):
+        """Intentar quedarse con la ejecución de `clave`
+
+        Devuelve (registro, situacion) con situacion:
+            'nueva'       esta petición debe ejecutar la operación
+            'completada'  ya se ejecutó: registro.get_resultado() tiene la respuesta
+            'en_proceso'  otra petición la está ejecutando
+            'conflicto'   la clave se usó con otros datos
+        """
+        ahora = datetime.utcnow()
+        try:
+            # Las claves caducadas se pueden reutilizar
+            db.session.execute(
+                delete(cls).where(cls.clave == clave, cls.expira_en < ahora)
+                .execution_options(synchronize_session=False)
+            )
+            # INSERT directo: la clave primaria decide qué petición gana
+            db.session.execute(insert(cls).values(
+                clave=clave, alcance=alcance, huella=huella, estado='en_proceso',
+                token=uuid.uuid4().hex, expira_en=ahora + timedelta(seconds=ttl),
+                fecha_creacion=ahora
+            ))
+            db.session.commit()
+            return db.session.get(cls, clave, populate_existing=True), 'nueva'
+        except IntegrityError:
+            db.session.rollback()
+
+        registro = db.session.get(cls, clave, populate_existing=True)
+        if registro is None:
+            # Se borró entre el INSERT y la lectura: el cliente puede reintentar
+            return None, 'en_proceso'
+        if registro.huella != huella or registro.alcance != alcance:
+            return registro, 'conflicto'
+        if registro.estado == 'completada':
+            return registro, 'completada'
+
+        # Una ejecución abandonada (proceso caído) se puede retomar tras el lease
+        limite = ahora - timedelta(seconds=lease_segundos)
+        if registro.fecha_creacion < limite:
+            resultado = db.session.execute(
+                update(cls)
+                .where(cls.clave == clave, cls.estado == 'en_proceso',
+                       cls.token == registro.token)
+                .values(fecha_creacion=ahora, token=uuid.uuid4().hex)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if resultado.rowcount == 1:
+                return db.session.get(cls, clave, populate_existing=True), 'nueva'
+        return registro, 'en_proceso'
+
+    def _owned(self):
+        """Condición de la fila que esta reclamación sigue poseyendo"""
+        clase = type(self)
+        return (clase.clave == self.clave, clase.estado == 'en_proceso',
+                clase.token == self.token)
+
+    def record_result(self, resultado):
+        """Marcar la clave como completada con `resultado` (sin commit)
+
+        Se llama dentro de la transacción de la operación para que ambas se
+        confirmen juntas. Si otra petición retomó la clave no se escribe nada y
+        la operación debe deshacerse.
+        """
+        filas = db.session.execute(
+            update(type(self))
+            .where(*self._owned())
+            .values(estado='completada', resultado=json.dumps(resultado))
+            .execution_options(synchronize_session=False)
+        )
+        if filas.rowcount == 0:
+            return False, "La clave de idempotencia ya no pertenece a esta petición (lease vencido)"
+        return True, "Resultado registrado"
+
+    def release(self):
+        """Borrar una clave en proceso cuya operación falló sin efectos, para reintentarla"""
+        try:
+            db.session.execute(
+                delete(type(self)).where(*self._owned())
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Error al liberar clave de idempotencia: {e}")
+
+    @classmethod
+    def purge_expired(cls, limite=1000):
+        """Borrar claves caducadas; devuelve cuántas se borraron"""
+        try:
+            ids = [fila.clave for fila in db.session.query(cls.clave)
+                   .filter(cls.expira_en < datetime.utcnow()).limit(limite).all()]
+            if not ids:
+                return 0
+            db.session.execute(
+                delete(cls).where(cls.clave.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return len(ids)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Error al purgar claves de idempotencia: {e}")
+            return 0
+
+    def get_resultado(self):
+        """Resultado guardado como diccionario"""
+        return json.loads(self.resultado) if self.resultado else None
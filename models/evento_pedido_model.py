@@ -0,0 +1,146 @@
+from flask import current_app, has_app_context
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime, timedelta
+from sqlalchemy import Numeric, insert, select, literal
+from sqlalchemy.exc import SQLAlchemyError
+
+class EventoPedido(BaseModel, db.Model):
+    """Outbox de cambios en pedidos; el id autoincremental sirve de cursor"""
+    __tablename__ = 'pedido_eventos'
+
+    TIPOS_VALIDOS = ['creado', 'estado_actualizado', 'cancelado', 'eliminado']
+
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, nullable=False, index=True)
+    tipo = db.Column(db.String(30), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    estado_anterior = db.Column(db.String(20))
+    usuario_id = db.Column(db.Integer)
+    producto_id = db.Column(db.Integer)
+    cantidad = db.Column(db.Integer)
+    precio_total = db.Column(Numeric(10, 2))
+    fecha_pedido = db.Column(db.DateTime)
+    fecha_evento = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EventoPedido {self.id} {self.tipo}>'
+
+    @classmethod
+    def record(cls, pedido, tipo, estado=None):
+        """Agregar un evento a la transacción actual (sin commit)
+
+        Debe llamarse antes del commit que persiste el cambio del pedido, para
+        que el evento y el cambio se guarden juntos o no se guarde ninguno.
+        """
+        evento = cls(
+            pedido_id=pedido.id,
+            tipo=tipo,
+            estado=estado or pedido.estado,
+            estado_anterior=None if tipo == 'creado' else pedido.estado,
+            usuario_id=pedido.usuario_id,
+            producto_id=pedido.producto_id,
+            cantidad=pedido.cantidad,
+            precio_total=pedido.precio_total,
+            fecha_pedido=pedido.fecha_pedido
+        )
+        db.session.add(evento)
+        return evento
+
+    @classmethod
+    def record_bulk(cls, pedido_ids, tipo, estado_anterior=None):
+        """Registrar eventos para muchos pedidos con un INSERT ... SELECT (sin commit)
+
+        Se ejecuta después del UPDATE, así que el estado se lee de la tabla y
+        el estado anterior (común a todos los ids) se pasa como parámetro.
+        """
+        from models.pedido_model import Pedido
+
+        db.session.execute(
+            insert(cls).from_select(
+                ['pedido_id', 'tipo', 'estado', 'estado_anterior', 'usuario_id',
+                 'producto_id', 'cantidad', 'precio_total', 'fecha_pedido', 'fecha_evento'],
+                select(
+                    Pedido.id, literal(tipo), Pedido.estado, literal(estado_anterior),
+                    Pedido.usuario_id, Pedido.producto_id, Pedido.cantidad,
+                    Pedido.precio_total, Pedido.fecha_pedido, literal(datetime.utcnow())
+                ).where(Pedido.id.in_(pedido_ids)).order_by(Pedido.id)
+            )
+        )
+
+    @classmethod
+    def get_since(cls, cursor=0, limite=100, margen=None):
+        """Obtener los eventos posteriores a un cursor, en orden
+
+        El id autoincremental se asigna al insertar y no al confirmar: con
+        transacciones concurrentes un id menor puede hacerse visible después
+        de uno mayor. Por eso se devuelven los eventos solo hasta el primer
+        hueco en los ids. Un hueco se salta cuando el evento siguiente tiene
+        más de `margen` segundos (OUTBOX_GAP_GRACE_SECONDS): para entonces la
+        transacción que tenía ese id se deshizo y el id no se usará.
+        """
+        if margen is None:
+            config = current_app.config if has_app_context() else {}
+            margen = config.get('OUTBOX_GAP_GRACE_SECONDS', 10)
+        try:
+            eventos = cls.query.filter(cls.id > cursor).order_by(cls.id).limit(limite).all()
+        except SQLAlchemyError as e:
+            print(f"Error al obtener eventos: {e}")
+            return []
+
+        limite_hueco = datetime.utcnow() - timedelta(seconds=margen)
+        visibles = []
+        esperado = cursor + 1
+        for evento in eventos:
+            if evento.id != esperado and (evento.fecha_evento or limite_hueco) > limite_hueco:
+                break
+            visibles.append(evento)
+            esperado = evento.id + 1
+        return visibles
+
+    @classmethod
+    def get_last_cursor(cls):
+        """Obtener el cursor del último evento registrado"""
+        try:
+            return db.session.query(db.func.max(cls.id)).scalar() or 0
+        except SQLAlchemyError as e:
+            print(f"Error al obtener el último cursor: {e}")
+            return 0
+
+    @classmethod
+    def get_settled_cursor(cls, margen=None):
+        """Último cursor si no hay huecos recientes por debajo, o None
+
+        Un hueco reciente puede ser una transacción aún abierta (ver get_since):
+        un cursor por encima de él la saltaría.
+        """
+        if margen is None:
+            config = current_app.config if has_app_context() else {}
+            margen = config.get('OUTBOX_GAP_GRACE_SECONDS', 10)
+        limite_hueco = datetime.utcnow() - timedelta(seconds=margen)
+        try:
+            ultimo = db.session.query(db.func.max(cls.id)).scalar() or 0
+            base = db.session.query(db.func.max(cls.id)).filter(
+                cls.fecha_evento <= limite_hueco
+            ).scalar() or 0
+            recientes = db.session.query(db.func.count(cls.id)).filter(cls.id > base).scalar()
+        except SQLAlchemyError as e:
+            print(f"Error al obtener el último cursor: {e}")
+            return None
+        return ultimo if recientes == ultimo - base else None
+
+    def to_dict(self):
+        """Convertir evento a diccionario"""
+        return {
+            'cursor': self.id,
+            'pedido_id': self.pedido_id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'estado_anterior': self.estado_anterior,
+            'usuario_id': self.usuario_id,
+            'producto_id': self.producto_id,
+            'cantidad': self.cantidad,
+            'precio_total': float(self.precio_total) if self.precio_total is not None else None,
+            'fecha_pedido': self.fecha_pedido.isoformat() if self.fecha_pedido else None,
+            'fecha_evento': self.fecha_evento.isoformat() if self.fecha_evento else None
+        }
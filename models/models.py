@@ -2,6 +2,15 @@
 from models.usuario_model import Usuario
 from models.producto_model import Producto  
 from models.pedido_model import Pedido
+from models.pedido_archivado_model import PedidoArchivado
+from models.tarea_model import Tarea
+from models.evento_pedido_model import EventoPedido
+from models.movimiento_stock_model import MovimientoStock
+from models.reserva_stock_model import ReservaStock
+from models.clave_idempotencia_model import ClaveIdempotencia
+from models.reporte_model import ResumenVentasProducto, ResumenVentasCategoria, ResumenPedidosEstado, MarcaReporte
 
 # Exportar para facilitar importación
-__all__ = ['Usuario', 'Producto', 'Pedido']
\ No newline at end of file
+__all__ = ['Usuario', 'Producto', 'Pedido', 'PedidoArchivado', 'Tarea', 'EventoPedido',
+           'MovimientoStock', 'ReservaStock', 'ClaveIdempotencia',
+           'ResumenVentasProducto', 'ResumenVentasCategoria', 'ResumenPedidosEstado', 'MarcaReporte']
\ No newline at end of file
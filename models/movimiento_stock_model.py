@@ -0,0 +1,344 @@
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import (Column, Integer, MetaData, Table, case, insert, select, literal,
+                        update, func)
+from sqlalchemy.exc import SQLAlchemyError
+
+# Tabla temporal (una por conexión) donde se cargan los ajustes masivos de stock
+_ajustes = Table(
+    'tmp_ajustes_stock', MetaData(),
+    Column('producto_id', Integer, primary_key=True, autoincrement=False),
+    Column('nuevo_stock', Integer),
+    Column('delta', Integer),
+    prefixes=['TEMPORARY']
+)
+
+
+def _parse_adjustment(fila):
+    """Normalizar una fila (producto_id, nuevo_stock, delta); None si no es válida"""
+    try:
+        producto_id, nuevo_stock, delta = fila
+        producto_id = int(producto_id)
+        nuevo_stock = int(nuevo_stock) if nuevo_stock not in (None, '') else None
+        delta = int(delta) if delta not in (None, '') else None
+    except (ValueError, TypeError):
+        return None
+    # Exactamente uno de los dos: el stock contado o la diferencia
+    if (nuevo_stock is None) == (delta is None) or (nuevo_stock is not None and nuevo_stock < 0):
+        return None
+    return producto_id, nuevo_stock, delta
+
+
+def _merge_adjustment(anterior, nuevo_stock, delta):
+    """Combinar dos filas del mismo producto en el orden en que llegaron"""
+    if nuevo_stock is not None or anterior is None:
+        return nuevo_stock, delta
+    stock_anterior, delta_anterior = anterior
+    if stock_anterior is not None:
+        return stock_anterior + delta, None
+    return None, delta_anterior + delta
+
+class MovimientoStock(BaseModel, db.Model):
+    """Libro de movimientos de stock (solo se agregan filas, nunca se modifican)
+
+    `cantidad` lleva signo: negativa para salidas (pedido, reserva) y positiva
+    para entradas (cancelación, reposición, liberación de una reserva).
+    `Producto.stock` es el saldo cacheado: siempre igual a la suma de los
+    movimientos del producto.
+    """
+    __tablename__ = 'movimientos_stock'
+
+    TIPOS_VALIDOS = ['inicial', 'pedido', 'cancelacion', 'reposicion', 'ajuste',
+                     'reserva', 'liberacion']
+
+    # Filas de un ajuste masivo por transacción (ver apply_bulk)
+    TAMANO_LOTE_AJUSTES = 1000
+
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False)
+    pedido_id = db.Column(db.Integer, index=True)
+    reserva_id = db.Column(db.Integer, index=True)
+    motivo = db.Column(db.String(200))
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_movimientos_stock_producto_fecha', 'producto_id', 'fecha'),
+    )
+
+    def __repr__(self):
+        return f'<MovimientoStock {self.id} {self.tipo} {self.cantidad}>'
+
+    @classmethod
+    def record(cls, producto_id, tipo, cantidad, pedido_id=None, reserva_id=None, motivo=None):
+        """Agregar un movimiento a la transacción actual (sin commit)"""
+        movimiento = cls(
+            producto_id=producto_id,
+            tipo=tipo,
+            cantidad=cantidad,
+            pedido_id=pedido_id,
+            reserva_id=reserva_id,
+            motivo=motivo
+        )
+        db.session.add(movimiento)
+        return movimiento
+
+    @classmethod
+    def apply(cls, producto_id, cantidad, tipo, pedido_id=None, reserva_id=None,
+              motivo=None, commit=True):
+        """Sumar `cantidad` al stock del producto y registrar el movimiento
+
+        El saldo se actualiza con un único UPDATE condicional
+        (stock = stock + cantidad WHERE stock + cantidad >= 0) en lugar de leer
+        el valor y escribirlo después, así dos peticiones simultáneas no se
+        pisan y el stock nunca queda negativo. Con commit=False el cambio queda
+        en la transacción actual y, si falla, el llamador debe hacer rollback.
+        Devuelve (exito, mensaje).
+        """
+        from models.producto_model import Producto
+
+        if tipo not in cls.TIPOS_VALIDOS:
+            return False, f"Tipo de movimiento inválido. Tipos válidos: {cls.TIPOS_VALIDOS}"
+        if not cantidad:
+            return False, "La cantidad no puede ser 0"
+
+        try:
+            resultado = db.session.execute(
+                update(Producto)
+                .where(Producto.id == producto_id, Producto.stock + cantidad >= 0)
+                .values(stock=Producto.stock + cantidad)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 0:
+                if commit:
+                    db.session.rollback()
+                if db.session.get(Producto, producto_id) is None:
+                    return False, "El producto no existe"
+                return False, "Stock insuficiente"
+
+            cls.record(producto_id, tipo, cantidad, pedido_id, reserva_id, motivo)
+
+            # Las instancias cargadas deben releer el saldo
+            producto = db.session.get(Producto, producto_id)
+            if producto is not None:
+                db.session.expire(producto, ['stock'])
+
+            if commit:
+                db.session.commit()
+            return True, "Stock actualizado exitosamente"
+        except SQLAlchemyError as e:
+            # Con commit=False la transacción es del llamador: él decide el rollback
+            if commit:
+                db.session.rollback()
+            return False, f"Error al actualizar stock: {str(e)}"
+
+    @classmethod
+    def apply_bulk(cls, filas, motivo=None, tamano_lote=None):
+        """Fijar o corregir el stock de muchos productos tras un recuento
+
+        `filas` es un iterable de (producto_id, nuevo_stock, delta) con uno de
+        los dos últimos en None; se consume por lotes, así que puede ser un
+        archivo o el cuerpo de una petición leídos sobre la marcha. Cada lote
+        se carga en una tabla temporal y se aplica en su propia transacción
+        con un INSERT ... SELECT en el libro (movimiento 'ajuste') y un único
+        UPDATE de productos unido a la tabla temporal. Un producto repetido en
+        el mismo lote se combina en el orden de llegada.
+
+        `nuevo_stock` es el recuento físico: las unidades retenidas por
+        reservas activas se descuentan de él, igual que del stock guardado.
+
+        Devuelve (resumen, mensaje); el resumen cuenta los productos
+        cambiados y sin cambios y lista los ids desconocidos, los rechazados
+        (el stock quedaría negativo) y las posiciones de las filas inválidas.
+        Si falla un lote, los anteriores quedan aplicados y se devuelve
+        (None, mensaje).
+        """
+        tamano_lote = tamano_lote or cls.TAMANO_LOTE_AJUSTES
+        resumen = {'filas': 0, 'lotes': 0, 'cambiados': 0, 'sin_cambios': 0,
+                   'desconocidos': [], 'rechazados': [], 'invalidas': []}
+        filas = iter(filas)
+        while True:
+            bloque = list(islice(filas, tamano_lote))
+            if not bloque:
+                break
+            lote = {}
+            for fila in bloque:
+                resumen['filas'] += 1
+                ajuste = _parse_adjustment(fila)
+                if ajuste is None:
+                    resumen['invalidas'].append(resumen['filas'])
+                    continue
+                producto_id, nuevo_stock, delta = ajuste
+                lote[producto_id] = _merge_adjustment(lote.get(producto_id), nuevo_stock, delta)
+            if not lote:
+                continue
+            try:
+                cls._apply_batch(lote, motivo, resumen)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                return None, (f"Error al ajustar stock en el lote {resumen['lotes'] + 1} "
+                              f"({resumen['lotes']} lote(s) ya aplicados): {str(e)}")
+            resumen['lotes'] += 1
+
+        return resumen, (f"{resumen['cambiados']} producto(s) ajustados, "
+                         f"{resumen['sin_cambios']} sin cambios, "
+                         f"{len(resumen['desconocidos'])} desconocidos")
+
+    @classmethod
+    def _apply_batch(cls, lote, motivo, resumen):
+        """Aplicar un lote {producto_id: (nuevo_stock, delta)} en una transacción
+
+        `nuevo_stock` es el recuento físico, que incluye las unidades de las
+        reservas activas; el stock guardado ya las tiene descontadas, así que
+        se restan antes de calcular la diferencia.
+        """
+        from models.producto_model import Producto
+        from models.reserva_stock_model import ReservaStock
+
+        conexion = db.session.connection()
+        _drop_staging(conexion)
+        _ajustes.create(conexion)
+        conexion.execute(insert(_ajustes), [
+            {'producto_id': producto_id, 'nuevo_stock': nuevo_stock, 'delta': delta}
+            for producto_id, (nuevo_stock, delta) in lote.items()
+        ])
+
+        stock = func.coalesce(Producto.stock, 0)
+        reservado = select(func.coalesce(func.sum(ReservaStock.cantidad), 0)).where(
+            ReservaStock.producto_id == Producto.id, ReservaStock.estado == 'activa'
+        ).scalar_subquery()
+        diferencia = case(
+            (_ajustes.c.nuevo_stock.isnot(None), _ajustes.c.nuevo_stock - reservado - stock),
+            else_=_ajustes.c.delta
+        )
+        aplicable = (Producto.id == _ajustes.c.producto_id, diferencia != 0,
+                     stock + diferencia >= 0)
+
+        # Bloquear las filas antes de calcular las diferencias (no-op en SQLite,
+        # donde el INSERT siguiente ya toma el bloqueo de escritura)
+        db.session.execute(
+            select(Producto.id).join(_ajustes, Producto.id == _ajustes.c.producto_id)
+            .with_for_update()
+        ).all()
+        db.session.execute(
+            insert(cls).from_select(
+                ['producto_id', 'tipo', 'cantidad', 'motivo', 'fecha'],
+                select(Producto.id, literal('ajuste'), diferencia,
+                       literal(motivo or 'Ajuste masivo de inventario'),
+                       literal(datetime.utcnow()))
+                .where(*aplicable).order_by(Producto.id)
+            )
+        )
+        excluidas = db.session.execute(
+            select(_ajustes.c.producto_id, Producto.id, diferencia)
+            .outerjoin(Producto, Producto.id == _ajustes.c.producto_id)
+            .where(Producto.id.is_(None) | (diferencia == 0) | (stock + diferencia < 0))
+            .order_by(_ajustes.c.producto_id)
+        ).all()
+        cambiados = db.session.execute(
+            update(Producto).where(*aplicable)
+            .values(stock=stock + diferencia)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        _drop_staging(conexion)
+        db.session.commit()
+
+        for producto_id, existente, dif in excluidas:
+            if existente is None:
+                resumen['desconocidos'].append(producto_id)
+            elif dif == 0:
+                resumen['sin_cambios'] += 1
+            else:
+                resumen['rechazados'].append(producto_id)
+        resumen['cambiados'] += cambiados
+
+    @classmethod
+    def record_orders(cls, pedido_ids, tipo, signo):
+        """Registrar un movimiento por pedido con un INSERT ... SELECT (sin commit)
+
+        `signo` es -1 para salidas y 1 para entradas; la cantidad se toma de
+        cada pedido.
+        """
+        from models.pedido_model import Pedido
+
+        db.session.execute(
+            insert(cls).from_select(
+                ['producto_id', 'tipo', 'cantidad', 'pedido_id', 'fecha'],
+                select(
+                    Pedido.producto_id, literal(tipo), Pedido.cantidad * signo,
+                    Pedido.id, literal(datetime.utcnow())
+                ).where(Pedido.id.in_(pedido_ids)).order_by(Pedido.id)
+            )
+        )
+
+    @classmethod
+    def get_by_product(cls, producto_id, limite=100):
+        """Últimos movimientos de un producto, del más reciente al más antiguo"""
+        try:
+            return (cls.query.filter_by(producto_id=producto_id)
+                    .order_by(cls.id.desc()).limit(limite).all())
+        except SQLAlchemyError as e:
+            print(f"Error al obtener movimientos de stock: {e}")
+            return []
+
+    @classmethod
+    def balance(cls, producto_id):
+        """Saldo del producto calculado a partir del libro"""
+        try:
+            return db.session.query(
+                func.coalesce(func.sum(cls.cantidad), 0)
+            ).filter(cls.producto_id == producto_id).scalar()
+        except SQLAlchemyError as e:
+            print(f"Error al calcular saldo de stock: {e}")
+            return None
+
+    @classmethod
+    def find_mismatches(cls):
+        """Productos cuyo stock cacheado no coincide con el libro
+
+        Devuelve [(producto_id, stock, saldo_libro)].
+        """
+        from models.producto_model import Producto
+
+        saldos = (
+            select(cls.producto_id, func.sum(cls.cantidad).label('saldo'))
+            .group_by(cls.producto_id)
+            .subquery()
+        )
+        try:
+            filas = db.session.execute(
+                select(Producto.id, Producto.stock, func.coalesce(saldos.c.saldo, 0))
+                .outerjoin(saldos, saldos.c.producto_id == Producto.id)
+                .where(func.coalesce(Producto.stock, 0) != func.coalesce(saldos.c.saldo, 0))
+                .order_by(Producto.id)
+            ).all()
+            return [tuple(fila) for fila in filas]
+        except SQLAlchemyError as e:
+            print(f"Error al conciliar stock: {e}")
+            return []
+
+    def to_dict(self):
+        """Convertir movimiento a diccionario"""
+        return {
+            'id': self.id,
+            'producto_id': self.producto_id,
+            'tipo': self.tipo,
+            'cantidad': self.cantidad,
+            'pedido_id': self.pedido_id,
+            'reserva_id': self.reserva_id,
+            'motivo': self.motivo,
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
+
+
+def _drop_staging(conexion):
+    """Eliminar la tabla temporal de ajustes si existe en esta conexión"""
+    if conexion.dialect.name == 'mysql':
+        # Con TEMPORARY, MySQL no hace commit implícito de la transacción
+        conexion.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS {_ajustes.name}")
+    else:
+        _ajustes.drop(conexion, checkfirst=True)
@@ -0,0 +1,51 @@
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime
+from sqlalchemy import Numeric
+
+class PedidoArchivado(BaseModel, db.Model):
+    """Pedidos cerrados (entregados o cancelados) movidos fuera de la tabla `pedidos`
+
+    La clave primaria incluye fecha_pedido para poder particionar la tabla por
+    rango en MySQL (ver services/archive_service.py). No tiene claves foráneas:
+    MySQL no las admite en tablas particionadas.
+    """
+    __tablename__ = 'pedidos_archivo'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    fecha_pedido = db.Column(db.DateTime, primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False, index=True)
+    producto_id = db.Column(db.Integer, nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=1)
+    precio_total = db.Column(Numeric(10, 2), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, index=True)
+    fecha_archivo = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Columnas copiadas desde `pedidos` al archivar
+    COLUMNAS_COPIADAS = ['id', 'fecha_pedido', 'usuario_id', 'producto_id',
+                         'cantidad', 'precio_total', 'estado']
+
+    def __repr__(self):
+        return f'<PedidoArchivado {self.id}>'
+
+    @classmethod
+    def get_by_id(cls, id):
+        """Obtener un pedido archivado por ID"""
+        try:
+            return cls.query.filter_by(id=id).first()
+        except Exception as e:
+            print(f"Error al obtener pedido archivado por ID: {e}")
+            return None
+
+    def to_dict(self):
+        """Convertir pedido archivado a diccionario (mismo formato que Pedido)"""
+        return {
+            'id': self.id,
+            'usuario_id': self.usuario_id,
+            'producto_id': self.producto_id,
+            'cantidad': self.cantidad,
+            'precio_total': float(self.precio_total),
+            'estado': self.estado,
+            'fecha_pedido': self.fecha_pedido.isoformat() if self.fecha_pedido else None,
+            'archivado': True
+        }
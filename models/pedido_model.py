@@ -1,12 +1,37 @@
+from flask import current_app
 from models import db
 from models.base_model import BaseModel
 from datetime import datetime
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, select, update, func
 from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
+from flask_sqlalchemy.pagination import SelectPagination
+from models.evento_pedido_model import EventoPedido
+from models.tarea_model import Tarea
+from models.pedido_archivado_model import PedidoArchivado
+from models.movimiento_stock_model import MovimientoStock
+from models.reserva_stock_model import ReservaStock
+from models.clave_idempotencia_model import ClaveIdempotencia
+from models.shard_router import shard_router
+from models.base_model import MENSAJE_CONFLICTO, run_in_transaction
 
 class Pedido(BaseModel, db.Model):
     __tablename__ = 'pedidos'
     
+    ESTADOS_VALIDOS = ['pendiente', 'procesando', 'enviado', 'entregado', 'cancelado']
+    
+    # Estados de origen permitidos para cada estado destino en cambios masivos.
+    # 'cancelado' no aparece porque requiere restaurar stock (ver cancel_order).
+    TRANSICIONES_VALIDAS = {
+        'procesando': ['pendiente'],
+        'enviado': ['procesando'],
+        'entregado': ['enviado'],
+    }
+    
+    # Máximo de ids por sentencia IN (...)
+    TAMANO_LOTE = 500
+    
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
     producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
@@ -15,13 +40,34 @@ class Pedido(BaseModel, db.Model):
     estado = db.Column(db.String(20), default='pendiente')
     fecha_pedido = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Bloqueo optimista: un cambio de estado sobre una versión antigua falla
+    # en lugar de sobrescribir el cambio concurrente
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+    
+    # Índice para seleccionar los pedidos cerrados a archivar y filtrar por estado
+    __table_args__ = (
+        db.Index('ix_pedidos_estado_fecha', 'estado', 'fecha_pedido'),
+    )
+    
+    # Estados que se pueden mover al archivo (ver services/archive_service.py)
+    ESTADOS_CERRADOS = ['entregado', 'cancelado']
+    
     def __repr__(self):
         return f'<Pedido {self.id}>'
     
     # Métodos específicos del modelo Pedido
     @classmethod
-    def create_order(cls, usuario_id, producto_id, cantidad):
-        """Crear un nuevo pedido con validación"""
+    def create_order(cls, usuario_id, producto_id, cantidad, reserva_id=None,
+                     clave_idempotencia=None):
+        """Crear un nuevo pedido con validación
+        
+        Con `reserva_id` el pedido consume una reserva de stock activa (ver
+        ReservaStock) en lugar de descontar stock en este momento. Con
+        `clave_idempotencia` (una ClaveIdempotencia reclamada) el resultado se
+        guarda en la misma transacción que el pedido, que se deshace si la
+        clave ya no pertenece a esta petición (ver services/idempotency_service.py).
+        """
         try:
             # Importar aquí para evitar circular imports
             from models.usuario_model import Usuario
@@ -44,80 +90,540 @@ class Pedido(BaseModel, db.Model):
             if not producto:
                 return None, "El producto no existe"
             
-            # Verificar stock disponible
-            if not producto.is_available(cantidad):
+            reserva = None
+            if reserva_id:
+                reserva = ReservaStock.get_by_id(reserva_id)
+                if not reserva or reserva.producto_id != producto_id or reserva.cantidad != cantidad:
+                    return None, "La reserva no corresponde a este producto y cantidad"
+                if reserva.usuario_id is not None and reserva.usuario_id != usuario_id:
+                    return None, "La reserva pertenece a otro usuario"
+            elif not producto.is_available(cantidad):
+                # Verificar stock disponible
                 return None, f"Stock insuficiente. Disponible: {producto.stock}"
             
             # Calcular precio total
             precio_total = Decimal(str(producto.precio)) * cantidad
             
-            # Crear pedido
-            pedido = cls(
-                usuario_id=usuario_id,
-                producto_id=producto_id,
-                cantidad=cantidad,
-                precio_total=precio_total,
-                estado='pendiente'
-            )
+            def nuevo_pedido():
+                return cls(
+                    usuario_id=usuario_id,
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    precio_total=precio_total,
+                    estado='pendiente'
+                )
             
-            # Guardar pedido
-            success, message = pedido.save()
+            if shard_router.enabled:
+                return cls._create_order_sharded(nuevo_pedido(), reserva, clave_idempotencia)
+            
+            # El pedido, el movimiento de stock, el evento del outbox y las
+            # tareas en segundo plano se guardan en la misma transacción; ante
+            # un error transitorio se repite la unidad completa
+            def crear():
+                pedido = nuevo_pedido()
+                db.session.add(pedido)
+                db.session.flush()
+                success, message = cls._record_creation(pedido, reserva, clave_idempotencia)
+                return (True, pedido) if success else (False, message)
+            
+            success, resultado = run_in_transaction(crear, 'guardar')
             if success:
-                # Reducir stock del producto
-                stock_success, stock_message = producto.reduce_stock(cantidad)
-                if not stock_success:
-                    # Si falla la reducción de stock, eliminar el pedido
-                    pedido.delete()
-                    return None, f"Error al actualizar stock: {stock_message}"
-                
-                return pedido, "Pedido creado exitosamente"
-            else:
-                return None, message
+                return resultado, "Pedido creado exitosamente"
+            return None, resultado
                 
         except Exception as e:
+            db.session.rollback()
             return None, f"Error inesperado: {str(e)}"
     
     @classmethod
-    def get_orders_with_details(cls):
+    def _record_creation(cls, pedido, reserva, clave_idempotencia):
+        """Stock, outbox, tareas y clave de idempotencia del pedido nuevo (sin commit)"""
+        # Descontar stock con un UPDATE condicional (o consumir la reserva)
+        if reserva:
+            stock_success, stock_message = reserva.confirm(pedido.id)
+        else:
+            stock_success, stock_message = MovimientoStock.apply(
+                pedido.producto_id, -pedido.cantidad, 'pedido', pedido_id=pedido.id, commit=False
+            )
+        if not stock_success:
+            return False, f"Error al actualizar stock: {stock_message}"
+        
+        EventoPedido.record(pedido, 'creado')
+        
+        # Encolar el procesamiento, así la respuesta no espera a los pasos posteriores
+        if current_app.config.get('ASYNC_ORDER_PROCESSING', True):
+            Tarea.enqueue('procesar_pedido', {'pedido_id': pedido.id}, commit=False)
+            if current_app.config.get('ORDER_WEBHOOK_URL'):
+                Tarea.enqueue('notificar_pedido', {'pedido_id': pedido.id, 'evento': 'creado'},
+                              commit=False)
+        
+        if clave_idempotencia:
+            clave_success, clave_message = clave_idempotencia.record_result({
+                'exito': True,
+                'pedido_id': pedido.id,
+                'mensaje': "Pedido creado exitosamente"
+            })
+            if not clave_success:
+                return False, clave_message
+        return True, "Pedido registrado"
+    
+    @classmethod
+    def _create_order_sharded(cls, pedido, reserva, clave_idempotencia):
+        """Crear el pedido en el shard de su usuario
+        
+        El pedido se confirma primero en su shard y después la transacción
+        principal (stock, outbox, tareas). Si esta última falla, el pedido se
+        borra del shard para no dejar un pedido sin su descuento de stock.
+        """
+        indice = shard_router.shard_for_user(pedido.usuario_id)
+        pedido.id = shard_router.next_id(indice)
+        with shard_router.session(indice) as sesion:
+            sesion.add(pedido)
+            sesion.flush()
+            success, message = cls._record_creation(pedido, reserva, clave_idempotencia)
+            if not success:
+                sesion.rollback()
+                db.session.rollback()
+                return None, message
+            sesion.commit()
+        
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            shard_router.delete_order(pedido.id)
+            return None, f"Error al guardar: {str(e)}"
+        return pedido, "Pedido creado exitosamente"
+    
+    @classmethod
+    def _models(cls, include_archived):
+        """Modelos a consultar: la tabla activa y, opcionalmente, el archivo"""
+        return [cls, PedidoArchivado] if include_archived else [cls]
+    
+    @classmethod
+    def _gather(cls, *condiciones):
+        """Pedidos de todos los shards que cumplen `condiciones`, consultados en paralelo"""
+        consulta = select(cls).where(*condiciones)
+        resultados = shard_router.scatter(lambda sesion: sesion.scalars(consulta).all())
+        return sorted((p for pedidos in resultados for p in pedidos),
+                      key=lambda p: (p.fecha_pedido, p.id))
+    
+    @classmethod
+    def _scatter_scalar(cls, consulta):
+        """Resultados de una consulta escalar (COUNT, SUM) en cada shard"""
+        return [valor for valor in shard_router.scatter(lambda sesion: sesion.scalar(consulta))
+                if valor is not None]
+    
+    @classmethod
+    def get_by_id(cls, id):
+        """Obtener un pedido por ID (en su shard, si hay shards)"""
+        if not shard_router.enabled:
+            return super().get_by_id(id)
+        indice = shard_router.shard_for_id(id)
+        if indice is None:
+            return None
+        try:
+            with shard_router.session(indice) as sesion:
+                return sesion.get(cls, id)
+        except SQLAlchemyError as e:
+            print(f"Error al obtener registro por ID: {e}")
+            return None
+    
+    @classmethod
+    def get_all(cls, include_archived=False):
+        """Obtener todos los pedidos (opcionalmente también los archivados)"""
+        try:
+            if shard_router.enabled:
+                archivados = PedidoArchivado.query.all() if include_archived else []
+                return cls._gather() + archivados
+            return [p for modelo in cls._models(include_archived) for p in modelo.query.all()]
+        except SQLAlchemyError as e:
+            print(f"Error al obtener registros: {e}")
+            return []
+    
+    @classmethod
+    def get_orders_with_details(cls, include_archived=False):
         """Obtener pedidos con información de usuario y producto"""
         try:
             from models.usuario_model import Usuario
             from models.producto_model import Producto
             
-            return db.session.query(cls, Usuario, Producto).join(
-                Usuario, cls.usuario_id == Usuario.id
-            ).join(
-                Producto, cls.producto_id == Producto.id
-            ).all()
+            if shard_router.enabled:
+                return cls._with_details(cls._gather() + (
+                    PedidoArchivado.query.all() if include_archived else []
+                ))
+            
+            # LEFT JOIN: el archivo no tiene claves foráneas y sus pedidos
+            # pueden referirse a usuarios o productos que ya no existen
+            resultado = []
+            for modelo in cls._models(include_archived):
+                filas = db.session.query(modelo, Usuario, Producto).outerjoin(
+                    Usuario, modelo.usuario_id == Usuario.id
+                ).outerjoin(
+                    Producto, modelo.producto_id == Producto.id
+                ).all()
+                resultado.extend(cls._detail_row(p, usuario, producto)
+                                 for p, usuario, producto in filas)
+            return resultado
         except Exception as e:
             print(f"Error al obtener pedidos con detalles: {e}")
             return []
     
     @classmethod
-    def get_by_user(cls, usuario_id):
-        """Obtener pedidos de un usuario específico"""
+    def _with_details(cls, pedidos):
+        """Tuplas (pedido, usuario, producto) leyendo usuarios y productos por lotes
+        
+        Con shards los pedidos no están en la misma base que usuarios y
+        productos, así que no se puede hacer JOIN.
+        """
+        from models.usuario_model import Usuario
+        from models.producto_model import Producto
+        
+        usuarios = cls._load_by_ids(Usuario, {p.usuario_id for p in pedidos})
+        productos = cls._load_by_ids(Producto, {p.producto_id for p in pedidos})
+        return [cls._detail_row(p, usuarios.get(p.usuario_id), productos.get(p.producto_id))
+                for p in pedidos]
+    
+    @staticmethod
+    def _detail_row(pedido, usuario, producto):
+        """Tupla (pedido, usuario, producto) con sustitutos para los que ya no existen
+        
+        Los shards y el archivo no tienen claves foráneas: un pedido huérfano
+        se sigue mostrando en lugar de desaparecer del listado.
+        """
+        from models.usuario_model import Usuario
+        from models.producto_model import Producto
+        
+        if usuario is None:
+            usuario = Usuario(id=pedido.usuario_id, nombre='Usuario eliminado', email='')
+        if producto is None:
+            producto = Producto(id=pedido.producto_id, nombre='Producto eliminado',
+                                precio=Decimal('0'), stock=0)
+        return pedido, usuario, producto
+    
+    @classmethod
+    def has_orders(cls, usuario_id=None, producto_id=None):
+        """Indicar si algún pedido (activo, archivado o de cualquier shard) usa el usuario o producto
+        
+        Las tablas de los shards y el archivo no tienen claves foráneas, así
+        que antes de borrar un usuario o un producto hay que comprobarlo aquí.
+        Puede lanzar SQLAlchemyError.
+        """
+        def condiciones(columnas):
+            return [columna == valor for columna, valor in
+                    ((columnas.usuario_id, usuario_id), (columnas.producto_id, producto_id))
+                    if valor is not None]
+        
+        for modelo in (cls, PedidoArchivado):
+            if db.session.query(modelo.id).filter(*condiciones(modelo)).first() is not None:
+                return True
+        if shard_router.enabled:
+            tabla = shard_router.pedidos
+            return any(shard_router.scatter(
+                lambda sesion: sesion.execute(
+                    select(tabla.c.id).where(*condiciones(tabla.c)).limit(1)
+                ).first() is not None
+            ))
+        return False
+    
+    @classmethod
+    def _load_by_ids(cls, modelo, ids):
+        """Diccionario {id: instancia} de `modelo`, con una consulta IN por lote"""
+        ids = sorted(ids)
+        encontrados = {}
+        for inicio in range(0, len(ids), cls.TAMANO_LOTE):
+            lote = ids[inicio:inicio + cls.TAMANO_LOTE]
+            encontrados.update(
+                (fila.id, fila) for fila in modelo.query.filter(modelo.id.in_(lote)).all()
+            )
+        return encontrados
+    
+    @classmethod
+    def get_by_user(cls, usuario_id, include_archived=False):
+        """Obtener pedidos de un usuario específico (de un solo shard, si hay shards)"""
         try:
-            return cls.query.filter_by(usuario_id=usuario_id).all()
+            if shard_router.enabled:
+                with shard_router.session(shard_router.shard_for_user(usuario_id)) as sesion:
+                    pedidos = sesion.scalars(select(cls).where(cls.usuario_id == usuario_id)).all()
+                if include_archived:
+                    pedidos += PedidoArchivado.query.filter_by(usuario_id=usuario_id).all()
+                return pedidos
+            return [p for modelo in cls._models(include_archived)
+                    for p in modelo.query.filter_by(usuario_id=usuario_id).all()]
         except Exception as e:
             print(f"Error al obtener pedidos por usuario: {e}")
             return []
     
     @classmethod
-    def get_by_status(cls, estado):
+    def get_user_history(cls, usuario_id, pagina=1, por_pagina=20, estrategia=None):
+        """Historial paginado de un usuario con el producto de cada pedido
+        
+        Carga usuario, pedidos y productos en un número fijo de consultas
+        (usuario, conteo, página y, con 'selectin', productos) sea cual sea el
+        tamaño de la página. Devuelve (usuario, paginacion) o (None, None).
+        """
+        from models.usuario_model import Usuario
+        
+        try:
+            usuario = db.session.get(Usuario, usuario_id)
+            if usuario is None:
+                return None, None
+            consulta = (
+                select(cls)
+                .where(cls.usuario_id == usuario_id)
+                .order_by(cls.fecha_pedido.desc(), cls.id.desc())
+            )
+            if shard_router.enabled:
+                return usuario, cls._user_history_sharded(usuario_id, consulta, pagina, por_pagina)
+            
+            consulta = consulta.options(*cls.eager(cls.producto, estrategia=estrategia))
+            paginacion = db.paginate(consulta, page=pagina, per_page=por_pagina,
+                                     max_per_page=100, error_out=False)
+            return usuario, paginacion
+        except SQLAlchemyError as e:
+            print(f"Error al obtener historial de pedidos: {e}")
+            return None, None
+    
+    @classmethod
+    def get_archived_history(cls, usuario_id):
+        """Pedidos archivados de un usuario con su producto, del más reciente al más antiguo
+        
+        El archivo no tiene relaciones ORM: los productos se cargan con una
+        consulta IN. Devuelve una lista de pares (pedido, producto); producto
+        es None si ya no existe.
+        """
+        from models.producto_model import Producto
+        
+        try:
+            archivados = (PedidoArchivado.query.filter_by(usuario_id=usuario_id)
+                          .order_by(PedidoArchivado.fecha_pedido.desc(),
+                                    PedidoArchivado.id.desc())
+                          .all())
+            productos = cls._load_by_ids(Producto, {p.producto_id for p in archivados})
+            return [(p, productos.get(p.producto_id)) for p in archivados]
+        except SQLAlchemyError as e:
+            print(f"Error al obtener pedidos archivados: {e}")
+            return []
+    
+    @classmethod
+    def _user_history_sharded(cls, usuario_id, consulta, pagina, por_pagina):
+        """Página del historial leída del shard del usuario, con los productos de la base principal"""
+        from models.producto_model import Producto
+        
+        with shard_router.session(shard_router.shard_for_user(usuario_id)) as sesion:
+            paginacion = SelectPagination(select=consulta, session=sesion, page=pagina,
+                                          per_page=por_pagina, max_per_page=100, error_out=False)
+        productos = cls._load_by_ids(Producto, {p.producto_id for p in paginacion.items})
+        for pedido in paginacion.items:
+            set_committed_value(pedido, 'producto', productos.get(pedido.producto_id))
+        return paginacion
+    
+    @classmethod
+    def get_by_status(cls, estado, include_archived=False):
         """Obtener pedidos por estado"""
+        if estado not in cls.ESTADOS_CERRADOS:
+            include_archived = False  # el archivo solo contiene pedidos cerrados
         try:
-            return cls.query.filter_by(estado=estado).all()
+            if shard_router.enabled:
+                archivados = (PedidoArchivado.query.filter_by(estado=estado).all()
+                              if include_archived else [])
+                return cls._gather(cls.estado == estado) + archivados
+            return [p for modelo in cls._models(include_archived)
+                    for p in modelo.query.filter_by(estado=estado).all()]
         except Exception as e:
             print(f"Error al obtener pedidos por estado: {e}")
             return []
     
+    @classmethod
+    def count_by_status(cls, estado=None, include_archived=False):
+        """Contar pedidos (de un estado, si se indica) con COUNT en la base de datos"""
+        try:
+            total = 0
+            if shard_router.enabled:
+                consulta = select(func.count(cls.id))
+                if estado is not None:
+                    consulta = consulta.where(cls.estado == estado)
+                total += sum(cls._scatter_scalar(consulta))
+                include_archived = include_archived and (estado is None
+                                                         or estado in cls.ESTADOS_CERRADOS)
+                modelos = [PedidoArchivado] if include_archived else []
+            else:
+                modelos = cls._models(include_archived)
+            for modelo in modelos:
+                query = db.session.query(func.count(modelo.id))
+                if estado is not None:
+                    query = query.filter(modelo.estado == estado)
+                total += query.scalar() or 0
+            return total
+        except SQLAlchemyError as e:
+            print(f"Error al contar pedidos: {e}")
+            return 0
+    
+    @classmethod
+    def total_revenue(cls, include_archived=False):
+        """Suma de precio_total con SUM en la base de datos"""
+        try:
+            total = Decimal('0')
+            modelos = cls._models(include_archived)
+            if shard_router.enabled:
+                total += sum(cls._scatter_scalar(select(func.sum(cls.precio_total))), Decimal('0'))
+                modelos = modelos[1:]
+            for modelo in modelos:
+                total += db.session.query(func.sum(modelo.precio_total)).scalar() or Decimal('0')
+            return total
+        except SQLAlchemyError as e:
+            print(f"Error al sumar ingresos: {e}")
+            return Decimal('0')
+    
+    @classmethod
+    def bulk_update_status(cls, nuevo_estado, pedido_ids=None, estado_actual=None):
+        """Actualizar el estado de muchos pedidos con un UPDATE por lote
+        
+        Se puede indicar una lista de ids, un estado actual como filtro o ambos.
+        Devuelve (resultados, mensaje) donde resultados es un diccionario
+        {pedido_id: {'exito', 'mensaje', 'estado'}}; resultados es None si la
+        petición es inválida.
+        """
+        if shard_router.enabled:
+            return None, "Los cambios masivos no están disponibles con pedidos repartidos en shards"
+        
+        if nuevo_estado not in cls.ESTADOS_VALIDOS:
+            return None, f"Estado inválido. Estados válidos: {cls.ESTADOS_VALIDOS}"
+        
+        origenes = cls.TRANSICIONES_VALIDAS.get(nuevo_estado)
+        if not origenes:
+            return None, f"No se permite el cambio masivo a '{nuevo_estado}'"
+        
+        if estado_actual is not None and estado_actual not in origenes:
+            return None, f"No se puede pasar de '{estado_actual}' a '{nuevo_estado}'"
+        
+        if not pedido_ids and estado_actual is None:
+            return None, "Debe indicar los pedidos o un estado actual"
+        
+        try:
+            # Estado actual de los pedidos seleccionados (una consulta por lote);
+            # FOR UPDATE los bloquea hasta el commit (se ignora en SQLite)
+            estados = {}
+            if pedido_ids:
+                ids = list(dict.fromkeys(pedido_ids))
+                for inicio in range(0, len(ids), cls.TAMANO_LOTE):
+                    lote = ids[inicio:inicio + cls.TAMANO_LOTE]
+                    query = db.session.query(cls.id, cls.estado).filter(cls.id.in_(lote))
+                    if estado_actual is not None:
+                        query = query.filter(cls.estado == estado_actual)
+                    estados.update(query.with_for_update().all())
+            else:
+                estados.update(
+                    db.session.query(cls.id, cls.estado)
+                    .filter(cls.estado == estado_actual).with_for_update().all()
+                )
+                ids = list(estados.keys())
+            
+            resultados = {}
+            candidatos = []
+            for pedido_id in ids:
+                estado = estados.get(pedido_id)
+                if estado is None:
+                    resultados[pedido_id] = {
+                        'exito': False,
+                        'mensaje': 'Pedido no encontrado' if estado_actual is None
+                                   else f"El pedido no está en estado '{estado_actual}'",
+                        'estado': None
+                    }
+                elif estado not in origenes:
+                    resultados[pedido_id] = {
+                        'exito': False,
+                        'mensaje': f"No se puede pasar de '{estado}' a '{nuevo_estado}'",
+                        'estado': estado
+                    }
+                else:
+                    candidatos.append(pedido_id)
+            
+            # UPDATE ... WHERE id IN (...) AND estado = origen: solo cambian los
+            # pedidos que siguen en el estado leído, y es la propia sentencia la
+            # que dice cuáles cambió (RETURNING, o rowcount con las filas bloqueadas)
+            actualizados = set()
+            for origen in origenes:
+                del_origen = [p for p in candidatos if estados[p] == origen]
+                for inicio in range(0, len(del_origen), cls.TAMANO_LOTE):
+                    lote = del_origen[inicio:inicio + cls.TAMANO_LOTE]
+                    cambiados = cls._update_from(lote, origen, nuevo_estado)
+                    if cambiados is None:
+                        db.session.rollback()
+                        return None, "Los pedidos cambiaron durante la actualización. Intente de nuevo"
+                    actualizados.update(cambiados)
+                    EventoPedido.record_bulk(
+                        [p for p in lote if p in actualizados], 'estado_actualizado',
+                        estado_anterior=origen
+                    )
+            db.session.commit()
+            # Las instancias cargadas en la sesión deben releer estado y versión
+            db.session.expire_all()
+            
+            # Estado de los que no cambiaron, solo para informar
+            otros = [p for p in candidatos if p not in actualizados]
+            finales = {}
+            for inicio in range(0, len(otros), cls.TAMANO_LOTE):
+                lote = otros[inicio:inicio + cls.TAMANO_LOTE]
+                finales.update(db.session.query(cls.id, cls.estado).filter(cls.id.in_(lote)).all())
+            
+            for pedido_id in candidatos:
+                if pedido_id in actualizados:
+                    resultados[pedido_id] = {
+                        'exito': True,
+                        'mensaje': 'Estado actualizado',
+                        'estado': nuevo_estado
+                    }
+                else:
+                    resultados[pedido_id] = {
+                        'exito': False,
+                        'mensaje': 'El pedido cambió de estado durante la actualización',
+                        'estado': finales.get(pedido_id)
+                    }
+            
+            return resultados, f"{len(actualizados)} de {len(ids)} pedido(s) actualizados a '{nuevo_estado}'"
+        
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f"Error al actualizar estados: {str(e)}"
+    
+    @classmethod
+    def _update_from(cls, lote, origen, nuevo_estado):
+        """Pasar a `nuevo_estado` los pedidos de `lote` que siguen en `origen` (sin commit)
+        
+        Devuelve los ids que cambió esta sentencia. Sin RETURNING (MySQL) las
+        filas deben estar bloqueadas: si el rowcount no coincide con el lote
+        no se sabe cuáles cambiaron y devuelve None.
+        """
+        sentencia = (
+            update(cls)
+            .where(cls.id.in_(lote), cls.estado == origen)
+            .values(estado=nuevo_estado, version=cls.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.get_bind().dialect.update_returning:
+            return db.session.execute(sentencia.returning(cls.id)).scalars().all()
+        if db.session.execute(sentencia).rowcount != len(lote):
+            return None
+        return lote
+    
     def update_status(self, nuevo_estado):
         """Actualizar estado del pedido"""
-        estados_validos = ['pendiente', 'procesando', 'enviado', 'entregado', 'cancelado']
-        if nuevo_estado not in estados_validos:
-            return False, f"Estado inválido. Estados válidos: {estados_validos}"
+        if nuevo_estado not in self.ESTADOS_VALIDOS:
+            return False, f"Estado inválido. Estados válidos: {self.ESTADOS_VALIDOS}"
         
-        return self.update(estado=nuevo_estado)
+        if shard_router.enabled:
+            return self._update_status_sharded(nuevo_estado)
+        
+        return run_in_transaction(lambda: self._change_status(nuevo_estado), 'actualizar')
+    
+    def _change_status(self, nuevo_estado):
+        """Cambiar el estado y registrar su evento (sin commit)"""
+        # El evento se confirma en el mismo commit que el cambio de estado
+        tipo = 'cancelado' if nuevo_estado == 'cancelado' else 'estado_actualizado'
+        EventoPedido.record(self, tipo, estado=nuevo_estado)
+        self.estado = nuevo_estado
+        return True, "Registro actualizado exitosamente"
     
     def cancel_order(self):
         """Cancelar pedido y restaurar stock"""
@@ -127,17 +633,211 @@ class Pedido(BaseModel, db.Model):
             if self.estado == 'cancelado':
                 return False, "El pedido ya está cancelado"
             
-            # Restaurar stock
-            producto = Producto.get_by_id(self.producto_id)
-            if producto:
-                producto.increase_stock(self.cantidad)
+            if shard_router.enabled:
+                return self._update_status_sharded('cancelado', restaurar_stock=True)
             
-            # Actualizar estado
-            return self.update_status('cancelado')
+            def cancelar():
+                # Tras un reintento el pedido se relee: otro proceso pudo cancelarlo
+                if self.estado == 'cancelado':
+                    return False, "El pedido ya está cancelado"
+                # Restaurar stock en la misma transacción que el cambio de estado
+                if Producto.get_by_id(self.producto_id):
+                    success, message = MovimientoStock.apply(
+                        self.producto_id, self.cantidad, 'cancelacion',
+                        pedido_id=self.id, commit=False
+                    )
+                    if not success:
+                        return False, f"Error al cancelar pedido: {message}"
+                return self._change_status('cancelado')
+            
+            return run_in_transaction(cancelar, 'actualizar')
             
         except Exception as e:
+            db.session.rollback()
             return False, f"Error al cancelar pedido: {str(e)}"
     
+    def _update_status_sharded(self, nuevo_estado, restaurar_stock=False):
+        """Cambiar el estado en el shard del pedido y registrar el evento en la base principal
+        
+        El UPDATE en el shard comprueba la versión (bloqueo optimista). Se
+        confirma primero el shard y después la base principal; si esta falla,
+        el shard vuelve al estado anterior.
+        """
+        indice = shard_router.shard_for_id(self.id)
+        estado_anterior, version = self.estado, self.version
+        tipo = 'cancelado' if nuevo_estado == 'cancelado' else 'estado_actualizado'
+        pedidos = shard_router.pedidos
+        
+        with shard_router.session(indice) as sesion:
+            resultado = sesion.execute(
+                update(pedidos)
+                .where(pedidos.c.id == self.id, pedidos.c.version == version)
+                .values(estado=nuevo_estado, version=version + 1)
+            )
+            if resultado.rowcount == 0:
+                sesion.rollback()
+                return False, MENSAJE_CONFLICTO
+            
+            if restaurar_stock:
+                success, message = MovimientoStock.apply(
+                    self.producto_id, self.cantidad, 'cancelacion', pedido_id=self.id, commit=False
+                )
+                if not success:
+                    sesion.rollback()
+                    db.session.rollback()
+                    return False, f"Error al cancelar pedido: {message}"
+            EventoPedido.record(self, tipo, estado=nuevo_estado)
+            sesion.commit()
+        
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            with shard_router.session(indice) as sesion:
+                sesion.execute(
+                    update(pedidos)
+                    .where(pedidos.c.id == self.id, pedidos.c.version == version + 1)
+                    .values(estado=estado_anterior, version=version + 2)
+                )
+                sesion.commit()
+            return False, f"Error al actualizar: {str(e)}"
+        
+        set_committed_value(self, 'estado', nuevo_estado)
+        set_committed_value(self, 'version', version + 1)
+        return True, "Registro actualizado exitosamente"
+    
+    @classmethod
+    def bulk_cancel(cls, pedido_ids=None, producto_id=None):
+        """Cancelar muchos pedidos y restaurar su stock en una transacción
+        
+        Por cada lote se bloquean los pedidos seleccionados, se marcan como
+        cancelados con un UPDATE condicionado a su estado leído y solo para
+        los que esa sentencia cambió se restaura el stock con un único UPDATE
+        agregado por producto. Los pedidos ya cancelados se omiten. Devuelve
+        (resultados, mensaje) con el mismo formato que bulk_update_status.
+        """
+        from models.producto_model import Producto
+        
+        if shard_router.enabled:
+            return None, "Las cancelaciones masivas no están disponibles con pedidos repartidos en shards"
+        
+        if not pedido_ids and producto_id is None:
+            return None, "Debe indicar los pedidos o un producto"
+        
+        try:
+            if pedido_ids:
+                ids = list(dict.fromkeys(pedido_ids))
+            else:
+                ids = [
+                    fila.id for fila in db.session.query(cls.id).filter(
+                        cls.producto_id == producto_id,
+                        cls.estado != 'cancelado'
+                    ).all()
+                ]
+            
+            resultados = {}
+            cancelados = 0
+            sin_cambio = []
+            for inicio in range(0, len(ids), cls.TAMANO_LOTE):
+                lote = ids[inicio:inicio + cls.TAMANO_LOTE]
+                
+                # Bloquear las filas del lote (FOR UPDATE se ignora en SQLite)
+                query = db.session.query(cls.id, cls.estado).filter(cls.id.in_(lote))
+                if producto_id is not None:
+                    query = query.filter(cls.producto_id == producto_id)
+                estados = dict(query.with_for_update().all())
+                
+                candidatos = []
+                for pedido_id in lote:
+                    estado = estados.get(pedido_id)
+                    if estado is None:
+                        resultados[pedido_id] = {
+                            'exito': False,
+                            'mensaje': 'Pedido no encontrado',
+                            'estado': None
+                        }
+                    elif estado == 'cancelado':
+                        resultados[pedido_id] = {
+                            'exito': False,
+                            'mensaje': 'El pedido ya está cancelado',
+                            'estado': estado
+                        }
+                    else:
+                        candidatos.append(pedido_id)
+                
+                if not candidatos:
+                    continue
+                
+                # Primero el cambio de estado: solo los pedidos que siguen en el
+                # estado leído pasan a cancelado, y la sentencia dice cuáles
+                # (RETURNING, o rowcount con las filas bloqueadas)
+                cambiados = []
+                for origen in dict.fromkeys(estados[p] for p in candidatos):
+                    del_origen = [p for p in candidatos if estados[p] == origen]
+                    de_este = cls._update_from(del_origen, origen, 'cancelado')
+                    if de_este is None:
+                        db.session.rollback()
+                        return None, "Los pedidos cambiaron durante la cancelación. Intente de nuevo"
+                    de_este = set(de_este)
+                    if de_este:
+                        EventoPedido.record_bulk(
+                            [p for p in del_origen if p in de_este], 'cancelado',
+                            estado_anterior=origen
+                        )
+                    cambiados.extend(p for p in del_origen if p in de_este)
+                
+                sin_cambio.extend(p for p in candidatos if p not in cambiados)
+                if not cambiados:
+                    continue
+                
+                # Solo se restaura el stock de los pedidos que esta sentencia canceló
+                # UPDATE productos SET stock = stock + (SELECT SUM(cantidad) ...)
+                cantidad_restaurada = select(
+                    func.coalesce(func.sum(cls.cantidad), 0)
+                ).where(
+                    cls.producto_id == Producto.id,
+                    cls.id.in_(cambiados)
+                ).scalar_subquery()
+                db.session.execute(
+                    update(Producto)
+                    .where(Producto.id.in_(
+                        select(cls.producto_id).where(cls.id.in_(cambiados))
+                    ))
+                    .values(stock=Producto.stock + cantidad_restaurada)
+                    .execution_options(synchronize_session=False)
+                )
+                MovimientoStock.record_orders(cambiados, 'cancelacion', 1)
+                
+                for pedido_id in cambiados:
+                    resultados[pedido_id] = {
+                        'exito': True,
+                        'mensaje': 'Pedido cancelado',
+                        'estado': 'cancelado'
+                    }
+                cancelados += len(cambiados)
+            
+            db.session.commit()
+            # Las instancias cargadas en la sesión deben releer stock y estado
+            db.session.expire_all()
+            
+            # Estado de los que no se cancelaron, solo para informar
+            finales = {}
+            for inicio in range(0, len(sin_cambio), cls.TAMANO_LOTE):
+                lote = sin_cambio[inicio:inicio + cls.TAMANO_LOTE]
+                finales.update(db.session.query(cls.id, cls.estado).filter(cls.id.in_(lote)).all())
+            for pedido_id in sin_cambio:
+                resultados[pedido_id] = {
+                    'exito': False,
+                    'mensaje': 'El pedido cambió de estado durante la cancelación',
+                    'estado': finales.get(pedido_id)
+                }
+            
+            return resultados, f"{cancelados} de {len(ids)} pedido(s) cancelados"
+        
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f"Error al cancelar pedidos: {str(e)}"
+    
     def to_dict(self):
         """Convertir pedido a diccionario"""
         return {
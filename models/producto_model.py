@@ -1,8 +1,10 @@
 from models import db
 from models.base_model import BaseModel
 from datetime import datetime
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, event, insert
 from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+from models.movimiento_stock_model import MovimientoStock
 
 class Producto(BaseModel, db.Model):
     __tablename__ = 'productos'
@@ -15,8 +17,14 @@ class Producto(BaseModel, db.Model):
     categoria = db.Column(db.String(50))
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relación con pedidos (comentada temporalmente para tests)
-    # pedidos = db.relationship('Pedido', backref='producto', lazy=True)
+    # Bloqueo optimista: cada UPDATE del ORM comprueba e incrementa la versión.
+    # El stock no la incrementa: se cambia con UPDATE atómicos (ver MovimientoStock)
+    # para que los pedidos no provoquen conflictos al editar otros campos.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+    
+    # Relación con pedidos (carga diferida; ver BaseModel.eager para cargarla por adelantado)
+    pedidos = db.relationship('Pedido', backref='producto', lazy='select')
     
     def __repr__(self):
         return f'<Producto {self.nombre}>'
@@ -89,18 +97,44 @@ class Producto(BaseModel, db.Model):
             print(f"Error al buscar por nombre: {e}")
             return []
     
-    def reduce_stock(self, cantidad):
-        """Reducir stock del producto"""
-        if self.stock >= cantidad:
-            self.stock -= cantidad
-            return self.update(stock=self.stock)
-        else:
+    def reduce_stock(self, cantidad, tipo='pedido', pedido_id=None, commit=True):
+        """Reducir stock del producto registrando el movimiento"""
+        if not self.is_available(cantidad):
             return False, "Stock insuficiente"
+        return MovimientoStock.apply(self.id, -cantidad, tipo, pedido_id=pedido_id, commit=commit)
+    
+    def increase_stock(self, cantidad, tipo='reposicion', pedido_id=None, commit=True):
+        """Aumentar stock del producto registrando el movimiento"""
+        return MovimientoStock.apply(self.id, cantidad, tipo, pedido_id=pedido_id, commit=commit)
+    
+    def adjust_stock(self, nuevo_stock, motivo=None):
+        """Fijar el stock tras un recuento, registrando la diferencia como ajuste"""
+        try:
+            nuevo_stock = int(nuevo_stock)
+        except (ValueError, TypeError):
+            return False, "El stock debe ser un número entero válido"
+        if nuevo_stock < 0:
+            return False, "El stock no puede ser negativo"
+        
+        # Releer el saldo con la fila bloqueada para que la diferencia sea exacta
+        db.session.refresh(self, with_for_update=True)
+        diferencia = nuevo_stock - self.stock
+        if diferencia == 0:
+            db.session.commit()
+            return True, "El stock no cambia"
+        return MovimientoStock.apply(self.id, diferencia, 'ajuste', motivo=motivo)
     
-    def increase_stock(self, cantidad):
-        """Aumentar stock del producto"""
-        self.stock += cantidad
-        return self.update(stock=self.stock)
+    def delete(self):
+        """Eliminar el producto solo si ningún pedido lo referencia (ver Pedido.has_orders)"""
+        from models.pedido_model import Pedido
+        
+        try:
+            if Pedido.has_orders(producto_id=self.id):
+                return False, "El producto tiene pedidos y no se puede eliminar"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return False, f"Error al eliminar: {str(e)}"
+        return super().delete()
     
     def is_available(self, cantidad=1):
         """Verificar si hay stock suficiente"""
@@ -116,4 +150,19 @@ class Producto(BaseModel, db.Model):
             'stock': self.stock,
             'categoria': self.categoria,
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(Producto, 'after_insert')
+def _record_initial_stock(mapper, connection, producto):
+    """Registrar el stock inicial como primer movimiento del libro"""
+    if producto.stock:
+        connection.execute(
+            insert(MovimientoStock.__table__).values(
+                producto_id=producto.id,
+                tipo='inicial',
+                cantidad=producto.stock,
+                motivo='Stock inicial',
+                fecha=datetime.utcnow()
+            )
+        )
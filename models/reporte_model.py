@@ -0,0 +1,56 @@
+from models import db
+from sqlalchemy import Numeric
+
+# Tablas de resumen para los reportes de ventas (ver services/reporting_service.py).
+# Se mantienen de forma incremental a partir del outbox de pedidos.
+
+class ResumenVentasProducto(db.Model):
+    """Ventas por día y producto (excluye pedidos cancelados)"""
+    __tablename__ = 'resumen_ventas_producto'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    producto_id = db.Column(db.Integer, primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumenVentasProducto {self.fecha} {self.producto_id}>'
+
+
+class ResumenVentasCategoria(db.Model):
+    """Ventas por día y categoría (excluye pedidos cancelados)"""
+    __tablename__ = 'resumen_ventas_categoria'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    categoria = db.Column(db.String(50), primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumenVentasCategoria {self.fecha} {self.categoria}>'
+
+
+class ResumenPedidosEstado(db.Model):
+    """Pedidos e importe total por estado"""
+    __tablename__ = 'resumen_pedidos_estado'
+
+    estado = db.Column(db.String(20), primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    importe = db.Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumenPedidosEstado {self.estado}>'
+
+
+class MarcaReporte(db.Model):
+    """High-water mark (cursor del outbox) hasta el que se han acumulado los resúmenes"""
+    __tablename__ = 'reporte_marcas'
+
+    nombre = db.Column(db.String(50), primary_key=True)
+    cursor = db.Column(db.Integer, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<MarcaReporte {self.nombre} {self.cursor}>'
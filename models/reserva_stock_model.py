@@ -0,0 +1,185 @@
+from flask import current_app
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from models.movimiento_stock_model import MovimientoStock
+from models.tarea_model import Tarea
+
+class ReservaStock(BaseModel, db.Model):
+    """Reserva temporal de stock durante el checkout
+
+    Al reservar se descuenta el stock (movimiento 'reserva'). Si la reserva se
+    convierte en pedido se registra la venta; si se libera o caduca, el stock
+    vuelve al producto (movimiento 'liberacion'). Las reservas vencidas las
+    libera la tarea 'expirar_reservas' (ver services/worker_service.py) o
+    `flask --app app stock expirar`.
+    """
+    __tablename__ = 'reservas_stock'
+
+    ESTADOS_VALIDOS = ['activa', 'confirmada', 'liberada', 'expirada']
+
+    # Máximo de reservas vencidas por transacción
+    TAMANO_LOTE = 500
+
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    cantidad = db.Column(db.Integer, nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='activa')
+    expira_en = db.Column(db.DateTime, nullable=False)
+    pedido_id = db.Column(db.Integer)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Índice para que el barrido encuentre las reservas vencidas sin recorrer la tabla
+    __table_args__ = (
+        db.Index('ix_reservas_stock_estado_expira', 'estado', 'expira_en'),
+    )
+
+    def __repr__(self):
+        return f'<ReservaStock {self.id} {self.estado}>'
+
+    @classmethod
+    def reserve(cls, producto_id, cantidad, usuario_id=None, ttl=None):
+        """Reservar stock durante `ttl` segundos (por defecto STOCK_RESERVATION_TTL)"""
+        try:
+            cantidad = int(cantidad)
+        except (ValueError, TypeError):
+            return None, "La cantidad debe ser un número entero válido"
+        if cantidad <= 0:
+            return None, "La cantidad debe ser mayor a 0"
+
+        ttl = ttl or current_app.config.get('STOCK_RESERVATION_TTL', 900)
+        try:
+            reserva = cls(
+                producto_id=producto_id,
+                usuario_id=usuario_id,
+                cantidad=cantidad,
+                estado='activa',
+                expira_en=datetime.utcnow() + timedelta(seconds=ttl)
+            )
+            db.session.add(reserva)
+            db.session.flush()
+
+            success, message = MovimientoStock.apply(
+                producto_id, -cantidad, 'reserva', reserva_id=reserva.id, commit=False
+            )
+            if not success:
+                db.session.rollback()
+                return None, message
+
+            # La tarea de barrido se programa para cuando vence la reserva
+            Tarea.enqueue('expirar_reservas', retraso=ttl, commit=False)
+            db.session.commit()
+            return reserva, "Stock reservado exitosamente"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f"Error al reservar stock: {str(e)}"
+
+    def _close(self, estado):
+        """Pasar la reserva de 'activa' a `estado` si nadie lo hizo antes (sin commit)"""
+        resultado = db.session.execute(
+            update(ReservaStock)
+            .where(ReservaStock.id == self.id, ReservaStock.estado == 'activa')
+            .values(estado=estado)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.expire(self, ['estado'])
+        return resultado.rowcount == 1
+
+    def release(self):
+        """Liberar la reserva y devolver el stock al producto"""
+        try:
+            if not self._close('liberada'):
+                db.session.rollback()
+                return False, f"La reserva no está activa (estado: {self.estado})"
+
+            success, message = MovimientoStock.apply(
+                self.producto_id, self.cantidad, 'liberacion', reserva_id=self.id, commit=False
+            )
+            if not success:
+                # La reserva sigue activa: no se cierra sin devolver su stock
+                db.session.rollback()
+                return False, f"Error al liberar reserva: {message}"
+            db.session.commit()
+            return True, "Reserva liberada exitosamente"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return False, f"Error al liberar reserva: {str(e)}"
+
+    def confirm(self, pedido_id):
+        """Convertir la reserva en la venta de un pedido (sin commit)
+
+        El stock ya se descontó al reservar: se registran la liberación de la
+        reserva y la salida del pedido, que se compensan en el saldo.
+        """
+        if self.expira_en < datetime.utcnow() or not self._close('confirmada'):
+            return False, "La reserva no está activa o ha caducado"
+
+        self.pedido_id = pedido_id
+        MovimientoStock.record(self.producto_id, 'liberacion', self.cantidad, reserva_id=self.id)
+        MovimientoStock.record(self.producto_id, 'pedido', -self.cantidad,
+                               pedido_id=pedido_id, reserva_id=self.id)
+        return True, "Reserva confirmada"
+
+    @classmethod
+    def expire_due(cls, tamano_lote=None, max_lotes=None):
+        """Liberar las reservas vencidas, lote a lote
+
+        Cada lote se bloquea con FOR UPDATE SKIP LOCKED y el UPDATE vuelve a
+        comprobar el estado, para que dos barridos simultáneos no devuelvan el
+        mismo stock dos veces. Devuelve (expiradas, mensaje).
+        """
+        tamano_lote = tamano_lote or cls.TAMANO_LOTE
+        total = 0
+        lotes = 0
+        try:
+            while max_lotes is None or lotes < max_lotes:
+                ahora = datetime.utcnow()
+                vencidas = (
+                    db.session.query(cls)
+                    .filter(cls.estado == 'activa', cls.expira_en <= ahora)
+                    .order_by(cls.expira_en, cls.id)
+                    .limit(tamano_lote)
+                    .with_for_update(skip_locked=True)
+                    .all()
+                )
+                if not vencidas:
+                    db.session.commit()
+                    break
+
+                expiradas = [r for r in vencidas if r._close('expirada')]
+                for reserva in expiradas:
+                    success, message = MovimientoStock.apply(
+                        reserva.producto_id, reserva.cantidad, 'liberacion',
+                        reserva_id=reserva.id, motivo='Reserva caducada', commit=False
+                    )
+                    if not success:
+                        db.session.rollback()
+                        return None, (f"Error al liberar la reserva {reserva.id} "
+                                      f"({total} ya liberadas): {message}")
+                db.session.commit()
+
+                total += len(expiradas)
+                lotes += 1
+                if len(vencidas) < tamano_lote:
+                    break
+
+            return total, f"{total} reserva(s) caducadas liberadas"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f"Error al expirar reservas: {str(e)}"
+
+    def to_dict(self):
+        """Convertir reserva a diccionario"""
+        return {
+            'id': self.id,
+            'producto_id': self.producto_id,
+            'usuario_id': self.usuario_id,
+            'cantidad': self.cantidad,
+            'estado': self.estado,
+            'expira_en': self.expira_en.isoformat() if self.expira_en else None,
+            'pedido_id': self.pedido_id,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None
+        }
@@ -0,0 +1,171 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy import (BigInteger, Column, Index, Integer, MetaData, Table, create_engine,
+                        delete, func, insert, select, update)
+from sqlalchemy.orm import Session
+
+
+class ShardRouter:
+    """Reparto de la tabla `pedidos` entre varias bases de datos por usuario_id
+
+    Sin shards configurados (PEDIDOS_SHARDS vacío) los pedidos siguen en la
+    base principal y nada cambia. Con N shards, los pedidos del usuario u
+    viven en el shard u % N. El id de cada pedido lleva su shard en los bits
+    bajos (id = secuencia * MAX_SHARDS + shard), así get_by_id también va a
+    un solo shard. Usuarios, productos, stock, outbox y tareas siguen en la
+    base principal.
+    """
+
+    MAX_SHARDS = 64
+
+    def __init__(self):
+        self.engines = []
+        self._pool = None
+        self._pid = None
+        self._tablas = None
+
+    @property
+    def enabled(self):
+        return bool(self.engines)
+
+    def configure(self, uris):
+        """Conectar con los shards indicados (lista de URIs; vacía = sin shards)"""
+        if len(uris) > self.MAX_SHARDS:
+            raise ValueError(f"Como máximo {self.MAX_SHARDS} shards")
+        self.dispose()
+        self.engines = [create_engine(uri) for uri in uris]
+
+    def dispose(self):
+        """Cerrar las conexiones y los hilos de los shards"""
+        for engine in self.engines:
+            engine.dispose()
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=True)
+        self.engines = []
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        """Hilos para consultar los shards en paralelo, propios de cada proceso
+
+        Tras un fork (`flask serve --workers N`) los hilos y las conexiones
+        del padre no sirven en el hijo: se crean de nuevo.
+        """
+        if self._pid != os.getpid():
+            for engine in self.engines:
+                engine.dispose(close=False)
+            self._pool = ThreadPoolExecutor(max_workers=len(self.engines),
+                                            thread_name_prefix='shard')
+            self._pid = os.getpid()
+        return self._pool
+
+    @property
+    def metadata(self):
+        return self._tables()[0]
+
+    @property
+    def pedidos(self):
+        return self._tables()[1]
+
+    @property
+    def secuencia(self):
+        return self._tables()[2]
+
+    def _tables(self):
+        """Esquema de cada shard: `pedidos` sin claves foráneas y su secuencia de ids"""
+        if self._tablas is not None:
+            return self._tablas
+        from models.pedido_model import Pedido
+
+        metadata = MetaData()
+        columnas = [
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable,
+                   autoincrement=False,
+                   server_default=c.server_default.arg if c.server_default is not None else None)
+            for c in Pedido.__table__.columns
+        ]
+        pedidos = Table('pedidos', metadata, *columnas)
+        Index('ix_pedidos_estado_fecha', pedidos.c.estado, pedidos.c.fecha_pedido)
+        Index('ix_pedidos_usuario_fecha', pedidos.c.usuario_id, pedidos.c.fecha_pedido)
+        secuencia = Table('secuencia_pedidos', metadata,
+                          Column('id', Integer, primary_key=True, autoincrement=False),
+                          Column('valor', BigInteger, nullable=False))
+        self._tablas = (metadata, pedidos, secuencia)
+        return self._tablas
+
+    def create_all(self):
+        """Crear el esquema en todos los shards (idempotente)"""
+        for engine in self.engines:
+            self.metadata.create_all(engine)
+            with engine.begin() as conexion:
+                existe = conexion.execute(
+                    select(func.count()).select_from(self.secuencia)
+                ).scalar()
+                if not existe:
+                    conexion.execute(insert(self.secuencia).values(id=1, valor=0))
+
+    def shard_for_user(self, usuario_id):
+        """Shard donde viven los pedidos del usuario"""
+        return int(usuario_id) % len(self.engines)
+
+    def shard_for_id(self, pedido_id):
+        """Shard de un pedido a partir de su id, o None si el id no es válido"""
+        indice = int(pedido_id) % self.MAX_SHARDS
+        return indice if indice < len(self.engines) else None
+
+    def next_id(self, indice):
+        """Reservar el siguiente id de pedido del shard
+
+        Se usa una transacción corta propia: el bloqueo de la secuencia no se
+        mantiene mientras se crea el pedido. Un pedido fallido deja un hueco.
+        """
+        with self.engines[indice].begin() as conexion:
+            conexion.execute(
+                update(self.secuencia).where(self.secuencia.c.id == 1)
+                .values(valor=self.secuencia.c.valor + 1)
+            )
+            valor = conexion.execute(
+                select(self.secuencia.c.valor).where(self.secuencia.c.id == 1)
+            ).scalar_one()
+        return valor * self.MAX_SHARDS + indice
+
+    @contextmanager
+    def session(self, indice):
+        """Sesión ligada a un shard; los objetos siguen legibles tras cerrarla"""
+        sesion = Session(bind=self.engines[indice], expire_on_commit=False)
+        try:
+            yield sesion
+        except Exception:
+            sesion.rollback()
+            raise
+        finally:
+            sesion.close()
+
+    def _run(self, indice, funcion):
+        with self.session(indice) as sesion:
+            return funcion(sesion)
+
+    def scatter(self, funcion):
+        """Ejecutar `funcion(sesion)` en todos los shards en paralelo
+
+        Devuelve la lista de resultados en el orden de los shards.
+        """
+        pool = self._executor()
+        futuros = [pool.submit(self._run, indice, funcion)
+                   for indice in range(len(self.engines))]
+        return [futuro.result() for futuro in futuros]
+
+    def delete_order(self, pedido_id):
+        """Borrar un pedido de su shard (compensación de una creación fallida)"""
+        with self.engines[self.shard_for_id(pedido_id)].begin() as conexion:
+            conexion.execute(delete(self.pedidos).where(self.pedidos.c.id == pedido_id))
+
+    def counts(self):
+        """Número de pedidos por shard"""
+        return self.scatter(
+            lambda sesion: sesion.execute(select(func.count()).select_from(self.pedidos)).scalar()
+        )
+
+
+shard_router = ShardRouter()
@@ -0,0 +1,168 @@
+from models import db
+from models.base_model import BaseModel
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update
+from sqlalchemy.exc import SQLAlchemyError
+import json
+import uuid
+
+class Tarea(BaseModel, db.Model):
+    """Cola de tareas en base de datos para el procesamiento en segundo plano"""
+    __tablename__ = 'tareas'
+
+    ESTADOS_VALIDOS = ['pendiente', 'en_proceso', 'completada', 'fallida']
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=5)
+    disponible_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    bloqueada_hasta = db.Column(db.DateTime)
+    token = db.Column(db.String(32), index=True)
+    trabajador = db.Column(db.String(100))
+    ultimo_error = db.Column(db.Text)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Tarea {self.id} {self.tipo}>'
+
+    @classmethod
+    def enqueue(cls, tipo, payload=None, retraso=0, max_intentos=5, commit=True):
+        """Encolar una tarea; con commit=False se agrega a la transacción actual"""
+        tarea = cls(
+            tipo=tipo,
+            payload=json.dumps(payload or {}),
+            estado='pendiente',
+            max_intentos=max_intentos,
+            disponible_en=datetime.utcnow() + timedelta(seconds=retraso)
+        )
+        if not commit:
+            db.session.add(tarea)
+            return tarea, "Tarea agregada a la transacción"
+
+        success, message = tarea.save()
+        if success:
+            return tarea, "Tarea encolada exitosamente"
+        return None, message
+
+    @classmethod
+    def claim(cls, trabajador, limite=1, lease_segundos=60):
+        """Reclamar hasta `limite` tareas disponibles con un lease temporal
+
+        En MySQL las filas candidatas se bloquean con
+        SELECT ... FOR UPDATE SKIP LOCKED para que los trabajadores no compitan
+        por las mismas filas. El UPDATE posterior vuelve a comprobar la
+        condición, por lo que en SQLite (que ignora FOR UPDATE) dos
+        trabajadores tampoco pueden reclamar la misma tarea.
+        """
+        ahora = datetime.utcnow()
+        reclamable = or_(
+            and_(cls.estado == 'pendiente', cls.disponible_en <= ahora),
+            and_(cls.estado == 'en_proceso', cls.bloqueada_hasta < ahora)
+        )
+
+        try:
+            candidatos = [
+                fila.id for fila in db.session.query(cls.id)
+                .filter(reclamable)
+                .order_by(cls.disponible_en, cls.id)
+                .limit(limite)
+                .with_for_update(skip_locked=True)
+                .all()
+            ]
+            if not candidatos:
+                db.session.commit()
+                return []
+
+            token = uuid.uuid4().hex
+            db.session.execute(
+                update(cls)
+                .where(cls.id.in_(candidatos), reclamable)
+                .values(
+                    estado='en_proceso',
+                    token=token,
+                    trabajador=trabajador,
+                    intentos=cls.intentos + 1,
+                    bloqueada_hasta=ahora + timedelta(seconds=lease_segundos),
+                    fecha_actualizacion=ahora
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            return cls.query.filter_by(token=token).order_by(cls.id).all()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            print(f"Error al reclamar tareas: {e}")
+            return []
+
+    def get_payload(self):
+        """Obtener el payload de la tarea como diccionario"""
+        return json.loads(self.payload or '{}')
+
+    def _finish(self, **valores):
+        """Guardar el resultado solo si la tarea sigue reclamada con el lease de esta instancia
+
+        Si el lease venció y otro trabajador volvió a reclamar la tarea, el
+        token ya no coincide y no se sobrescribe su estado.
+        """
+        reclamada = []
+
+        def aplicar():
+            resultado = db.session.execute(
+                update(Tarea)
+                .where(Tarea.id == self.id, Tarea.token == self.token,
+                       Tarea.estado == 'en_proceso')
+                .values(fecha_actualizacion=datetime.utcnow(), **valores)
+                .execution_options(synchronize_session=False)
+            )
+            reclamada[:] = [resultado.rowcount > 0]
+
+        success, message = self._write(aplicar, 'actualizado', 'actualizar')
+        if success and not reclamada[0]:
+            return False, "La tarea ya no pertenece a este trabajador (lease vencido)"
+        return success, message
+
+    def complete(self):
+        """Marcar la tarea como completada"""
+        return self._finish(estado='completada', bloqueada_hasta=None, ultimo_error=None)
+
+    def fail(self, error, backoff_base=5):
+        """Registrar un fallo; se reintenta con backoff exponencial hasta max_intentos"""
+        if self.intentos >= self.max_intentos:
+            return self._finish(estado='fallida', bloqueada_hasta=None, ultimo_error=str(error))
+
+        retraso = backoff_base * (2 ** max(self.intentos - 1, 0))
+        return self._finish(
+            estado='pendiente',
+            bloqueada_hasta=None,
+            ultimo_error=str(error),
+            disponible_en=datetime.utcnow() + timedelta(seconds=retraso)
+        )
+
+    @classmethod
+    def count_by_status(cls):
+        """Contar tareas por estado"""
+        try:
+            filas = db.session.query(cls.estado, db.func.count(cls.id)).group_by(cls.estado).all()
+            return {estado: total for estado, total in filas}
+        except SQLAlchemyError as e:
+            print(f"Error al contar tareas: {e}")
+            return {}
+
+    def to_dict(self):
+        """Convertir tarea a diccionario"""
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'payload': self.get_payload(),
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'max_intentos': self.max_intentos,
+            'disponible_en': self.disponible_en.isoformat() if self.disponible_en else None,
+            'ultimo_error': self.ultimo_error,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None
+        }
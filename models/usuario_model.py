@@ -1,8 +1,9 @@
 from models import db
 from models.base_model import BaseModel
 from datetime import datetime
-from sqlalchemy import Numeric
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import Numeric, event
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models.bloom_filter import email_filter
 
 class Usuario(BaseModel, db.Model):
     __tablename__ = 'usuarios'
@@ -13,8 +14,8 @@ class Usuario(BaseModel, db.Model):
     telefono = db.Column(db.String(20))
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relación con pedidos
-    pedidos = db.relationship('Pedido', backref='usuario', lazy=True)
+    # Relación con pedidos (carga diferida; ver BaseModel.eager para cargarla por adelantado)
+    pedidos = db.relationship('Pedido', backref='usuario', lazy='select')
     
     def __repr__(self):
         return f'<Usuario {self.nombre}>'
@@ -30,23 +31,32 @@ class Usuario(BaseModel, db.Model):
             
             if not email or '@' not in email:
                 return None, "El email no es válido"
+            email = email.strip().lower()
             
-            # Verificar si el email ya existe
-            if cls.get_by_email(email):
-                return None, "El email ya está registrado"
+            # Verificar si el email ya existe, salvo que el filtro de Bloom
+            # asegure que es nuevo: entonces decide la restricción UNIQUE
+            nuevo = email_filter.definitely_new(email)
+            if not nuevo:
+                if cls.get_by_email(email):
+                    return None, "El email ya está registrado"
+                email_filter.record_false_positive()
             
             # Crear usuario
             usuario = cls(
                 nombre=nombre.strip(),
-                email=email.strip().lower(),
+                email=email,
                 telefono=telefono.strip() if telefono else None
             )
             
             success, message = usuario.save()
             if success:
                 return usuario, "Usuario creado exitosamente"
-            else:
-                return None, message
+            if cls.get_by_email(email):
+                # Alta simultánea del mismo email (IntegrityError en el INSERT)
+                if nuevo:
+                    email_filter.record_conflict()
+                return None, "El email ya está registrado"
+            return None, message
                 
         except Exception as e:
             return None, f"Error inesperado: {str(e)}"
@@ -70,8 +80,25 @@ class Usuario(BaseModel, db.Model):
             return []
     
     def get_pedidos(self):
-        """Obtener todos los pedidos del usuario"""
-        return self.pedidos
+        """Obtener todos los pedidos del usuario
+        
+        Con shards la relación `pedidos` no ve los pedidos (están en otra
+        base): se leen del shard del usuario con Pedido.get_by_user.
+        """
+        from models.pedido_model import Pedido
+        return Pedido.get_by_user(self.id)
+    
+    def delete(self):
+        """Eliminar el usuario solo si ningún pedido lo referencia (ver Pedido.has_orders)"""
+        from models.pedido_model import Pedido
+        
+        try:
+            if Pedido.has_orders(usuario_id=self.id):
+                return False, "El usuario tiene pedidos y no se puede eliminar"
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return False, f"Error al eliminar: {str(e)}"
+        return super().delete()
     
     def to_dict(self):
         """Convertir usuario a diccionario"""
@@ -81,4 +108,17 @@ class Usuario(BaseModel, db.Model):
             'email': self.email,
             'telefono': self.telefono,
             'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(Usuario, 'after_insert')
+def _add_to_email_filter(mapper, connection, usuario):
+    """Mantener el filtro de emails al día con las altas"""
+    email_filter.add(usuario.email)
+
+
+@event.listens_for(Usuario, 'after_update')
+def _update_email_filter(mapper, connection, usuario):
+    """Añadir el nuevo email cuando un usuario lo cambia"""
+    if db.inspect(usuario).attrs.email.history.has_changes():
+        email_filter.add(usuario.email)
@@ -2,6 +2,8 @@ from flask import Blueprint
 from controllers.usuario_controller import UsuarioController
 from controllers.producto_controller import ProductoController
 from controllers.pedido_controller import PedidoController
+from controllers.reporte_controller import ReporteController
+from controllers.stock_controller import StockController
 
 main = Blueprint('main', __name__)
 
@@ -10,16 +12,22 @@ main = Blueprint('main', __name__)
 def index():
     """Dashboard principal con estadísticas"""
     try:
-        # Obtener estadísticas de cada controller
-        usuario_stats = UsuarioController.get_stats()
-        producto_stats = ProductoController.get_stats()
-        pedido_stats = PedidoController.get_stats()
+        # Estadísticas de cada controller en paralelo, con presupuesto de tiempo
+        from services.dashboard_service import dashboard
+        panel = dashboard.fetch({
+            'usuarios': UsuarioController.get_stats,
+            'productos': ProductoController.get_stats,
+            'pedidos': PedidoController.get_stats
+        })
+        datos = panel['datos']
         
         from flask import render_template
         return render_template('index.html',
-                             usuarios=usuario_stats['total_usuarios'],
-                             productos=producto_stats['total_productos'],
-                             pedidos=pedido_stats['total_pedidos'])
+                             usuarios=(datos['usuarios'] or {}).get('total_usuarios', 0),
+                             productos=(datos['productos'] or {}).get('total_productos', 0),
+                             pedidos=(datos['pedidos'] or {}).get('total_pedidos', 0),
+                             estado=panel['estado'],
+                             edad=panel['edad_s'])
     except Exception as e:
         from flask import render_template, flash
         flash(f'Error al cargar dashboard: {str(e)}', 'error')
@@ -83,11 +91,21 @@ def actualizar_estado_pedido():
     """Actualizar estado de un pedido"""
     return PedidoController.update_status()
 
+@main.route('/pedidos/actualizar-estado-masivo', methods=['POST'])
+def actualizar_estado_pedidos_masivo():
+    """Actualizar estado de muchos pedidos a la vez"""
+    return PedidoController.bulk_update_status()
+
 @main.route('/pedidos/cancelar', methods=['POST'])
 def cancelar_pedido():
     """Cancelar un pedido"""
     return PedidoController.cancel()
 
+@main.route('/pedidos/cancelar-masivo', methods=['POST'])
+def cancelar_pedidos_masivo():
+    """Cancelar muchos pedidos a la vez"""
+    return PedidoController.bulk_cancel()
+
 # ==================== RUTAS API (Opcional) ====================
 @main.route('/api/usuarios')
 def api_usuarios():
@@ -100,14 +118,29 @@ def api_usuarios():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/usuarios/filtro/stats')
+def api_filtro_emails_stats():
+    """Memoria del filtro de emails y consultas que ahorró en las altas"""
+    from flask import jsonify
+    from models.bloom_filter import email_filter
+    return jsonify(email_filter.stats())
+
+@main.route('/api/usuarios/<int:usuario_id>/pedidos')
+def api_pedidos_usuario(usuario_id):
+    """Historial paginado de pedidos de un usuario con sus productos"""
+    return PedidoController.user_history_api(usuario_id)
+
 @main.route('/api/productos')
 def api_productos():
     """API endpoint para productos"""
     from flask import jsonify
     try:
         from models.producto_model import Producto
-        productos = Producto.get_all()
-        return jsonify([producto.to_dict() for producto in productos])
+        from services.singleflight_service import single_flight
+        productos = single_flight.do(
+            'api.productos', lambda: [producto.to_dict() for producto in Producto.get_all()]
+        )
+        return jsonify(productos)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -117,7 +150,73 @@ def api_pedidos():
     from flask import jsonify
     try:
         from models.pedido_model import Pedido
-        pedidos = Pedido.get_all()
+        from flask import request
+        pedidos = Pedido.get_all(include_archived=request.args.get('archivados') == '1')
         return jsonify([pedido.to_dict() for pedido in pedidos])
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/pedidos/changes')
+def api_pedidos_changes():
+    """Feed de cambios de pedidos (long-polling o Server-Sent Events)"""
+    return PedidoController.changes()
+
+@main.route('/api/cache/stats')
+def api_cache_stats():
+    """Contadores de la caché de fragmentos"""
+    from flask import jsonify
+    from services.cache_service import fragment_cache
+    return jsonify(fragment_cache.stats())
+
+@main.route('/api/singleflight/stats')
+def api_singleflight_stats():
+    """Lecturas calculadas y coalescidas por single-flight"""
+    from flask import jsonify
+    from services.singleflight_service import single_flight
+    return jsonify(single_flight.stats())
+
+@main.route('/api/ratelimit/stats')
+def api_ratelimit_stats():
+    """Peticiones de escritura admitidas y rechazadas (429)"""
+    from flask import jsonify
+    from services.ratelimit_service import admission_control
+    return jsonify(admission_control.stats())
+
+@main.route('/api/db/stats')
+def api_db_stats():
+    """Conflictos de bloqueo optimista y reintentos de escrituras"""
+    from flask import jsonify
+    from models.base_model import get_write_stats
+    return jsonify(get_write_stats())
+
+# ==================== RUTAS STOCK ====================
+@main.route('/api/reservas', methods=['POST'])
+def api_reservar_stock():
+    """Reservar stock durante el checkout"""
+    return StockController.reserve()
+
+@main.route('/api/reservas/<int:reserva_id>/liberar', methods=['POST'])
+def api_liberar_reserva(reserva_id):
+    """Liberar una reserva de stock"""
+    return StockController.release(reserva_id)
+
+@main.route('/api/stock/ajustes', methods=['POST'])
+def api_ajuste_masivo_stock():
+    """Fijar o corregir el stock de muchos productos tras un recuento"""
+    return StockController.bulk_adjust()
+
+@main.route('/api/productos/<int:producto_id>/movimientos')
+def api_movimientos_stock(producto_id):
+    """Libro de movimientos de stock de un producto"""
+    return StockController.movements(producto_id)
+
+# ==================== RUTAS REPORTES ====================
+@main.route('/api/reportes/ventas')
+def api_reporte_ventas():
+    """Reporte de ventas agrupado (dia, semana, producto, categoria)"""
+    return ReporteController.ventas()
+
+@main.route('/api/reportes/estados')
+def api_reporte_estados():
+    """Reporte de pedidos por estado"""
+    return ReporteController.estados()
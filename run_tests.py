@@ -1,83 +1,165 @@
 #!/usr/bin/env python3
 """
 Script para ejecutar todos los tests del proyecto
+
+Los módulos de test se reparten entre varios procesos; cada proceso usa su
+propia base de datos de pruebas (ver tests/database.py).
+
+    python run_tests.py                 # un proceso por CPU
+    python run_tests.py -j 1            # en serie
+    python run_tests.py --lentos 20     # mostrar los 20 tests más lentos
 """
 
-import unittest
-import sys
+import argparse
+import glob
 import os
+import sys
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
 from io import StringIO
 
-def run_tests():
-    """Ejecutar todos los tests unitarios"""
-    # Configurar el path
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    sys.path.insert(0, project_root)
-    
-    # Descubrir y ejecutar tests
-    loader = unittest.TestLoader()
-    start_dir = os.path.join(project_root, 'tests')
-    suite = loader.discover(start_dir, pattern='test_*.py')
-    
-    # Ejecutar tests con reporte detallado
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Resultado que además mide la duración de cada test"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = []
+        self._inicio = None
+
+    def startTest(self, test):
+        self._inicio = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.durations.append((test.id(), time.perf_counter() - self._inicio))
+
+
+def discover_modules(start_dir, pattern):
+    """Nombres de módulo de los archivos de test, p. ej. tests.test_models.test_pedido_model"""
+    rutas = glob.glob(os.path.join(start_dir, '**', pattern), recursive=True)
+    return sorted(
+        os.path.relpath(ruta, PROJECT_ROOT)[:-3].replace(os.sep, '.')
+        for ruta in rutas
+    )
+
+
+def run_module(nombre):
+    """Ejecutar los tests de un módulo y devolver un resumen serializable"""
+    sys.path.insert(0, PROJECT_ROOT)
     stream = StringIO()
     runner = unittest.TextTestRunner(
         stream=stream,
         verbosity=2,
-        failfast=False
+        failfast=False,
+        resultclass=TimedTextTestResult
     )
-    
+    suite = unittest.TestLoader().loadTestsFromName(nombre)
+    result = runner.run(suite)
+    return {
+        'modulo': nombre,
+        'salida': stream.getvalue(),
+        'ejecutados': result.testsRun,
+        'fallos': [(str(test), traceback) for test, traceback in result.failures],
+        'errores': [(str(test), traceback) for test, traceback in result.errors],
+        'omitidos': len(result.skipped),
+        'duraciones': result.durations
+    }
+
+
+def run_tests(procesos=None, lentos=10, pattern='test_*.py'):
+    """Ejecutar todos los tests unitarios"""
+    # Configurar el path
+    sys.path.insert(0, PROJECT_ROOT)
+
+    # Descubrir los módulos de test
+    start_dir = os.path.join(PROJECT_ROOT, 'tests')
+    modulos = discover_modules(start_dir, pattern)
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(modulos) or 1))
+
     print("🧪 Ejecutando Tests Unitarios...")
+    print(f"📦 {len(modulos)} módulo(s) en {procesos} proceso(s)")
     print("=" * 50)
-    
-    result = runner.run(suite)
-    
+
+    inicio = time.perf_counter()
+    if procesos == 1:
+        resultados = [run_module(nombre) for nombre in modulos]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(run_module, modulos))
+    total_segundos = time.perf_counter() - inicio
+
     # Mostrar resultados
-    output = stream.getvalue()
-    print(output)
-    
+    for resultado in resultados:
+        print(resultado['salida'])
+
+    ejecutados = sum(r['ejecutados'] for r in resultados)
+    failures = [f for r in resultados for f in r['fallos']]
+    errors = [e for r in resultados for e in r['errores']]
+    omitidos = sum(r['omitidos'] for r in resultados)
+    duraciones = sorted((d for r in resultados for d in r['duraciones']),
+                        key=lambda d: d[1], reverse=True)
+
     # Resumen final
     print("\n" + "=" * 50)
     print("📊 RESUMEN DE TESTS")
     print("=" * 50)
-    print(f"✅ Tests ejecutados: {result.testsRun}")
-    print(f"❌ Fallos: {len(result.failures)}")
-    print(f"🚫 Errores: {len(result.errors)}")
-    print(f"⏭️  Omitidos: {len(result.skipped)}")
-    
-    if result.failures:
+    print(f"✅ Tests ejecutados: {ejecutados}")
+    print(f"❌ Fallos: {len(failures)}")
+    print(f"🚫 Errores: {len(errors)}")
+    print(f"⏭️  Omitidos: {omitidos}")
+    print(f"⏱️  Tiempo total: {total_segundos:.2f}s")
+
+    if lentos and duraciones:
+        print(f"\n🐢 {min(lentos, len(duraciones))} TESTS MÁS LENTOS:")
+        for test_id, segundos in duraciones[:lentos]:
+            print(f"  {segundos * 1000:8.1f} ms  {test_id}")
+
+    if failures:
         print("\n❌ FALLOS:")
-        for test, traceback in result.failures:
+        for test, traceback in failures:
             try:
                 error_msg = traceback.split('AssertionError: ')[-1].split('\n')[0]
                 print(f"  - {test}: {error_msg}")
             except (IndexError, AttributeError):
                 print(f"  - {test}: Error en el test")
-    
-    if result.errors:
+
+    if errors:
         print("\n🚫 ERRORES:")
-        for test, traceback in result.errors:
+        for test, traceback in errors:
             try:
                 error_lines = traceback.split('\n')
                 error_msg = error_lines[-2] if len(error_lines) > 1 else "Error desconocido"
                 print(f"  - {test}: {error_msg}")
             except (IndexError, AttributeError):
                 print(f"  - {test}: Error en el test")
-    
+
     # Calcular porcentaje de éxito
-    if result.testsRun > 0:
-        success_rate = ((result.testsRun - len(result.failures) - len(result.errors)) / result.testsRun) * 100
+    if ejecutados > 0:
+        success_rate = ((ejecutados - len(failures) - len(errors)) / ejecutados) * 100
         print(f"\n🎯 Tasa de éxito: {success_rate:.1f}%")
-        
+
         if success_rate == 100:
             print("🎉 ¡Todos los tests pasaron!")
         elif success_rate >= 80:
             print("✨ ¡Buen trabajo! La mayoría de tests pasaron.")
         else:
             print("⚠️  Necesitas revisar algunos tests.")
-    
-    return result.wasSuccessful()
+
+    return not failures and not errors
 
 if __name__ == '__main__':
-    success = run_tests()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Ejecutar los tests del proyecto')
+    parser.add_argument('-j', '--procesos', type=int, default=None,
+                        help='Procesos en paralelo (por defecto, uno por CPU)')
+    parser.add_argument('--lentos', type=int, default=10,
+                        help='Cuántos de los tests más lentos mostrar (0 = ninguno)')
+    parser.add_argument('-p', '--pattern', default='test_*.py',
+                        help='Patrón de los archivos de test')
+    args = parser.parse_args()
+    success = run_tests(args.procesos, args.lentos, args.pattern)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,144 @@
+"""
+Archivado de pedidos cerrados
+
+Mueve los pedidos entregados o cancelados con más de ARCHIVE_AFTER_DAYS días
+desde `pedidos` a `pedidos_archivo` en lotes pequeños, cada uno en su propia
+transacción, para que la tabla activa y sus índices se mantengan pequeños sin
+bloqueos largos:
+
+    flask --app app archivo run --dias 180
+    flask --app app archivo particiones --desde 2020 --hasta 2027 [--ejecutar]
+
+Con shards (PEDIDOS_SHARDS) los pedidos no están en la base principal y el
+archivado no está disponible: mover filas entre bases distintas no se puede
+hacer en una sola transacción.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+from models.pedido_model import Pedido
+from models.pedido_archivado_model import PedidoArchivado
+from models.shard_router import shard_router
+
+
+def archive_batch(corte, tamano_lote=500):
+    """Archivar un lote de pedidos cerrados anteriores a `corte`
+
+    Devuelve (archivados, mensaje); archivados es None si hubo un error.
+    """
+    if shard_router.enabled:
+        return None, "Con shards de pedidos el archivado no está disponible"
+    try:
+        ids = [
+            fila.id for fila in db.session.query(Pedido.id)
+            .filter(Pedido.estado.in_(Pedido.ESTADOS_CERRADOS), Pedido.fecha_pedido < corte)
+            .order_by(Pedido.id)
+            .limit(tamano_lote)
+            .with_for_update(skip_locked=True)
+            .all()
+        ]
+        if not ids:
+            db.session.commit()
+            return 0, "No hay pedidos para archivar"
+
+        columnas = PedidoArchivado.COLUMNAS_COPIADAS
+        cerrados = [Pedido.id.in_(ids), Pedido.estado.in_(Pedido.ESTADOS_CERRADOS)]
+
+        # INSERT ... SELECT y DELETE en la misma transacción
+        db.session.execute(
+            insert(PedidoArchivado).from_select(
+                columnas,
+                select(*[getattr(Pedido, c) for c in columnas]).where(*cerrados)
+            )
+        )
+        resultado = db.session.execute(
+            delete(Pedido).where(*cerrados).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return resultado.rowcount, f"{resultado.rowcount} pedido(s) archivados"
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return None, f"Error al archivar pedidos: {str(e)}"
+
+
+def archive_closed_orders(dias=None, tamano_lote=None, max_lotes=None, pausa=None):
+    """Archivar pedidos cerrados más antiguos que `dias`, lote a lote
+
+    Entre lotes se hace una pausa corta para no acaparar la base de datos.
+    Devuelve (total_archivados, mensaje).
+    """
+    config = current_app.config
+    dias = dias if dias is not None else config.get('ARCHIVE_AFTER_DAYS', 180)
+    tamano_lote = tamano_lote or config.get('ARCHIVE_BATCH_SIZE', 500)
+    pausa = pausa if pausa is not None else config.get('ARCHIVE_PAUSE_SECONDS', 0.1)
+    corte = datetime.utcnow() - timedelta(days=dias)
+
+    total = 0
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        archivados, message = archive_batch(corte, tamano_lote)
+        if archivados is None:
+            return total, message
+        total += archivados
+        lotes += 1
+        if archivados < tamano_lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+
+    return total, f"{total} pedido(s) archivados en {lotes} lote(s)"
+
+
+def mysql_partition_ddl(desde, hasta):
+    """DDL para particionar `pedidos_archivo` por año de fecha_pedido en MySQL"""
+    particiones = [
+        f"PARTITION p{anio} VALUES LESS THAN (TO_DAYS('{anio + 1}-01-01'))"
+        for anio in range(desde, hasta + 1)
+    ]
+    particiones.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return (
+        f"ALTER TABLE {PedidoArchivado.__tablename__} "
+        f"PARTITION BY RANGE (TO_DAYS(fecha_pedido)) (\n    "
+        + ",\n    ".join(particiones)
+        + "\n)"
+    )
+
+
+def init_app(app):
+    """Registrar los comandos `flask archivo run|particiones`"""
+
+    @app.cli.group('archivo')
+    def archivo():
+        """Archivado de pedidos cerrados"""
+
+    @archivo.command('run')
+    @click.option('--dias', type=int, default=None, help='Antigüedad mínima en días')
+    @click.option('--lote', type=int, default=None, help='Pedidos por transacción')
+    @click.option('--max-lotes', type=int, default=None, help='Máximo de lotes a procesar')
+    def run_command(dias, lote, max_lotes):
+        """Mover pedidos cerrados antiguos a la tabla de archivo"""
+        total, message = archive_closed_orders(dias=dias, tamano_lote=lote, max_lotes=max_lotes)
+        click.echo(message)
+
+    @archivo.command('particiones')
+    @click.option('--desde', type=int, required=True, help='Primer año')
+    @click.option('--hasta', type=int, required=True, help='Último año')
+    @click.option('--ejecutar', is_flag=True, help='Aplicar el DDL (solo MySQL)')
+    def partitions_command(desde, hasta, ejecutar):
+        """Mostrar o aplicar el particionado por rango de fecha_pedido"""
+        ddl = mysql_partition_ddl(desde, hasta)
+        click.echo(ddl)
+        if ejecutar:
+            if db.engine.dialect.name != 'mysql':
+                click.echo("El particionado solo está disponible en MySQL")
+                return
+            with db.engine.begin() as conexion:
+                conexion.execute(text(ddl))
+            click.echo("Particiones aplicadas")
@@ -0,0 +1,131 @@
+"""
+Archivos estáticos con huella de contenido
+
+Al arrancar (o con `flask --app app assets build`) cada archivo de `static/` se
+copia a `static/dist/` con el hash de su contenido en el nombre, junto con sus
+variantes comprimidas (.gz y, si está instalado el paquete `brotli`, .br).
+`url_for('static', filename='style.css')` pasa a generar la URL con hash, y
+esas URLs se sirven con la variante comprimida que acepte el cliente y con
+`Cache-Control: immutable`, ya que su contenido no cambia nunca.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+DIRECTORIO_DIST = 'dist'
+MANIFIESTO = 'manifest.json'
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _hash_file(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(65536), b''):
+            sha.update(bloque)
+    return sha.hexdigest()[:12]
+
+
+def build_assets(static_folder):
+    """Generar las copias con hash y sus variantes comprimidas
+
+    Devuelve el manifiesto {nombre_original: nombre_con_hash}, que también se
+    guarda en static/dist/manifest.json.
+    """
+    destino = os.path.join(static_folder, DIRECTORIO_DIST)
+    os.makedirs(destino, exist_ok=True)
+    manifiesto = {}
+
+    for raiz, directorios, archivos in os.walk(static_folder):
+        if os.path.abspath(raiz) == os.path.abspath(destino):
+            directorios[:] = []
+            continue
+        directorios[:] = [d for d in directorios
+                          if os.path.abspath(os.path.join(raiz, d)) != os.path.abspath(destino)]
+        for archivo in archivos:
+            origen = os.path.join(raiz, archivo)
+            relativo = os.path.relpath(origen, static_folder).replace(os.sep, '/')
+            base, extension = os.path.splitext(relativo)
+            con_hash = f"{DIRECTORIO_DIST}/{base}.{_hash_file(origen)}{extension}"
+            salida = os.path.join(static_folder, con_hash)
+
+            if not os.path.exists(salida):
+                os.makedirs(os.path.dirname(salida), exist_ok=True)
+                shutil.copyfile(origen, salida)
+                if extension in EXTENSIONES_COMPRIMIBLES:
+                    with open(origen, 'rb') as f:
+                        contenido = f.read()
+                    with open(salida + '.gz', 'wb') as f:
+                        f.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        with open(salida + '.br', 'wb') as f:
+                            f.write(brotli.compress(contenido))
+
+            manifiesto[relativo] = con_hash
+
+    with open(os.path.join(destino, MANIFIESTO), 'w') as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    return manifiesto
+
+
+def _rewrite_static_urls(endpoint, values):
+    """url_defaults: cambiar `filename` por su versión con hash"""
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    manifiesto = current_app.extensions.get('assets_manifest', {})
+    con_hash = manifiesto.get(values['filename'])
+    if con_hash:
+        values['filename'] = con_hash
+
+
+def _serve_static(filename):
+    """Servir estáticos; los archivos con hash usan la variante precomprimida"""
+    app = current_app
+    if not filename.startswith(DIRECTORIO_DIST + '/'):
+        return app.send_static_file(filename)
+
+    aceptadas = request.accept_encodings
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for extension, codificacion in (('.br', 'br'), ('.gz', 'gzip')):
+        variante = filename + extension
+        if aceptadas[codificacion] and os.path.exists(os.path.join(app.static_folder, variante)):
+            respuesta = send_from_directory(app.static_folder, variante, mimetype=mimetype)
+            respuesta.headers['Content-Encoding'] = codificacion
+            break
+    else:
+        respuesta = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+
+    respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    return respuesta
+
+
+def init_app(app):
+    """Generar los assets y reemplazar la vista de estáticos de Flask"""
+    if app.config.get('ASSETS_FINGERPRINT', True) and app.static_folder:
+        app.extensions['assets_manifest'] = build_assets(app.static_folder)
+        app.url_defaults(_rewrite_static_urls)
+        app.view_functions['static'] = _serve_static
+
+    @app.cli.group('assets')
+    def assets():
+        """Archivos estáticos con huella de contenido"""
+
+    @assets.command('build')
+    def build_command():
+        """Generar static/dist con los archivos con hash y comprimidos"""
+        manifiesto = build_assets(app.static_folder)
+        for original, con_hash in sorted(manifiesto.items()):
+            click.echo(f"{original} -> {con_hash}")
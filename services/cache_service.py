@@ -0,0 +1,171 @@
+"""
+Caché de fragmentos HTML y de bytecode de Jinja
+
+Los fragmentos (por ejemplo el cuerpo de la tabla de productos) se guardan con
+una clave formada por el nombre, los parámetros de la consulta y la versión de
+las tablas de las que dependen. Cada commit que modifica una tabla incrementa
+su versión, por lo que las entradas afectadas dejan de usarse. Las versiones
+son locales al proceso; con varios procesos FRAGMENT_CACHE_TTL limita cuánto
+puede tardar un proceso en ver los cambios hechos por otro.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from services.runtime_dir import private_dir
+from services.singleflight_service import single_flight
+
+# Versión por tabla, incrementada en cada commit que la modifica
+_versiones = {}
+_lock = threading.Lock()
+
+# Funciones a las que se avisa con las tablas modificadas en cada commit
+_observadores = []
+
+
+def table_version(tabla):
+    """Versión actual de una tabla"""
+    return _versiones.get(tabla, 0)
+
+
+def bump_tables(tablas):
+    """Invalidar los fragmentos que dependen de las tablas indicadas"""
+    with _lock:
+        for tabla in tablas:
+            _versiones[tabla] = _versiones.get(tabla, 0) + 1
+    for observador in list(_observadores):
+        observador(tablas)
+
+
+def on_tables_changed(observador):
+    """Llamar a `observador(tablas)` tras cada commit que modifica tablas"""
+    if observador not in _observadores:
+        _observadores.append(observador)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    tablas = session.info.setdefault('tablas_modificadas', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tabla = getattr(obj, '__tablename__', None)
+        if tabla:
+            tablas.add(tabla)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    # UPDATE/DELETE/INSERT masivos que no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        tabla = getattr(orm_execute_state.statement, 'table', None)
+        if tabla is not None:
+            orm_execute_state.session.info.setdefault('tablas_modificadas', set()).add(tabla.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    tablas = session.info.pop('tablas_modificadas', None)
+    if tablas:
+        bump_tables(tablas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('tablas_modificadas', None)
+
+
+class FragmentCache:
+    """Caché LRU en memoria de fragmentos renderizados, con contadores de aciertos"""
+
+    def __init__(self, max_entradas=256, ttl=60):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.habilitada = True
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entradas=None, ttl=None, habilitada=None):
+        """Ajustar la configuración (se llama desde init_app)"""
+        if max_entradas is not None:
+            self.max_entradas = max_entradas
+        if ttl is not None:
+            self.ttl = ttl
+        if habilitada is not None:
+            self.habilitada = habilitada
+
+    def get_or_render(self, nombre, tablas, params, render):
+        """Devolver el fragmento cacheado o generarlo con `render()`
+
+        `tablas` son las tablas de las que depende el fragmento y `params` los
+        parámetros de la petición que cambian su contenido.
+        """
+        if not self.habilitada:
+            return render()
+
+        clave = (
+            nombre,
+            tuple(sorted((k, v) for k, v in (params or {}).items())),
+            tuple((tabla, table_version(tabla)) for tabla in tablas)
+        )
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and (not self.ttl or ahora - entrada[0] < self.ttl):
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+
+        # Los fallos simultáneos de la misma entrada comparten un solo render
+        valor = single_flight.do(f"fragmento:{clave!r}", render)
+        with self._lock:
+            self._entradas[clave] = (ahora, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def clear(self):
+        """Vaciar la caché y reiniciar los contadores"""
+        with self._lock:
+            self._entradas.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Contadores de aciertos y fallos"""
+        total = self.hits + self.misses
+        return {
+            'entradas': len(self._entradas),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'versiones': dict(_versiones)
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def init_app(app):
+    """Configurar la caché de fragmentos y la caché de bytecode de Jinja"""
+    fragment_cache.configure(
+        max_entradas=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 256),
+        ttl=app.config.get('FRAGMENT_CACHE_TTL', 60),
+        habilitada=app.config.get('FRAGMENT_CACHE_ENABLED', True)
+    )
+
+    # Las plantillas compiladas se guardan en disco y los procesos nuevos
+    # las cargan sin volver a compilarlas. El bytecode se ejecuta al cargarlo:
+    # sin directorio configurado se usa el privado por usuario de Jinja
+    # (permisos 0700), y uno configurado debe ser del usuario del proceso
+    directorio = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directorio:
+        directorio = private_dir('jinja', directorio)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directorio)
@@ -0,0 +1,346 @@
+"""
+Instantánea del catálogo de productos en un archivo mapeado en memoria
+
+En lugar de que cada proceso del servidor cargue sus propios objetos Producto,
+el catálogo (id, nombre, precio, stock, categoria) se escribe en un archivo
+binario compacto que todos los procesos mapean con mmap: las páginas se
+comparten entre procesos y las filas solo se convierten en objetos Python al
+leerlas.
+
+    cabecera | filas (tamaño fijo) | índice id -> fila | categorías |
+    filas por categoría | textos UTF-8
+
+La búsqueda por id es O(1) (índice denso por id) y por categoría O(k) (filas
+agrupadas por categoría). Cada commit que modifica `productos` incrementa un
+contador de generación compartido (otro archivo mapeado de 8 bytes); la
+instantánea se reconstruye en la siguiente lectura si su generación no es la
+actual, una sola vez entre todos los procesos gracias a un bloqueo de archivo.
+
+Los archivos (.bin, .gen y .lock) se guardan en CATALOG_SNAPSHOT_PATH o, sin
+ella, en el directorio privado del usuario (ver services/runtime_dir.py). En
+ambos casos el directorio debe pertenecer al usuario del proceso y no admitir
+escritura de otros: una instantánea ajena se leería como propia.
+
+    flask --app app catalogo reconstruir
+    flask --app app catalogo info
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+from decimal import Decimal
+
+import click
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import db
+from models.producto_model import Producto
+from services.cache_service import on_tables_changed
+from services.runtime_dir import private_dir
+
+MAGIC = b'CATALOG1'
+# magic, generación, filas, id máximo, categorías, offsets de cada sección
+CABECERA = struct.Struct('<8sqIIIIIII')
+# id, precio en céntimos, stock, categoría, offset y longitud del nombre
+FILA = struct.Struct('<iqiIIH')
+# offset y longitud del nombre, primera posición y cantidad en filas por categoría
+CATEGORIA = struct.Struct('<IHII')
+GENERACION = struct.Struct('<q')
+SIN_CATEGORIA = 0xFFFFFFFF
+
+
+class ProductoCatalogo(namedtuple('ProductoCatalogo', 'id nombre precio stock categoria')):
+    """Fila de solo lectura de la instantánea del catálogo"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Convertir producto a diccionario"""
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'precio': float(self.precio),
+            'stock': self.stock,
+            'categoria': self.categoria
+        }
+
+
+def build_snapshot(productos, generacion):
+    """Bytes de la instantánea para filas (id, nombre, precio, stock, categoria)"""
+    productos = sorted(productos, key=lambda p: p[0])
+    textos = bytearray()
+    offsets_texto = {}
+
+    def texto(valor):
+        if valor not in offsets_texto:
+            codificado = valor.encode('utf-8')[:0xFFFF]
+            offsets_texto[valor] = (len(textos), len(codificado))
+            textos.extend(codificado)
+        return offsets_texto[valor]
+
+    nombres_categoria = sorted({p[4] for p in productos if p[4] is not None})
+    indice_categoria = {nombre: i for i, nombre in enumerate(nombres_categoria)}
+    filas_por_categoria = {nombre: [] for nombre in nombres_categoria}
+    max_id = productos[-1][0] if productos else 0
+
+    filas = bytearray(FILA.size * len(productos))
+    indice_id = [-1] * (max_id + 1)
+    for posicion, (id_, nombre, precio, stock, categoria) in enumerate(productos):
+        offset, longitud = texto(nombre or '')
+        centimos = int((Decimal(str(precio)) * 100).to_integral_value())
+        FILA.pack_into(filas, posicion * FILA.size, id_, centimos, stock or 0,
+                       indice_categoria.get(categoria, SIN_CATEGORIA), offset, longitud)
+        indice_id[id_] = posicion
+        if categoria is not None:
+            filas_por_categoria[categoria].append(posicion)
+
+    categorias = bytearray(CATEGORIA.size * len(nombres_categoria))
+    agrupadas = []
+    for i, nombre in enumerate(nombres_categoria):
+        offset, longitud = texto(nombre)
+        CATEGORIA.pack_into(categorias, i * CATEGORIA.size, offset, longitud,
+                            len(agrupadas), len(filas_por_categoria[nombre]))
+        agrupadas.extend(filas_por_categoria[nombre])
+
+    off_filas = CABECERA.size
+    off_indice = off_filas + len(filas)
+    off_categorias = off_indice + 4 * len(indice_id)
+    off_agrupadas = off_categorias + len(categorias)
+    off_textos = off_agrupadas + 4 * len(agrupadas)
+    cabecera = CABECERA.pack(MAGIC, generacion, len(productos), max_id, len(nombres_categoria),
+                             off_indice, off_categorias, off_agrupadas, off_textos)
+    return b''.join([
+        cabecera, bytes(filas), struct.pack(f'<{len(indice_id)}i', *indice_id),
+        bytes(categorias), struct.pack(f'<{len(agrupadas)}I', *agrupadas), bytes(textos)
+    ])
+
+
+class _Mapa:
+    """Instantánea mapeada en memoria"""
+
+    def __init__(self, archivo):
+        self.mm = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.generacion, self.filas, self.max_id, n_categorias,
+         off_indice, off_categorias, off_agrupadas, self.off_textos) = CABECERA.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError('Archivo de catálogo inválido')
+        vista = memoryview(self.mm)
+        self.indice_id = vista[off_indice:off_categorias].cast('i')
+        self.agrupadas = vista[off_agrupadas:self.off_textos].cast('I')
+        # Solo las categorías (pocas) se cargan como objetos Python
+        self.categorias = {}
+        self.nombres_categoria = []
+        for i in range(n_categorias):
+            offset, longitud, inicio, cantidad = CATEGORIA.unpack_from(
+                self.mm, off_categorias + i * CATEGORIA.size
+            )
+            nombre = self._text(offset, longitud)
+            self.categorias[nombre] = (inicio, cantidad)
+            self.nombres_categoria.append(nombre)
+
+    def _text(self, offset, longitud):
+        inicio = self.off_textos + offset
+        return self.mm[inicio:inicio + longitud].decode('utf-8')
+
+    def stock(self, posicion):
+        return FILA.unpack_from(self.mm, CABECERA.size + posicion * FILA.size)[2]
+
+    def row(self, posicion):
+        id_, centimos, stock, categoria, offset, longitud = FILA.unpack_from(
+            self.mm, CABECERA.size + posicion * FILA.size
+        )
+        return ProductoCatalogo(
+            id_, self._text(offset, longitud), Decimal(centimos).scaleb(-2), stock,
+            None if categoria == SIN_CATEGORIA else self.nombres_categoria[categoria]
+        )
+
+    def position(self, producto_id):
+        if not 0 <= producto_id <= self.max_id:
+            return -1
+        return self.indice_id[producto_id]
+
+
+class CatalogSnapshot:
+    """Acceso a la instantánea compartida, reconstruyéndola cuando caduca"""
+
+    def __init__(self, ruta=None):
+        self.habilitada = True
+        self.ruta = ruta
+        self._ruta_validada = None
+        self._mapa = None
+        self._generacion = None
+        self._lock = threading.Lock()
+        self.reconstrucciones = 0
+
+    def configure(self, config):
+        """Leer la configuración de la aplicación (se llama desde init_app)"""
+        self.habilitada = config.get('CATALOG_SNAPSHOT_ENABLED', True)
+        self.ruta = config.get('CATALOG_SNAPSHOT_PATH')
+        self._ruta_validada = None
+        self._mapa = None
+        self._generacion = None
+        if self.habilitada:
+            # Un directorio inseguro se detecta al arrancar, no en cada petición
+            self._path()
+
+    def _path(self):
+        """Ruta de la instantánea, tras comprobar que su directorio es privado"""
+        if self._ruta_validada is None:
+            if self.ruta:
+                private_dir('catalogo', os.path.dirname(os.path.abspath(self.ruta)))
+                self._ruta_validada = self.ruta
+            else:
+                self._ruta_validada = os.path.join(private_dir('catalogo'), 'catalogo.bin')
+        return self._ruta_validada
+
+    def _generation_map(self):
+        """Contador de generación compartido entre procesos (8 bytes mapeados)"""
+        ruta = self._path() + '.gen'
+        if self._generacion is None or self._generacion[0] != ruta:
+            with open(ruta, 'a+b') as archivo:
+                if os.fstat(archivo.fileno()).st_size < GENERACION.size:
+                    archivo.write(b'\0' * GENERACION.size)
+                    archivo.flush()
+                mm = mmap.mmap(archivo.fileno(), GENERACION.size)
+            self._generacion = (ruta, mm)
+        return self._generacion[1]
+
+    def generation(self):
+        """Generación actual del catálogo"""
+        return GENERACION.unpack_from(self._generation_map())[0]
+
+    def invalidate(self):
+        """Marcar la instantánea como caducada para todos los procesos"""
+        try:
+            mm = self._generation_map()
+            with open(self._path() + '.lock', 'a') as archivo_lock:
+                fcntl.flock(archivo_lock, fcntl.LOCK_EX)
+                try:
+                    GENERACION.pack_into(mm, 0, GENERACION.unpack_from(mm)[0] + 1)
+                finally:
+                    fcntl.flock(archivo_lock, fcntl.LOCK_UN)
+        except (OSError, RuntimeError) as e:
+            print(f"No se pudo invalidar la instantánea del catálogo: {e}")
+
+    def _open(self):
+        try:
+            with open(self._path(), 'rb') as archivo:
+                return _Mapa(archivo)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def rebuild(self):
+        """Escribir una instantánea nueva a partir de la base de datos"""
+        generacion = self.generation()
+        # Sesión propia: la transacción de la petición puede ser anterior al
+        # último cambio y dejaría una instantánea antigua con la generación nueva
+        with Session(bind=db.session.get_bind(Producto)) as sesion:
+            filas = sesion.execute(select(
+                Producto.id, Producto.nombre, Producto.precio, Producto.stock, Producto.categoria
+            )).all()
+        contenido = build_snapshot(filas, generacion)
+        ruta = self._path()
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}"
+        with open(temporal, 'wb') as archivo:
+            archivo.write(contenido)
+        # Los procesos que tengan mapeada la versión anterior la siguen leyendo
+        os.replace(temporal, ruta)
+        self.reconstrucciones += 1
+        return generacion
+
+    def _current(self):
+        """Instantánea vigente, reconstruyéndola si caducó"""
+        generacion = self.generation()
+        mapa = self._mapa
+        if mapa is not None and mapa.generacion == generacion:
+            return mapa
+        with self._lock:
+            mapa = self._open()
+            if mapa is None or mapa.generacion != generacion:
+                with open(self._path() + '.lock', 'a') as archivo_lock:
+                    fcntl.flock(archivo_lock, fcntl.LOCK_EX)
+                    try:
+                        # Otro proceso pudo reconstruirla mientras esperábamos
+                        mapa = self._open()
+                        if mapa is None or mapa.generacion < generacion:
+                            self.rebuild()
+                            mapa = self._open()
+                    finally:
+                        fcntl.flock(archivo_lock, fcntl.LOCK_UN)
+            self._mapa = mapa
+            return mapa
+
+    def get(self, producto_id):
+        """Producto por id, o None"""
+        mapa = self._current()
+        posicion = mapa.position(producto_id)
+        return mapa.row(posicion) if posicion >= 0 else None
+
+    def by_category(self, categoria):
+        """Productos de una categoría"""
+        mapa = self._current()
+        inicio, cantidad = mapa.categorias.get(categoria, (0, 0))
+        return [mapa.row(mapa.agrupadas[i]) for i in range(inicio, inicio + cantidad)]
+
+    def available(self):
+        """Productos con stock disponible (o las filas de Producto si está deshabilitada)"""
+        if not self.habilitada:
+            return Producto.get_available_products()
+        try:
+            mapa = self._current()
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Error al leer la instantánea del catálogo: {e}")
+            return Producto.get_available_products()
+        return [mapa.row(i) for i in range(mapa.filas) if mapa.stock(i) > 0]
+
+    def all(self):
+        """Todos los productos de la instantánea"""
+        mapa = self._current()
+        return [mapa.row(i) for i in range(mapa.filas)]
+
+    def info(self):
+        """Datos de la instantánea vigente"""
+        mapa = self._current()
+        return {
+            'ruta': self._path(),
+            'generacion': mapa.generacion,
+            'productos': mapa.filas,
+            'categorias': len(mapa.categorias),
+            'bytes': len(mapa.mm),
+            'reconstrucciones': self.reconstrucciones
+        }
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+def _on_tables_changed(tablas):
+    if catalog_snapshot.habilitada and 'productos' in tablas:
+        catalog_snapshot.invalidate()
+
+
+def init_app(app):
+    """Configurar la instantánea y registrar los comandos `flask catalogo`"""
+    catalog_snapshot.configure(app.config)
+    on_tables_changed(_on_tables_changed)
+
+    @app.cli.group('catalogo')
+    def catalogo():
+        """Instantánea del catálogo de productos"""
+
+    @catalogo.command('reconstruir')
+    def rebuild_command():
+        """Reconstruir la instantánea a partir de la base de datos"""
+        catalog_snapshot.invalidate()
+        info = catalog_snapshot.info()
+        click.echo(f"Instantánea con {info['productos']} producto(s), {info['bytes']} bytes")
+
+    @catalogo.command('info')
+    def info_command():
+        """Mostrar los datos de la instantánea"""
+        for clave, valor in catalog_snapshot.info().items():
+            click.echo(f"{clave}: {valor}")
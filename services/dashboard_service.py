@@ -0,0 +1,134 @@
+"""
+Datos del dashboard consultados en paralelo
+
+Las estadísticas de usuarios, productos y pedidos son independientes: cada
+grupo se calcula en un hilo propio con su propio contexto de aplicación, y por
+tanto con su propia sesión y su propia conexión del pool. La página espera como
+mucho DASHBOARD_BUDGET_MS; un grupo que no terminó a tiempo (o que falló)
+muestra el último valor conocido y sigue calculándose en segundo plano para la
+siguiente visita. Mientras un grupo está en curso no se lanza otro igual, así
+una base lenta no llena el pool de hilos.
+
+Estado de cada grupo en el resultado:
+    ok          calculado en esta petición
+    stale       último valor conocido (ver `edad_s`)
+    sin_datos   no terminó a tiempo y aún no hay valor anterior
+    error       falló y no hay valor anterior
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+
+
+class DashboardData:
+    """Ejecuta grupos de consultas en paralelo con un presupuesto de tiempo"""
+
+    def __init__(self):
+        self.habilitado = True
+        self.presupuesto = 0.5
+        self.hilos = 3
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._ultimos = {}
+        self._en_curso = {}
+
+    def configure(self, config):
+        """Leer la configuración de la aplicación (se llama desde init_app)"""
+        self.habilitado = config.get('DASHBOARD_PARALLEL', True)
+        self.presupuesto = config.get('DASHBOARD_BUDGET_MS', 500) / 1000
+        self.hilos = config.get('DASHBOARD_WORKERS', 3)
+        with self._lock:
+            self._ultimos = {}
+
+    def _executor(self):
+        # Los hilos no sobreviven a un fork (`flask serve --workers N`): uno por proceso
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='dashboard')
+            self._pid = os.getpid()
+            self._en_curso = {}
+        return self._pool
+
+    @staticmethod
+    def _run(app, funcion):
+        # Contexto propio: sesión y conexión propias, que se devuelven al terminar
+        with app.app_context():
+            return funcion()
+
+    def _finished(self, nombre, futuro):
+        with self._lock:
+            if self._en_curso.get(nombre) is futuro:
+                del self._en_curso[nombre]
+            if futuro.exception() is None:
+                self._ultimos[nombre] = (futuro.result(), time.time())
+
+    def _submit(self, app, nombre, funcion):
+        with self._lock:
+            futuro = self._en_curso.get(nombre)
+            if futuro is not None:
+                return futuro
+            futuro = self._executor().submit(self._run, app, funcion)
+            self._en_curso[nombre] = futuro
+        futuro.add_done_callback(lambda f: self._finished(nombre, f))
+        return futuro
+
+    def _fallback(self, nombre, resultado, fallo):
+        with self._lock:
+            ultimo = self._ultimos.get(nombre)
+        if ultimo is None:
+            resultado['datos'][nombre] = None
+            resultado['estado'][nombre] = 'error' if fallo else 'sin_datos'
+        else:
+            resultado['datos'][nombre] = ultimo[0]
+            resultado['estado'][nombre] = 'stale'
+            resultado['edad_s'][nombre] = round(time.time() - ultimo[1], 1)
+
+    def fetch(self, grupos, presupuesto=None):
+        """Calcular {nombre: funcion} en paralelo dentro del presupuesto
+
+        Devuelve {'datos': {nombre: valor}, 'estado': {nombre: estado},
+        'edad_s': {nombre: segundos}} (edad solo de los valores stale).
+        Requiere contexto de aplicación.
+        """
+        presupuesto = self.presupuesto if presupuesto is None else presupuesto
+        resultado = {'datos': {}, 'estado': {}, 'edad_s': {}}
+
+        if not self.habilitado:
+            for nombre, funcion in grupos.items():
+                try:
+                    valor = funcion()
+                except Exception as e:
+                    print(f"Error al calcular {nombre} del dashboard: {e}")
+                    self._fallback(nombre, resultado, fallo=True)
+                    continue
+                with self._lock:
+                    self._ultimos[nombre] = (valor, time.time())
+                resultado['datos'][nombre] = valor
+                resultado['estado'][nombre] = 'ok'
+            return resultado
+
+        app = current_app._get_current_object()
+        futuros = {nombre: self._submit(app, nombre, funcion) for nombre, funcion in grupos.items()}
+        wait(futuros.values(), timeout=max(0, presupuesto))
+
+        for nombre, futuro in futuros.items():
+            if futuro.done() and futuro.exception() is None:
+                resultado['datos'][nombre] = futuro.result()
+                resultado['estado'][nombre] = 'ok'
+            else:
+                if futuro.done():
+                    print(f"Error al calcular {nombre} del dashboard: {futuro.exception()}")
+                self._fallback(nombre, resultado, fallo=futuro.done())
+        return resultado
+
+
+dashboard = DashboardData()
+
+
+def init_app(app):
+    """Configurar el cálculo en paralelo del dashboard"""
+    dashboard.configure(app.config)
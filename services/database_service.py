@@ -0,0 +1,221 @@
+"""
+Perfil de rendimiento para SQLite (nodos de borde y despliegues de un solo nodo)
+
+La URI de la base se toma de DATABASE_URL; sin ella se sigue construyendo la de
+MySQL a partir de MYSQL_*. Cuando la base es un archivo SQLite y SQLITE_TUNING
+está activo, cada conexión se abre con:
+
+    journal_mode=WAL      los lectores no bloquean al escritor ni al revés
+    synchronous=NORMAL    sin fsync en cada commit (seguro con WAL; ante un
+                          corte de luz se pueden perder los últimos commits)
+    mmap_size             lecturas desde el archivo mapeado en memoria
+    cache_size            caché de páginas por conexión
+    busy_timeout          esperar al escritor en vez de fallar con
+                          "database is locked"
+
+El pool se elige con SQLITE_POOL:
+
+    queue     (por defecto) QueuePool LIFO de SQLITE_POOL_SIZE conexiones: se
+              reutiliza siempre la última conexión devuelta, así un conjunto
+              fijo de hilos trabaja con conexiones que ya tienen su caché de
+              páginas caliente.
+    thread    una conexión por hilo (SingletonThreadPool). Solo con un número
+              fijo de hilos menor que SQLITE_POOL_SIZE (`flask serve
+              --threads N` y el worker): con un hilo por petición el pool
+              cierra conexiones que otro hilo está usando.
+
+Comparar las rutas principales con el perfil y con los valores por defecto de
+SQLite (bases temporales con datos de ejemplo):
+
+    DATABASE_URL=sqlite:////var/lib/app/app.db flask --app app sqlite pragmas
+    flask --app app sqlite bench -n 500 -c 8
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import click
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
+from models import db
+
+PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout')
+
+# Rutas de lectura principales que compara `flask sqlite bench`
+RUTAS_BENCH = ('/', '/productos', '/pedidos', '/usuarios', '/api/productos',
+               '/api/pedidos', '/api/usuarios/1/pedidos')
+
+
+def is_sqlite_file(uri):
+    """Indicar si la URI es una base SQLite en archivo (no en memoria)"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """Opciones del engine principal según el perfil (para SQLALCHEMY_ENGINE_OPTIONS)"""
+    opciones = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config.get('SQLITE_TUNING', True) and is_sqlite_file(config['SQLALCHEMY_DATABASE_URI']):
+        if config.get('SQLITE_POOL', 'queue') == 'thread':
+            opciones.setdefault('poolclass', SingletonThreadPool)
+        else:
+            opciones.setdefault('poolclass', QueuePool)
+            opciones.setdefault('pool_use_lifo', True)
+            opciones.setdefault('max_overflow', 0)
+            opciones.setdefault('pool_timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000) / 1000)
+        opciones.setdefault('pool_size', config.get('SQLITE_POOL_SIZE', 32))
+    return opciones
+
+
+def tune_engine(engine, config):
+    """Aplicar los PRAGMAs del perfil a cada conexión nueva del engine"""
+    ajustes = [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 268435456))),
+        ('cache_size', int(config.get('SQLITE_CACHE_SIZE', -65536))),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT', 5000)))
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, valor in ajustes:
+                cursor.execute(f"PRAGMA {pragma}={valor}")
+        finally:
+            cursor.close()
+
+
+def current_pragmas(engine):
+    """Valores de los PRAGMAs del perfil en una conexión del engine"""
+    with engine.connect() as conexion:
+        return {pragma: conexion.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                for pragma in PRAGMAS}
+
+
+def configure(app):
+    """Preparar las opciones del pool antes de db.init_app (los engines se crean ahí)"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def seed_benchmark_data(usuarios=200, productos=100, pedidos=5000):
+    """Datos de ejemplo para el benchmark (requiere contexto de aplicación)"""
+    from models.usuario_model import Usuario
+    from models.producto_model import Producto
+    from models.pedido_model import Pedido
+
+    db.session.add_all(
+        Usuario(nombre=f'Usuario {i}', email=f'usuario{i}@example.com')
+        for i in range(1, usuarios + 1)
+    )
+    db.session.add_all(
+        Producto(nombre=f'Producto {i}', precio=Decimal('9.99') + i, stock=1000,
+                 categoria=f'Categoria {i % 10}', descripcion=f'Descripción del producto {i}')
+        for i in range(1, productos + 1)
+    )
+    db.session.flush()
+    inicio = datetime.utcnow() - timedelta(days=90)
+    estados = ('pendiente', 'procesando', 'enviado', 'entregado', 'cancelado')
+    db.session.add_all(
+        Pedido(usuario_id=i % usuarios + 1, producto_id=i % productos + 1, cantidad=i % 3 + 1,
+               precio_total=Decimal('9.99') * (i % 3 + 1), estado=estados[i % len(estados)],
+               fecha_pedido=inicio + timedelta(minutes=i))
+        for i in range(pedidos)
+    )
+    db.session.commit()
+
+
+def _serve_in_thread(app):
+    """Servidor WSGI con hilos en un puerto libre; devuelve (servidor, url_base)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class SinRegistro(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    servidor = make_server('127.0.0.1', 0, app, threaded=True, request_handler=SinRegistro)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def run_sqlite_benchmark(rutas=RUTAS_BENCH, total=500, concurrencia=8, pedidos=5000):
+    """Comparar las rutas con el perfil de SQLite y con los valores por defecto
+
+    Cada perfil usa su propia base temporal con los mismos datos. Las cachés
+    de la aplicación se desactivan para que cada petición llegue a la base.
+    Devuelve {perfil: {ruta: resultado de run_benchmark}}.
+    """
+    from app import create_app
+    from services.server_service import run_benchmark
+
+    directorio = tempfile.mkdtemp(prefix='sqlite-bench-')
+    resultados = {}
+    try:
+        for perfil, ajustado in (('por_defecto', False), ('ajustado', True)):
+            ruta_db = os.path.join(directorio, f'{perfil}.db')
+            app = create_app(
+                SQLALCHEMY_DATABASE_URI=f'sqlite:///{ruta_db}',
+                SQLITE_TUNING=ajustado,
+                PEDIDOS_SHARDS=[],
+                FRAGMENT_CACHE_ENABLED=False,
+                CATALOG_SNAPSHOT_ENABLED=False,
+                SINGLEFLIGHT_ENABLED=False,
+                PROFILING_ENABLED=False
+            )
+            with app.app_context():
+                seed_benchmark_data(pedidos=pedidos)
+            servidor, base = _serve_in_thread(app)
+            try:
+                resultados[perfil] = {
+                    ruta: run_benchmark(base + ruta, total, concurrencia) for ruta in rutas
+                }
+            finally:
+                servidor.shutdown()
+                with app.app_context():
+                    db.engine.dispose()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def init_app(app):
+    """Aplicar el perfil al engine principal y registrar los comandos `flask sqlite`"""
+    if app.config.get('SQLITE_TUNING', True) and is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        with app.app_context():
+            tune_engine(db.engine, app.config)
+
+    @app.cli.group('sqlite')
+    def sqlite():
+        """Perfil de rendimiento de SQLite"""
+
+    @sqlite.command('pragmas')
+    def pragmas_command():
+        """Mostrar los PRAGMAs efectivos de la base configurada"""
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException("La base configurada no es SQLite (DATABASE_URL)")
+        click.echo(f"pool: {type(db.engine.pool).__name__}")
+        for pragma, valor in current_pragmas(db.engine).items():
+            click.echo(f"{pragma:>12}: {valor}")
+
+    @sqlite.command('bench')
+    @click.option('-n', '--total', type=int, default=500, help='Peticiones por ruta')
+    @click.option('-c', '--concurrencia', type=int, default=8, help='Peticiones simultáneas')
+    @click.option('--pedidos', type=int, default=5000, help='Pedidos de ejemplo')
+    @click.option('--ruta', 'rutas', multiple=True, help='Ruta a medir (repetible)')
+    def bench_command(total, concurrencia, pedidos, rutas):
+        """Comparar las rutas principales con el perfil ajustado y sin él"""
+        resultados = run_sqlite_benchmark(rutas or RUTAS_BENCH, total, concurrencia, pedidos)
+        click.echo(f"{'ruta':<28} {'perfil':<12} {'rps':>8} {'p50_ms':>8} "
+                   f"{'p95_ms':>8} {'p99_ms':>8} {'errores':>8}")
+        for ruta in rutas or RUTAS_BENCH:
+            for perfil in ('por_defecto', 'ajustado'):
+                r = resultados[perfil][ruta]
+                click.echo(f"{ruta:<28} {perfil:<12} {r['rps']:>8} {r['p50_ms']:>8} "
+                           f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['errores']:>8}")
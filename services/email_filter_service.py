@@ -0,0 +1,48 @@
+"""
+Filtro de Bloom de emails registrados para el alta de usuarios
+
+Con EMAIL_FILTER_ENABLED, Usuario.create_user solo consulta si el email ya
+existe cuando el filtro dice que puede estar registrado; los emails seguro
+nuevos van directos al INSERT (ver models/bloom_filter.py).
+EMAIL_FILTER_FP_RATE fija la tasa de falsos positivos: más baja ahorra más
+consultas y ocupa más memoria (unos 1,2 bytes por email con 0,01).
+
+    flask --app app emails filtro          # memoria, ocupación y consultas ahorradas
+    flask --app app emails reconstruir
+
+Los mismos contadores están en /api/usuarios/filtro/stats.
+"""
+
+import click
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.bloom_filter import email_filter
+
+
+def init_app(app):
+    """Configurar y construir el filtro y registrar los comandos `flask emails`"""
+    email_filter.configure(app.config)
+    if email_filter.habilitado:
+        with app.app_context():
+            try:
+                email_filter.rebuild()
+            except SQLAlchemyError:
+                # Sin tabla de usuarios todavía: se construye en la primera alta
+                pass
+
+    @app.cli.group('emails')
+    def emails():
+        """Filtro de emails registrados"""
+
+    @emails.command('filtro')
+    def stats_command():
+        """Memoria, ocupación y consultas ahorradas por el filtro"""
+        for clave, valor in email_filter.stats().items():
+            click.echo(f"{clave:>18}: {valor}")
+
+    @emails.command('reconstruir')
+    def rebuild_command():
+        """Reconstruir el filtro con los emails de la base"""
+        filtro = email_filter.rebuild()
+        click.echo(f"{filtro.elementos} email(s), {filtro.memory_bytes} bytes, "
+                   f"{filtro.num_hashes} hashes")
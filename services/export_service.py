@@ -0,0 +1,306 @@
+"""
+Exportación masiva de pedidos por meses
+
+Recorre `pedidos` unida a `usuarios` y `productos` con un cursor del lado del
+servidor (stream_results) leyendo EXPORT_BATCH_SIZE filas cada vez, así la
+memoria no depende del tamaño de la tabla. Escribe un archivo por mes de
+fecha_pedido:
+
+    pedidos-2026-01.csv.gz      CSV comprimido (por defecto)
+    pedidos-2026-01.parquet     columnar, si está instalado `pyarrow`
+
+    flask --app app exportar pedidos DIRECTORIO [--desde 2026-01] [--hasta 2026-06]
+                                     [--formato csv|parquet] [--archivados] [--lote 5000]
+
+El progreso se guarda en DIRECTORIO/export-estado.json. Si la exportación se
+interrumpe, volver a lanzar el mismo comando salta los meses terminados y
+continúa el mes a medias: el CSV se escribe como una serie de miembros gzip
+(uno por lote) y se recorta al último lote confirmado antes de seguir desde
+su último id. Un mes en Parquet a medias se vuelve a exportar entero.
+
+Con shards (PEDIDOS_SHARDS) los pedidos no están en la base principal y la
+exportación no está disponible.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from sqlalchemy import func, select, union_all
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+from models.pedido_model import Pedido
+from models.pedido_archivado_model import PedidoArchivado
+from models.producto_model import Producto
+from models.shard_router import shard_router
+from models.usuario_model import Usuario
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # dependencia opcional
+    pyarrow = None
+
+ESTADO = 'export-estado.json'
+FORMATOS = {'csv': '.csv.gz', 'parquet': '.parquet'}
+COLUMNAS = ('id', 'fecha_pedido', 'estado', 'cantidad', 'precio_total',
+            'usuario_id', 'usuario_nombre', 'usuario_email',
+            'producto_id', 'producto_nombre', 'producto_categoria')
+
+
+def _source(incluir_archivados):
+    """Subconsulta con los pedidos activos y, opcionalmente, los archivados"""
+    columnas = PedidoArchivado.COLUMNAS_COPIADAS
+    fuente = select(*[Pedido.__table__.c[c] for c in columnas])
+    if incluir_archivados:
+        fuente = union_all(fuente, select(*[PedidoArchivado.__table__.c[c] for c in columnas]))
+    return fuente.subquery('p')
+
+
+def _month_query(fuente, inicio, fin, ultimo_id):
+    """Pedidos del mes con id mayor que `ultimo_id`, en orden de id"""
+    usuarios = Usuario.__table__
+    productos = Producto.__table__
+    return (
+        select(fuente.c.id, fuente.c.fecha_pedido, fuente.c.estado, fuente.c.cantidad,
+               fuente.c.precio_total, fuente.c.usuario_id, usuarios.c.nombre, usuarios.c.email,
+               fuente.c.producto_id, productos.c.nombre, productos.c.categoria)
+        .select_from(fuente)
+        # Los pedidos archivados no tienen claves foráneas: el usuario puede no existir
+        .outerjoin(usuarios, usuarios.c.id == fuente.c.usuario_id)
+        .outerjoin(productos, productos.c.id == fuente.c.producto_id)
+        .where(fuente.c.fecha_pedido >= inicio, fuente.c.fecha_pedido < fin,
+               fuente.c.id > ultimo_id)
+        .order_by(fuente.c.id)
+    )
+
+
+def _parse_month(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m')
+    except (TypeError, ValueError):
+        raise ValueError(f"Mes inválido: {valor} (formato AAAA-MM)")
+
+
+def _next_month(mes):
+    return mes.replace(year=mes.year + 1, month=1) if mes.month == 12 else mes.replace(month=mes.month + 1)
+
+
+def months(fuente, desde=None, hasta=None):
+    """Primer día de cada mes a exportar; sin límites, los de los pedidos existentes"""
+    if desde is None or hasta is None:
+        primero, ultimo = db.session.execute(
+            select(func.min(fuente.c.fecha_pedido), func.max(fuente.c.fecha_pedido))
+        ).one()
+        if primero is None:
+            return []
+    inicio = _parse_month(desde) if desde else primero.replace(day=1, hour=0, minute=0,
+                                                                second=0, microsecond=0)
+    fin = _parse_month(hasta) if hasta else ultimo.replace(day=1, hour=0, minute=0,
+                                                            second=0, microsecond=0)
+    meses = []
+    while inicio <= fin:
+        meses.append(inicio)
+        inicio = _next_month(inicio)
+    return meses
+
+
+def _load_state(directorio, formato):
+    ruta = os.path.join(directorio, ESTADO)
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            estado = json.load(archivo)
+    except FileNotFoundError:
+        return {'formato': formato, 'meses': {}}
+    if estado.get('formato') != formato:
+        raise ValueError(f"{directorio} tiene una exportación en formato {estado.get('formato')}")
+    return estado
+
+
+def _save_state(directorio, estado):
+    # Escritura atómica: tras una interrupción se lee el estado anterior o el nuevo
+    ruta = os.path.join(directorio, ESTADO)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo, indent=2)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(ruta + '.tmp', ruta)
+
+
+def _csv_value(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return '' if valor is None else valor
+
+
+class _CsvMonth:
+    """CSV comprimido de un mes; cada lote es un miembro gzip completo"""
+
+    def __init__(self, ruta, progreso):
+        self.ruta = ruta
+        nuevo = not progreso.get('bytes')
+        self.archivo = open(ruta, 'wb' if nuevo else 'r+b')
+        # Descartar lo escrito después del último lote confirmado
+        self.archivo.truncate(progreso.get('bytes', 0))
+        self.archivo.seek(0, os.SEEK_END)
+        if nuevo:
+            self.write_batch([], cabecera=True)
+
+    def write_batch(self, filas, cabecera=False):
+        texto = io.StringIO()
+        escritor = csv.writer(texto)
+        if cabecera:
+            escritor.writerow(COLUMNAS)
+        escritor.writerows([_csv_value(v) for v in fila] for fila in filas)
+        with gzip.GzipFile(fileobj=self.archivo, mode='wb') as miembro:
+            miembro.write(texto.getvalue().encode('utf-8'))
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        return self.archivo.tell()
+
+    def close(self):
+        self.archivo.close()
+
+
+class _ParquetMonth:
+    """Parquet de un mes; cada lote es un row group"""
+
+    def __init__(self, ruta, progreso):
+        self.ruta = ruta
+        self.esquema = pyarrow.schema([
+            ('id', pyarrow.int64()), ('fecha_pedido', pyarrow.timestamp('us')),
+            ('estado', pyarrow.string()), ('cantidad', pyarrow.int32()),
+            ('precio_total', pyarrow.decimal128(10, 2)), ('usuario_id', pyarrow.int64()),
+            ('usuario_nombre', pyarrow.string()), ('usuario_email', pyarrow.string()),
+            ('producto_id', pyarrow.int64()), ('producto_nombre', pyarrow.string()),
+            ('producto_categoria', pyarrow.string())
+        ])
+        self.escritor = pyarrow.parquet.ParquetWriter(ruta, self.esquema, compression='zstd')
+
+    def write_batch(self, filas):
+        columnas = list(zip(*filas)) if filas else [[] for _ in COLUMNAS]
+        self.escritor.write_table(pyarrow.table(
+            [pyarrow.array(valores, type=campo.type)
+             for valores, campo in zip(columnas, self.esquema)],
+            schema=self.esquema
+        ))
+        return None
+
+    def close(self):
+        self.escritor.close()
+
+
+def export_month(mes, fuente, directorio, formato, estado, tamano_lote):
+    """Exportar (o continuar) un mes; devuelve las filas escritas en esta ejecución"""
+    clave = f"{mes:%Y-%m}"
+    progreso = estado['meses'].setdefault(clave, {'filas': 0, 'ultimo_id': 0, 'completo': False})
+    destino = os.path.join(directorio, f"pedidos-{clave}{FORMATOS[formato]}")
+    parcial = destino + '.part'
+    if formato == 'parquet' or not os.path.exists(parcial):
+        # Un Parquet a medias no se puede continuar: se empieza el mes de nuevo
+        progreso.update(filas=0, ultimo_id=0, bytes=0)
+
+    escritor = (_CsvMonth if formato == 'csv' else _ParquetMonth)(parcial, progreso)
+    escritas = 0
+    try:
+        consulta = _month_query(fuente, mes, _next_month(mes), progreso['ultimo_id'])
+        resultado = db.session.execute(
+            consulta.execution_options(stream_results=True, yield_per=tamano_lote)
+        )
+        for lote in resultado.partitions():
+            bytes_escritos = escritor.write_batch(lote)
+            escritas += len(lote)
+            progreso['filas'] += len(lote)
+            progreso['ultimo_id'] = lote[-1][0]
+            if bytes_escritos is not None:
+                progreso['bytes'] = bytes_escritos
+                _save_state(directorio, estado)
+    finally:
+        escritor.close()
+        db.session.rollback()  # cerrar la transacción de lectura
+
+    os.replace(parcial, destino)
+    progreso.update(completo=True, archivo=os.path.basename(destino))
+    progreso.pop('bytes', None)
+    _save_state(directorio, estado)
+    return escritas
+
+
+def export_orders(directorio, desde=None, hasta=None, formato='csv', incluir_archivados=False,
+                  tamano_lote=None, al_terminar_mes=None):
+    """Exportar los pedidos mes a mes a `directorio`, continuando una exportación previa
+
+    `al_terminar_mes(mes, filas, segundos)` se llama tras cada mes. Devuelve
+    (resumen, mensaje); resumen es None si hubo un error.
+    """
+    if formato not in FORMATOS:
+        return None, f"Formato inválido. Formatos válidos: {sorted(FORMATOS)}"
+    if formato == 'parquet' and pyarrow is None:
+        return None, "El formato parquet requiere el paquete pyarrow"
+    if shard_router.enabled:
+        return None, "Con shards de pedidos la exportación no está disponible"
+    tamano_lote = tamano_lote or current_app.config.get('EXPORT_BATCH_SIZE', 5000)
+
+    os.makedirs(directorio, exist_ok=True)
+    inicio = time.perf_counter()
+    resumen = {'meses': 0, 'meses_omitidos': 0, 'filas': 0}
+    try:
+        estado = _load_state(directorio, formato)
+        fuente = _source(incluir_archivados)
+        for mes in months(fuente, desde, hasta):
+            if estado['meses'].get(f"{mes:%Y-%m}", {}).get('completo'):
+                resumen['meses_omitidos'] += 1
+                continue
+            inicio_mes = time.perf_counter()
+            filas = export_month(mes, fuente, directorio, formato, estado, tamano_lote)
+            resumen['meses'] += 1
+            resumen['filas'] += filas
+            if al_terminar_mes:
+                al_terminar_mes(mes, filas, time.perf_counter() - inicio_mes)
+    except (ValueError, OSError) as e:
+        return None, str(e)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return None, f"Error al exportar pedidos: {str(e)}"
+
+    segundos = time.perf_counter() - inicio
+    resumen['segundos'] = round(segundos, 3)
+    resumen['filas_por_segundo'] = round(resumen['filas'] / segundos, 1) if segundos else 0
+    return resumen, (f"{resumen['filas']} pedido(s) exportados en {resumen['meses']} mes(es) "
+                     f"({resumen['filas_por_segundo']} filas/s)")
+
+
+def init_app(app):
+    """Registrar el comando `flask exportar pedidos`"""
+
+    @app.cli.group('exportar')
+    def exportar():
+        """Exportaciones masivas"""
+
+    @exportar.command('pedidos')
+    @click.argument('directorio', type=click.Path(file_okay=False))
+    @click.option('--desde', default=None, help='Primer mes (AAAA-MM)')
+    @click.option('--hasta', default=None, help='Último mes (AAAA-MM)')
+    @click.option('--formato', type=click.Choice(sorted(FORMATOS)), default='csv')
+    @click.option('--archivados', is_flag=True, help='Incluir los pedidos archivados')
+    @click.option('--lote', type=int, default=None, help='Filas leídas por lote')
+    def export_command(directorio, desde, hasta, formato, archivados, lote):
+        """Exportar pedidos con usuario y producto, un archivo por mes"""
+        def al_terminar_mes(mes, filas, segundos):
+            ritmo = round(filas / segundos, 1) if segundos else 0
+            click.echo(f"{mes:%Y-%m}: {filas} fila(s) en {segundos:.2f} s ({ritmo} filas/s)")
+
+        resumen, message = export_orders(directorio, desde, hasta, formato, archivados,
+                                         lote, al_terminar_mes)
+        if resumen is None:
+            raise click.ClickException(message)
+        if resumen['meses_omitidos']:
+            click.echo(f"{resumen['meses_omitidos']} mes(es) ya exportados omitidos")
+        click.echo(message)
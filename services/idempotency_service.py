@@ -0,0 +1,84 @@
+"""
+Claves de idempotencia
+
+Una operación que recibe un Idempotency-Key se ejecuta una sola vez por clave:
+las repeticiones reciben el resultado guardado y las peticiones simultáneas
+con la misma clave esperan (hasta IDEMPOTENCY_WAIT_SECONDS) a que termine la
+primera en lugar de ejecutarla otra vez. Los resultados fallidos no se
+guardan: no tuvieron efectos y el cliente puede reintentar con la misma clave.
+
+    flask --app app idempotencia purgar     # borrar claves caducadas
+"""
+
+import hashlib
+import json
+import time
+
+import click
+from flask import current_app
+
+from models.clave_idempotencia_model import ClaveIdempotencia
+
+LONGITUD_MAXIMA = 100
+
+
+def fingerprint(alcance, datos):
+    """Huella de los datos de la petición, para detectar claves reutilizadas"""
+    contenido = json.dumps({'alcance': alcance, 'datos': datos}, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def run_once(clave, alcance, datos, ejecutar, espera=None):
+    """Ejecutar `ejecutar(clave)` como mucho una vez por clave
+
+    `ejecutar` recibe la ClaveIdempotencia reclamada, devuelve un diccionario
+    con 'exito' y debe llamar a su record_result dentro de su transacción
+    cuando tiene éxito (si la clave ya no le pertenece, debe deshacerla). Devuelve (resultado, situacion) con situacion 'ejecutada',
+    'repetida', 'en_proceso' (se agotó la espera) o 'conflicto'.
+    """
+    config = current_app.config
+    espera = config.get('IDEMPOTENCY_WAIT_SECONDS', 10) if espera is None else espera
+    ttl = config.get('IDEMPOTENCY_TTL', 86400)
+    lease = config.get('IDEMPOTENCY_LEASE_SECONDS', 60)
+    huella = fingerprint(alcance, datos)
+
+    limite = time.monotonic() + espera
+    pausa = 0.05
+    while True:
+        registro, situacion = ClaveIdempotencia.claim(clave, alcance, huella, ttl, lease)
+        if situacion == 'nueva':
+            try:
+                resultado = ejecutar(registro)
+            except Exception:
+                registro.release()
+                raise
+            if not resultado.get('exito'):
+                registro.release()
+            return resultado, 'ejecutada'
+        if situacion == 'completada':
+            return registro.get_resultado(), 'repetida'
+        if situacion == 'conflicto':
+            return None, 'conflicto'
+        if time.monotonic() >= limite:
+            return None, 'en_proceso'
+        time.sleep(pausa)
+        pausa = min(pausa * 2, 0.5)
+
+
+def init_app(app):
+    """Registrar el comando `flask idempotencia purgar`"""
+
+    @app.cli.group('idempotencia')
+    def idempotencia():
+        """Claves de idempotencia"""
+
+    @idempotencia.command('purgar')
+    def purge_command():
+        """Borrar las claves caducadas"""
+        total = 0
+        while True:
+            borradas = ClaveIdempotencia.purge_expired()
+            total += borradas
+            if not borradas:
+                break
+        click.echo(f"{total} clave(s) caducadas borradas")
@@ -0,0 +1,309 @@
+"""
+Perfilado de peticiones bajo demanda
+
+Con PROFILING_ENABLED, una petición se perfila con cProfile cuando trae la
+cabecera X-Profile firmada o cuando la elige el muestreo (PROFILING_SAMPLE_RATE).
+Solo se perfila una petición a la vez por proceso; las que llegan mientras
+tanto se atienden sin perfil.
+Cada perfil se guarda en PROFILING_DIR (por defecto un directorio privado del
+usuario, ver services/runtime_dir.py) como un .prof (abrible con pstats o
+snakeviz) y un .json con el desglose por fases:
+
+    db          tiempo de ejecución de las consultas en el driver
+    orm         tiempo propio del código de sqlalchemy.orm (construcción de
+                consultas e hidratación de objetos)
+    render      tiempo de render de plantillas Jinja
+    serialize   tiempo propio de la serialización JSON
+    otros       el resto de la petición
+
+La firma es `<timestamp>.<hmac>` sobre el timestamp y la ruta con
+PROFILING_SECRET y caduca a los 5 minutos. Sin PROFILING_SECRET la cabecera se
+ignora (no se usa SECRET_KEY: suele tener un valor por defecto conocido y
+cualquiera podría perfilar peticiones a voluntad):
+
+    flask --app app perfiles firmar /pedidos   # valor de la cabecera X-Profile
+    flask --app app perfiles listar
+    flask --app app perfiles ver <nombre> [--top 20]
+"""
+
+import cProfile
+import glob
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import before_render_template, current_app, g, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from services.runtime_dir import private_dir
+
+CABECERA = 'X-Profile'
+VALIDEZ_FIRMA = 300
+
+# Perfil activo en el hilo actual (los eventos de SQLAlchemy no ven `g`)
+_local = threading.local()
+
+# Una sola petición perfilada a la vez por proceso: desde Python 3.12 solo
+# puede haber un perfilador activo y además registra todos los hilos
+_perfilando = threading.Lock()
+
+
+class PerfilPeticion:
+    """Perfil y tiempos por fase de una petición"""
+
+    def __init__(self, motivo):
+        self.motivo = motivo
+        self.profiler = cProfile.Profile()
+        self.inicio = time.perf_counter()
+        self.db = 0.0
+        self.consultas = 0
+        self.render = 0.0
+        self._inicio_consulta = None
+        self._inicio_render = []
+
+    def breakdown(self, total):
+        """Desglose por fases en milisegundos"""
+        stats = pstats.Stats(self.profiler)
+        orm = serializacion = 0.0
+        for (archivo, _, _), (_, _, tiempo_propio, _, _) in stats.stats.items():
+            ruta = archivo.replace(os.sep, '/')
+            if '/sqlalchemy/orm/' in ruta:
+                orm += tiempo_propio
+            elif '/json/' in ruta:
+                serializacion += tiempo_propio
+        fases = {'db': self.db, 'orm': orm, 'render': self.render, 'serialize': serializacion}
+        fases['otros'] = max(0.0, total - sum(fases.values()))
+        return {fase: round(segundos * 1000, 2) for fase, segundos in fases.items()}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is not None:
+        perfil._inicio_consulta = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is not None and perfil._inicio_consulta is not None:
+        perfil.db += time.perf_counter() - perfil._inicio_consulta
+        perfil.consultas += 1
+        perfil._inicio_consulta = None
+
+
+def _before_render(sender, template, context, **extra):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is not None:
+        perfil._inicio_render.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is not None and perfil._inicio_render:
+        inicio = perfil._inicio_render.pop()
+        # Las plantillas incluidas se cuentan dentro de la que las incluye
+        if not perfil._inicio_render:
+            perfil.render += time.perf_counter() - inicio
+
+
+def sign(ruta, secreto, timestamp=None):
+    """Valor de la cabecera X-Profile para `ruta`"""
+    timestamp = int(time.time()) if timestamp is None else int(timestamp)
+    firma = hmac.new(secreto.encode('utf-8'), f"{timestamp}:{ruta}".encode('utf-8'),
+                     hashlib.sha256).hexdigest()
+    return f"{timestamp}.{firma}"
+
+
+def verify(valor, ruta, secreto, ahora=None):
+    """Comprobar la firma de la cabecera X-Profile"""
+    try:
+        timestamp, _ = valor.split('.', 1)
+        timestamp = int(timestamp)
+    except (AttributeError, ValueError):
+        return False
+    ahora = time.time() if ahora is None else ahora
+    if abs(ahora - timestamp) > VALIDEZ_FIRMA:
+        return False
+    return hmac.compare_digest(valor, sign(ruta, secreto, timestamp))
+
+
+def profiles_dir(config):
+    """Directorio donde se guardan los perfiles"""
+    return private_dir('profiles', config.get('PROFILING_DIR'))
+
+
+def _secret(config):
+    # Sin un secreto propio del perfilado no se aceptan cabeceras firmadas
+    return config.get('PROFILING_SECRET') or ''
+
+
+def _reason():
+    """Motivo para perfilar la petición actual, o None"""
+    config = current_app.config
+    if not config.get('PROFILING_ENABLED', False):
+        return None
+    valor = request.headers.get(CABECERA)
+    if valor and _secret(config) and verify(valor, request.path, _secret(config)):
+        return 'cabecera'
+    tasa = config.get('PROFILING_SAMPLE_RATE', 0.0)
+    if tasa and random.random() < tasa:
+        return 'muestreo'
+    return None
+
+
+def start_profile():
+    """before_request: empezar a perfilar si corresponde"""
+    motivo = _reason()
+    if motivo is None:
+        return None
+    # Si ya se está perfilando otra petición esta se atiende sin perfil
+    if not _perfilando.acquire(blocking=False):
+        return None
+    perfil = PerfilPeticion(motivo)
+    try:
+        perfil.profiler.enable()
+    except ValueError as e:
+        # Otra herramienta de perfilado está activa en el proceso
+        _perfilando.release()
+        print(f"No se pudo perfilar la petición: {e}")
+        return None
+    _local.perfil = perfil
+    g.perfil_peticion = perfil
+    return None
+
+
+def _stop(perfil):
+    """Detener el perfilador y dejar que se perfile otra petición"""
+    try:
+        perfil.profiler.disable()
+    finally:
+        _local.perfil = None
+        _perfilando.release()
+
+
+def finish_profile(response):
+    """after_request: detener el perfilador y guardar el perfil"""
+    perfil = g.pop('perfil_peticion', None)
+    if perfil is None:
+        return response
+    _stop(perfil)
+    total = time.perf_counter() - perfil.inicio
+    try:
+        nombre = save_profile(perfil, total, response.status_code)
+        response.headers['X-Profile-Id'] = nombre
+    except (OSError, RuntimeError) as e:
+        print(f"No se pudo guardar el perfil: {e}")
+    return response
+
+
+def _discard_profile(exc):
+    # Si la petición terminó con una excepción no pasa por after_request
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is not None:
+        g.pop('perfil_peticion', None)
+        _stop(perfil)
+
+
+def save_profile(perfil, total, status):
+    """Guardar el .prof y el .json del perfil; devuelve el nombre"""
+    directorio = profiles_dir(current_app.config)
+    ruta = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'raiz'
+    nombre = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.method}-{ruta}"
+
+    perfil.profiler.dump_stats(os.path.join(directorio, nombre + '.prof'))
+    resumen = {
+        'nombre': nombre,
+        'metodo': request.method,
+        'ruta': request.full_path.rstrip('?'),
+        'status': status,
+        'motivo': perfil.motivo,
+        'fecha': datetime.utcnow().isoformat(),
+        'total_ms': round(total * 1000, 2),
+        'consultas': perfil.consultas,
+        'fases_ms': perfil.breakdown(total)
+    }
+    with open(os.path.join(directorio, nombre + '.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(resumen, archivo, indent=2)
+    return nombre
+
+
+def list_profiles(directorio, limite=None):
+    """Resúmenes de los perfiles guardados, del más reciente al más antiguo"""
+    rutas = sorted(glob.glob(os.path.join(directorio, '*.json')), reverse=True)
+    resumenes = []
+    for ruta in rutas[:limite]:
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                resumenes.append(json.load(archivo))
+        except (OSError, ValueError):
+            continue
+    return resumenes
+
+
+def top_functions(directorio, nombre, top=20, orden='cumulative'):
+    """Funciones más costosas de un perfil, en el formato de pstats"""
+    salida = io.StringIO()
+    stats = pstats.Stats(os.path.join(directorio, nombre + '.prof'), stream=salida)
+    stats.strip_dirs().sort_stats(orden).print_stats(top)
+    return salida.getvalue()
+
+
+def init_app(app):
+    """Registrar los hooks de perfilado y los comandos `flask perfiles`"""
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(_discard_profile)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.cli.group('perfiles')
+    def perfiles():
+        """Perfiles de peticiones"""
+
+    @perfiles.command('firmar')
+    @click.argument('ruta')
+    def sign_command(ruta):
+        """Valor de la cabecera X-Profile para RUTA (válido 5 minutos)"""
+        secreto = _secret(current_app.config)
+        if not secreto:
+            raise click.ClickException("Configure PROFILING_SECRET")
+        click.echo(f"{CABECERA}: {sign(ruta, secreto)}")
+
+    @perfiles.command('listar')
+    @click.option('--limite', type=int, default=20, help='Perfiles a mostrar')
+    def list_command(limite):
+        """Listar los perfiles guardados"""
+        for resumen in list_profiles(profiles_dir(current_app.config), limite):
+            fases = ' '.join(f"{fase}={ms}" for fase, ms in resumen['fases_ms'].items())
+            click.echo(f"{resumen['nombre']}  {resumen['status']}  "
+                       f"{resumen['total_ms']} ms  {resumen['consultas']} consultas  {fases}")
+
+    @perfiles.command('ver')
+    @click.argument('nombre')
+    @click.option('--top', type=int, default=20, help='Funciones a mostrar')
+    @click.option('--orden', default='cumulative', help='Orden de pstats (cumulative, tottime...)')
+    def show_command(nombre, top, orden):
+        """Desglose por fases y funciones más costosas de un perfil"""
+        directorio = profiles_dir(current_app.config)
+        try:
+            with open(os.path.join(directorio, nombre + '.json'), encoding='utf-8') as archivo:
+                resumen = json.load(archivo)
+        except OSError:
+            raise click.ClickException(f"No existe el perfil {nombre}")
+        click.echo(f"{resumen['metodo']} {resumen['ruta']} -> {resumen['status']} "
+                   f"({resumen['motivo']})")
+        click.echo(f"Total: {resumen['total_ms']} ms, {resumen['consultas']} consultas")
+        for fase, ms in resumen['fases_ms'].items():
+            click.echo(f"  {fase:<10} {ms:>10.2f} ms")
+        click.echo(top_functions(directorio, nombre, top, orden))
@@ -0,0 +1,222 @@
+"""
+Control de admisión con token buckets
+
+Las peticiones de escritura (POST, PUT, PATCH, DELETE) a los blueprints de
+RATE_LIMIT_BLUEPRINTS consumen un token del bucket del cliente y otro del
+bucket global antes de llegar a la vista. Sin tokens, la petición se rechaza
+con 429 y Retry-After sin tocar la base de datos.
+
+Cada bucket se rellena a RATE_LIMIT_*_RATE tokens por segundo hasta
+RATE_LIMIT_*_BURST. El estado vive en:
+    memory   un diccionario del proceso (cada proceso tiene sus propios límites)
+    sqlite   un archivo SQLite local compartido por todos los procesos del
+             servidor (`flask serve --workers N`), independiente de la base
+             de datos de la aplicación: RATE_LIMIT_STORE_PATH o, sin ella,
+             el directorio privado del usuario (ver services/runtime_dir.py)
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+from services.runtime_dir import private_dir
+
+METODOS_ESCRITURA = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def _refill(tokens, ultimo, ahora, tasa, capacidad):
+    """Tokens disponibles tras rellenar el bucket desde `ultimo` hasta `ahora`"""
+    return min(capacidad, tokens + max(0.0, ahora - ultimo) * tasa)
+
+
+def _take(tokens, tasa):
+    """Consumir un token: devuelve (permitido, tokens_restantes, espera_segundos)"""
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / tasa if tasa > 0 else float('inf')
+
+
+class MemoryStore:
+    """Buckets en memoria del proceso, con un máximo de claves (LRU)"""
+
+    def __init__(self, max_claves=10000):
+        self.max_claves = max_claves
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, clave, tasa, capacidad, ahora=None):
+        """Consumir un token de `clave`; devuelve (permitido, espera_segundos)"""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            tokens, ultimo = self._buckets.get(clave, (capacidad, ahora))
+            tokens = _refill(tokens, ultimo, ahora, tasa, capacidad)
+            permitido, tokens, espera = _take(tokens, tasa)
+            self._buckets[clave] = (tokens, ahora)
+            self._buckets.move_to_end(clave)
+            while len(self._buckets) > self.max_claves:
+                self._buckets.popitem(last=False)
+        return permitido, espera
+
+
+class SQLiteStore:
+    """Buckets en un archivo SQLite compartido entre procesos del mismo servidor
+
+    Cada consumo es una transacción BEGIN IMMEDIATE, así que dos procesos no
+    pueden gastar el mismo token.
+    """
+
+    def __init__(self, ruta, timeout=1.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "clave TEXT PRIMARY KEY, tokens REAL NOT NULL, ultimo REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conexion = getattr(self._local, 'conexion', None)
+        # Las conexiones no se comparten entre procesos: tras un fork se abre otra
+        if conexion is None or self._local.pid != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    def consume(self, clave, tasa, capacidad, ahora=None):
+        """Consumir un token de `clave`; devuelve (permitido, espera_segundos)"""
+        ahora = time.time() if ahora is None else ahora
+        conexion = self._connect()
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            # Si el archivo está bloqueado se admite la petición: el límite
+            # no debe convertirse en un punto de fallo
+            print(f"Error en el almacén de rate limit: {e}")
+            return True, 0.0
+        try:
+            fila = conexion.execute(
+                "SELECT tokens, ultimo FROM buckets WHERE clave = ?", (clave,)
+            ).fetchone()
+            tokens, ultimo = fila if fila else (capacidad, ahora)
+            tokens = _refill(tokens, ultimo, ahora, tasa, capacidad)
+            permitido, tokens, espera = _take(tokens, tasa)
+            conexion.execute(
+                "INSERT OR REPLACE INTO buckets (clave, tokens, ultimo) VALUES (?, ?, ?)",
+                (clave, tokens, ahora)
+            )
+            # De vez en cuando se borran los buckets inactivos (ya estarían llenos)
+            if random.random() < 0.01:
+                conexion.execute("DELETE FROM buckets WHERE ultimo < ?", (ahora - 3600,))
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        return permitido, espera
+
+
+class AdmissionControl:
+    """Buckets por cliente y global con contadores de peticiones admitidas y rechazadas"""
+
+    def __init__(self):
+        self.store = MemoryStore()
+        self.habilitado = True
+        self.blueprints = {'main'}
+        self.cabecera_cliente = None
+        self.tasa_cliente, self.rafaga_cliente = 5.0, 20
+        self.tasa_global, self.rafaga_global = 50.0, 100
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, config):
+        """Leer la configuración de la aplicación (se llama desde init_app)"""
+        self.habilitado = config.get('RATE_LIMIT_ENABLED', True)
+        self.blueprints = set(config.get('RATE_LIMIT_BLUEPRINTS', ['main']))
+        self.cabecera_cliente = config.get('RATE_LIMIT_CLIENT_HEADER')
+        self.tasa_cliente = config.get('RATE_LIMIT_CLIENT_RATE', 5.0)
+        self.rafaga_cliente = config.get('RATE_LIMIT_CLIENT_BURST', 20)
+        self.tasa_global = config.get('RATE_LIMIT_GLOBAL_RATE', 50.0)
+        self.rafaga_global = config.get('RATE_LIMIT_GLOBAL_BURST', 100)
+
+        if config.get('RATE_LIMIT_STORE', 'memory') == 'sqlite':
+            # Otro usuario local podría crear el archivo antes y vaciar o
+            # agotar los buckets: su directorio debe ser privado
+            ruta = config.get('RATE_LIMIT_STORE_PATH')
+            if ruta:
+                private_dir('ratelimit', os.path.dirname(os.path.abspath(ruta)))
+            else:
+                ruta = os.path.join(private_dir('ratelimit'), 'ratelimit.db')
+            self.store = SQLiteStore(ruta)
+        else:
+            self.store = MemoryStore()
+
+    def reset_stats(self):
+        """Reiniciar los contadores"""
+        with self._lock:
+            self._stats = {'admitidas': 0, 'rechazadas_cliente': 0, 'rechazadas_global': 0}
+
+    def stats(self):
+        """Contadores del proceso actual"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, contador):
+        with self._lock:
+            self._stats[contador] += 1
+
+    def client_id(self):
+        """Identificador del cliente: la cabecera configurada o la IP remota"""
+        if self.cabecera_cliente:
+            valor = request.headers.get(self.cabecera_cliente)
+            if valor:
+                return valor
+        return request.remote_addr or 'desconocido'
+
+    def admit(self):
+        """before_request: devolver una respuesta 429 si no hay tokens"""
+        if (not self.habilitado or request.method not in METODOS_ESCRITURA
+                or request.blueprint not in self.blueprints):
+            return None
+
+        ahora = time.time()
+        # Primero el cliente: un cliente abusivo no consume tokens globales
+        permitido, espera = self.store.consume(
+            f"cliente:{self.client_id()}", self.tasa_cliente, self.rafaga_cliente, ahora
+        )
+        if not permitido:
+            self._count('rechazadas_cliente')
+            return self._rejected(espera, 'Demasiadas peticiones de este cliente')
+
+        permitido, espera = self.store.consume(
+            'global', self.tasa_global, self.rafaga_global, ahora
+        )
+        if not permitido:
+            self._count('rechazadas_global')
+            return self._rejected(espera, 'Servidor saturado, intente más tarde')
+
+        self._count('admitidas')
+        return None
+
+    @staticmethod
+    def _rejected(espera, mensaje):
+        respuesta = jsonify({'error': mensaje})
+        respuesta.status_code = 429
+        respuesta.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+        return respuesta
+
+
+admission_control = AdmissionControl()
+
+
+def init_app(app):
+    """Configurar los buckets y filtrar las escrituras antes de llegar a las vistas"""
+    admission_control.configure(app.config)
+    app.before_request(admission_control.admit)
@@ -0,0 +1,358 @@
+"""
+Reportes de ventas sobre tablas de resumen
+
+Los resúmenes (ver models/reporte_model.py) se actualizan de forma incremental
+leyendo el outbox de pedidos (`pedido_eventos`) desde la última marca, así los
+reportes no recorren la tabla `pedidos`. `rebuild_rollups` los recalcula desde
+cero (sobre `pedidos`, `pedidos_archivo` y, con PEDIDOS_SHARDS, cada shard) y
+se usa la primera vez o para corregir divergencias:
+
+    flask --app app reportes rebuild
+    flask --app app reportes refresh
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import click
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+from models.evento_pedido_model import EventoPedido
+from models.pedido_model import Pedido
+from models.pedido_archivado_model import PedidoArchivado
+from models.producto_model import Producto
+from models.reporte_model import (
+    ResumenVentasProducto, ResumenVentasCategoria, ResumenPedidosEstado, MarcaReporte
+)
+from models.shard_router import shard_router
+
+MARCA = 'ventas'
+SIN_CATEGORIA = 'Sin categoría'
+AGRUPACIONES = ['dia', 'semana', 'producto', 'categoria']
+
+
+def _to_date(valor):
+    """Normalizar fechas devueltas por func.date() (SQLite devuelve texto)"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    return valor
+
+
+def _categorias(producto_ids):
+    """Mapa producto_id -> categoría para los productos indicados"""
+    if not producto_ids:
+        return {}
+    filas = db.session.query(Producto.id, Producto.categoria).filter(
+        Producto.id.in_(producto_ids)
+    ).all()
+    return {pid: categoria or SIN_CATEGORIA for pid, categoria in filas}
+
+
+# ==================== AGREGACIÓN DIRECTA ====================
+
+def _merge(resultado, clave, valores):
+    """Sumar valores de la tabla activa y del archivo bajo la misma clave"""
+    actual = resultado.get(clave)
+    resultado[clave] = tuple(a + b for a, b in zip(actual, valores)) if actual else valores
+
+
+def _all_rows(consulta_para):
+    """Filas de `consulta_para(modelo)` en `pedidos`, `pedidos_archivo` y cada shard
+
+    Con shards los pedidos activos viven en otras bases: la misma consulta se
+    lanza en paralelo en cada shard (ver Pedido._gather) y se juntan las filas.
+    """
+    filas = []
+    for modelo in (Pedido, PedidoArchivado):
+        filas.extend(db.session.execute(consulta_para(modelo)).all())
+    if shard_router.enabled:
+        consulta = consulta_para(Pedido)
+        for resultado in shard_router.scatter(lambda sesion: sesion.execute(consulta).all()):
+            filas.extend(resultado)
+    return filas
+
+
+def _sales_by_day_and_product():
+    """Filas (día, producto_id, pedidos, unidades, ingresos) de los pedidos no cancelados"""
+    return _all_rows(lambda modelo: select(
+        func.date(modelo.fecha_pedido), modelo.producto_id,
+        func.count(modelo.id), func.sum(modelo.cantidad), func.sum(modelo.precio_total)
+    ).where(modelo.estado != 'cancelado').group_by(
+        func.date(modelo.fecha_pedido), modelo.producto_id
+    ))
+
+
+def raw_sales_by_product():
+    """Ventas por (día, producto) calculadas sobre todos los pedidos"""
+    resultado = {}
+    for fecha, pid, pedidos, unidades, ingresos in _sales_by_day_and_product():
+        _merge(resultado, (_to_date(fecha), pid),
+               (pedidos, int(unidades), Decimal(str(ingresos))))
+    return resultado
+
+
+def raw_sales_by_category():
+    """Ventas por (día, categoría) calculadas sobre todos los pedidos
+
+    Los shards no tienen la tabla `productos`: se agrupa por producto y la
+    categoría se resuelve después, igual que en la actualización incremental.
+    """
+    filas = _sales_by_day_and_product()
+    categorias = _categorias({pid for _, pid, _, _, _ in filas})
+    resultado = {}
+    for fecha, pid, pedidos, unidades, ingresos in filas:
+        _merge(resultado, (_to_date(fecha), categorias.get(pid, SIN_CATEGORIA)),
+               (pedidos, int(unidades), Decimal(str(ingresos))))
+    return resultado
+
+
+def raw_orders_by_status():
+    """Pedidos e importe por estado calculados sobre todos los pedidos"""
+    resultado = {}
+    filas = _all_rows(lambda modelo: select(
+        modelo.estado, func.count(modelo.id), func.sum(modelo.precio_total)
+    ).group_by(modelo.estado))
+    for estado, pedidos, importe in filas:
+        _merge(resultado, estado, (pedidos, Decimal(str(importe))))
+    return resultado
+
+
+# ==================== MANTENIMIENTO ====================
+
+def rebuild_rollups():
+    """Recalcular todos los resúmenes desde los pedidos y mover la marca al último evento
+
+    Si hay cambios de pedidos aún sin confirmar por debajo del último evento
+    no se reconstruye: la marca los saltaría y nunca se acumularían.
+    """
+    try:
+        cursor = EventoPedido.get_settled_cursor()
+        if cursor is None:
+            return False, "Hay cambios de pedidos sin confirmar. Reintente en unos segundos"
+
+        ResumenVentasProducto.query.delete()
+        ResumenVentasCategoria.query.delete()
+        ResumenPedidosEstado.query.delete()
+
+        db.session.add_all(
+            ResumenVentasProducto(fecha=fecha, producto_id=pid, pedidos=p, unidades=u, ingresos=i)
+            for (fecha, pid), (p, u, i) in raw_sales_by_product().items()
+        )
+        db.session.add_all(
+            ResumenVentasCategoria(fecha=fecha, categoria=cat, pedidos=p, unidades=u, ingresos=i)
+            for (fecha, cat), (p, u, i) in raw_sales_by_category().items()
+        )
+        db.session.add_all(
+            ResumenPedidosEstado(estado=estado, pedidos=p, importe=i)
+            for estado, (p, i) in raw_orders_by_status().items()
+        )
+
+        marca = db.session.get(MarcaReporte, MARCA) or MarcaReporte(nombre=MARCA)
+        marca.cursor = cursor
+        marca.fecha_actualizacion = datetime.utcnow()
+        db.session.add(marca)
+
+        db.session.commit()
+        return True, f"Resúmenes reconstruidos hasta el evento {cursor}"
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return False, f"Error al reconstruir resúmenes: {str(e)}"
+
+
+def _fold(eventos):
+    """Calcular los deltas de los resúmenes para un lote de eventos"""
+    categorias = _categorias({e.producto_id for e in eventos})
+    ventas_producto, ventas_categoria, por_estado = {}, {}, {}
+
+    for evento in eventos:
+        importe = Decimal(str(evento.precio_total or 0))
+        unidades = evento.cantidad or 0
+
+        # Estado antes y después del evento; un pedido cuenta como venta si no
+        # está cancelado (ni eliminado)
+        antes = evento.estado_anterior if evento.tipo != 'creado' else None
+        despues = evento.estado if evento.tipo != 'eliminado' else None
+
+        if antes is not None:
+            fila = por_estado.setdefault((antes,), [0, Decimal('0')])
+            fila[0] -= 1
+            fila[1] -= importe
+        if despues is not None:
+            fila = por_estado.setdefault((despues,), [0, Decimal('0')])
+            fila[0] += 1
+            fila[1] += importe
+
+        signo = int(despues not in (None, 'cancelado')) - int(antes not in (None, 'cancelado'))
+        if signo == 0:
+            continue
+
+        fecha = (evento.fecha_pedido or evento.fecha_evento).date()
+        categoria = categorias.get(evento.producto_id, SIN_CATEGORIA)
+        for deltas, clave in ((ventas_producto, (fecha, evento.producto_id)),
+                              (ventas_categoria, (fecha, categoria))):
+            fila = deltas.setdefault(clave, [0, 0, Decimal('0')])
+            fila[0] += signo
+            fila[1] += signo * unidades
+            fila[2] += signo * importe
+
+    return ventas_producto, ventas_categoria, por_estado
+
+
+def _apply(modelo, claves, deltas, campos):
+    """Sumar deltas (clave en tupla -> valores) a un resumen, creando las filas que falten"""
+    if not deltas:
+        return
+    query = modelo.query
+    for i, nombre in enumerate(claves):
+        query = query.filter(getattr(modelo, nombre).in_({clave[i] for clave in deltas}))
+    existentes = {tuple(getattr(fila, c) for c in claves): fila for fila in query.all()}
+
+    for clave, valores in deltas.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            fila = modelo(**dict(zip(claves, clave)), **{campo: 0 for campo in campos})
+            db.session.add(fila)
+        for campo, valor in zip(campos, valores):
+            setattr(fila, campo, getattr(fila, campo) + valor)
+
+
+def refresh_rollups(tamano_lote=1000, max_lotes=None):
+    """Acumular en los resúmenes los eventos posteriores a la marca
+
+    Los eventos se leen con EventoPedido.get_since, que se detiene en un hueco
+    de ids reciente: un pedido confirmado tarde se acumula en la siguiente
+    pasada en lugar de perderse. Cada lote se aplica en una transacción junto con el avance de la marca. El
+    UPDATE de la marca comprueba el cursor anterior, de modo que si otro
+    proceso ya aplicó el lote se descarta el trabajo en lugar de duplicarlo.
+    Devuelve (eventos_procesados, mensaje).
+    """
+    marca = db.session.get(MarcaReporte, MARCA)
+    if marca is None:
+        success, message = rebuild_rollups()
+        return (0, message) if success else (None, message)
+
+    procesados = 0
+    lotes = 0
+    try:
+        while max_lotes is None or lotes < max_lotes:
+            cursor = marca.cursor
+            eventos = EventoPedido.get_since(cursor, tamano_lote)
+            if not eventos:
+                break
+
+            ventas_producto, ventas_categoria, por_estado = _fold(eventos)
+            nuevo_cursor = eventos[-1].id
+
+            avance = db.session.execute(
+                update(MarcaReporte)
+                .where(MarcaReporte.nombre == MARCA, MarcaReporte.cursor == cursor)
+                .values(cursor=nuevo_cursor, fecha_actualizacion=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if avance.rowcount != 1:
+                db.session.rollback()
+                return procesados, "Otro proceso está actualizando los resúmenes"
+
+            _apply(ResumenVentasProducto, ['fecha', 'producto_id'], ventas_producto,
+                   ['pedidos', 'unidades', 'ingresos'])
+            _apply(ResumenVentasCategoria, ['fecha', 'categoria'], ventas_categoria,
+                   ['pedidos', 'unidades', 'ingresos'])
+            _apply(ResumenPedidosEstado, ['estado'], por_estado, ['pedidos', 'importe'])
+            db.session.commit()
+
+            db.session.refresh(marca)
+            procesados += len(eventos)
+            lotes += 1
+
+        return procesados, f"{procesados} evento(s) acumulados en los resúmenes"
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return None, f"Error al actualizar resúmenes: {str(e)}"
+
+
+# ==================== CONSULTAS ====================
+
+def _row(clave, pedidos, unidades, ingresos):
+    return {
+        'clave': clave,
+        'pedidos': int(pedidos or 0),
+        'unidades': int(unidades or 0),
+        'ingresos': float(ingresos or 0)
+    }
+
+
+def sales_report(agrupacion='dia', desde=None, hasta=None):
+    """Ventas agrupadas por día, semana ISO, producto o categoría"""
+    if agrupacion not in AGRUPACIONES:
+        raise ValueError(f"Agrupación inválida. Opciones: {AGRUPACIONES}")
+
+    modelo = ResumenVentasCategoria if agrupacion == 'categoria' else ResumenVentasProducto
+    totales = [func.sum(modelo.pedidos), func.sum(modelo.unidades), func.sum(modelo.ingresos)]
+
+    if agrupacion == 'producto':
+        query = db.session.query(modelo.producto_id, Producto.nombre, *totales).outerjoin(
+            Producto, Producto.id == modelo.producto_id
+        ).group_by(modelo.producto_id, Producto.nombre)
+    elif agrupacion == 'categoria':
+        query = db.session.query(modelo.categoria, *totales).group_by(modelo.categoria)
+    else:
+        query = db.session.query(modelo.fecha, *totales).group_by(modelo.fecha)
+
+    if desde:
+        query = query.filter(modelo.fecha >= desde)
+    if hasta:
+        query = query.filter(modelo.fecha <= hasta)
+
+    filas = query.all()
+
+    if agrupacion == 'producto':
+        return [dict(_row(pid, *valores), nombre=nombre) for pid, nombre, *valores in filas]
+    if agrupacion == 'categoria':
+        return [_row(cat, *valores) for cat, *valores in filas]
+
+    filas = sorted(filas, key=lambda fila: fila[0])
+    if agrupacion == 'dia':
+        return [_row(fecha.isoformat(), *valores) for fecha, *valores in filas]
+
+    semanas = {}
+    for fecha, pedidos, unidades, ingresos in filas:
+        anio, semana, _ = fecha.isocalendar()
+        acumulado = semanas.setdefault(f"{anio}-W{semana:02d}", [0, 0, Decimal('0')])
+        acumulado[0] += pedidos or 0
+        acumulado[1] += unidades or 0
+        acumulado[2] += Decimal(str(ingresos or 0))
+    return [_row(clave, *valores) for clave, valores in semanas.items()]
+
+
+def status_report():
+    """Pedidos e importe por estado"""
+    return [
+        {'estado': fila.estado, 'pedidos': fila.pedidos, 'importe': float(fila.importe)}
+        for fila in ResumenPedidosEstado.query.order_by(ResumenPedidosEstado.estado).all()
+        if fila.pedidos
+    ]
+
+
+def init_app(app):
+    """Registrar los comandos `flask reportes rebuild|refresh`"""
+
+    @app.cli.group('reportes')
+    def reportes():
+        """Mantenimiento de los resúmenes de ventas"""
+
+    @reportes.command('rebuild')
+    def rebuild_command():
+        """Reconstruir los resúmenes desde la tabla de pedidos"""
+        success, message = rebuild_rollups()
+        click.echo(message)
+
+    @reportes.command('refresh')
+    @click.option('--lote', type=int, default=1000, help='Eventos por transacción')
+    def refresh_command(lote):
+        """Acumular los eventos nuevos en los resúmenes"""
+        procesados, message = refresh_rollups(tamano_lote=lote)
+        click.echo(message)
@@ -0,0 +1,60 @@
+"""
+Directorios de trabajo privados de la aplicación
+
+Las cachés y archivos compartidos entre procesos (bytecode de Jinja,
+coalescencia de lecturas, perfiles, instantánea del catálogo, buckets del
+control de admisión) no pueden vivir en una ruta fija del directorio temporal:
+cualquier usuario local podría crearla antes y dejar ahí archivos que la
+aplicación leería como propios. Sin una ruta configurada se usa un directorio
+por usuario del sistema:
+
+    /tmp/flask-app-<uid>/<nombre>      creado con permisos 0700
+
+Un directorio que ya existe solo se acepta si pertenece al usuario del
+proceso y ningún otro usuario puede escribir en él.
+"""
+
+import os
+import stat
+import tempfile
+
+
+def _check(ruta):
+    """Rechazar un directorio ajeno o en el que otros usuarios pueden escribir"""
+    info = os.lstat(ruta)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError(f"{ruta} no es un directorio")
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise RuntimeError(f"{ruta} debe pertenecer al usuario {os.getuid()} "
+                           f"y no admitir escritura de otros usuarios (permisos 0700)")
+
+
+def _make(ruta):
+    try:
+        os.mkdir(ruta, 0o700)
+    except FileExistsError:
+        pass
+    _check(ruta)
+
+
+def private_dir(nombre, ruta=None):
+    """Crear (si hace falta) y validar el directorio de trabajo `nombre`
+
+    Con `ruta` se usa ese directorio (configurado por el operador); sin ella,
+    el directorio privado del usuario en el temporal. Devuelve la ruta o
+    lanza RuntimeError si el directorio no es seguro.
+    """
+    if not hasattr(os, 'getuid'):  # sin permisos POSIX no hay nada que comprobar
+        ruta = ruta or os.path.join(tempfile.gettempdir(), 'flask-app', nombre)
+        os.makedirs(ruta, exist_ok=True)
+        return ruta
+
+    if ruta is None:
+        base = os.path.join(tempfile.gettempdir(), f'flask-app-{os.getuid()}')
+        _make(base)
+        ruta = os.path.join(base, nombre)
+    else:
+        padre = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(padre, mode=0o700, exist_ok=True)
+    _make(ruta)
+    return ruta
@@ -0,0 +1,120 @@
+"""
+Actualización del esquema de tablas ya existentes
+
+`db.create_all()` crea las tablas que faltan pero nunca modifica una tabla
+existente. Las columnas e índices añadidos después a tablas que ya estaban
+desplegadas (por ejemplo `version` en `pedidos` y `productos` para el bloqueo
+optimista, el índice `ix_pedidos_estado_fecha` del archivado o `token` en
+`claves_idempotencia`) se aplican con:
+
+    flask --app app esquema pendientes     # mostrar el DDL sin ejecutarlo
+    flask --app app esquema actualizar     # ejecutarlo (base principal y shards)
+
+El DDL equivale a, por ejemplo:
+
+    ALTER TABLE pedidos ADD COLUMN version INTEGER DEFAULT '1' NOT NULL;
+    ALTER TABLE productos ADD COLUMN version INTEGER DEFAULT '1' NOT NULL;
+    CREATE INDEX ix_pedidos_estado_fecha ON pedidos (estado, fecha_pedido);
+
+Solo se añaden columnas que admiten NULL o tienen valor por defecto en el
+servidor: las filas existentes necesitan un valor. Nunca se borra ni se
+modifica nada. Al arrancar, la aplicación avisa si hay cambios pendientes.
+"""
+
+import click
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from models import db
+from models.shard_router import shard_router
+
+
+def pending_changes(engine, metadata):
+    """DDL necesario para que las tablas existentes de `engine` coincidan con `metadata`
+
+    Las tablas que todavía no existen no se incluyen: las crea create_all().
+    Lanza RuntimeError si falta una columna que no se puede añadir a una
+    tabla con filas (NOT NULL sin valor por defecto en el servidor).
+    """
+    inspector = inspect(engine)
+    existentes = set(inspector.get_table_names())
+    preparador = engine.dialect.identifier_preparer
+    sentencias = []
+    for tabla in metadata.sorted_tables:
+        if tabla.name not in existentes:
+            continue
+        columnas = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in columnas:
+                continue
+            if not columna.nullable and columna.server_default is None:
+                raise RuntimeError(f"No se puede añadir {tabla.name}.{columna.name}: "
+                                   f"es NOT NULL y no tiene valor por defecto en el servidor")
+            definicion = CreateColumn(columna).compile(dialect=engine.dialect)
+            sentencias.append(f"ALTER TABLE {preparador.format_table(tabla)} "
+                              f"ADD COLUMN {str(definicion).strip()}")
+        indices = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+        for indice in sorted(tabla.indexes, key=lambda i: i.name):
+            if indice.name not in indices:
+                sentencias.append(str(CreateIndex(indice).compile(dialect=engine.dialect)).strip())
+    return sentencias
+
+
+def upgrade(engine, metadata):
+    """Aplicar en una transacción el DDL pendiente; devuelve las sentencias ejecutadas"""
+    sentencias = pending_changes(engine, metadata)
+    if sentencias:
+        with engine.begin() as conexion:
+            for sentencia in sentencias:
+                conexion.exec_driver_sql(sentencia)
+    return sentencias
+
+
+def _targets():
+    """Pares (nombre, engine, metadata): la base principal y cada shard de pedidos"""
+    destinos = [('principal', db.engine, db.metadata)]
+    for indice, engine in enumerate(shard_router.engines):
+        destinos.append((f'shard {indice}', engine, shard_router.metadata))
+    return destinos
+
+
+def warn_pending(app):
+    """Avisar al arrancar si hay tablas desplegadas con el esquema antiguo"""
+    with app.app_context():
+        try:
+            pendientes = sum(len(pending_changes(engine, metadata))
+                             for _, engine, metadata in _targets())
+        except RuntimeError as e:
+            print(f"Esquema no actualizable automáticamente: {e}")
+            return
+    if pendientes:
+        print(f"Hay {pendientes} cambio(s) de esquema pendientes: "
+              f"ejecute `flask --app app esquema actualizar`")
+
+
+def init_app(app):
+    """Registrar los comandos `flask esquema pendientes|actualizar`"""
+
+    @app.cli.group('esquema')
+    def esquema():
+        """Actualización del esquema de tablas existentes"""
+
+    @esquema.command('pendientes')
+    def pending_command():
+        """Mostrar el DDL pendiente sin ejecutarlo"""
+        try:
+            for nombre, engine, metadata in _targets():
+                for sentencia in pending_changes(engine, metadata):
+                    click.echo(f"-- {nombre}\n{sentencia};")
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+
+    @esquema.command('actualizar')
+    def upgrade_command():
+        """Añadir las columnas e índices que faltan"""
+        try:
+            for nombre, engine, metadata in _targets():
+                sentencias = upgrade(engine, metadata)
+                click.echo(f"{nombre}: {len(sentencias)} cambio(s) aplicados")
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
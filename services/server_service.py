@@ -0,0 +1,268 @@
+"""
+Servidor de producción multiproceso (prefork)
+
+`flask --app app serve` carga la aplicación una sola vez en el proceso padre,
+abre el socket y crea WORKERS procesos hijo con fork(), que comparten la
+memoria de la aplicación ya cargada (copy-on-write). Cada hijo atiende
+peticiones con un pool de SERVER_THREADS hilos y se recicla tras
+SERVER_MAX_REQUESTS peticiones (más un margen aleatorio) para acotar el
+crecimiento de memoria.
+
+Señales al proceso padre:
+    SIGHUP           reinicio ordenado: arranca hijos nuevos y retira los viejos
+    SIGTERM/SIGINT   parada ordenada: los hijos terminan las peticiones en curso
+
+Comparar rendimiento entre configuraciones (en otra terminal):
+
+    flask --app app serve --workers 1 --threads 1 --port 8000 &
+    flask --app app bench http://127.0.0.1:8000/productos -n 2000 -c 32
+    # repetir con --workers 4 --threads 1, --workers 2 --threads 8, ...
+
+`bench` imprime peticiones por segundo y latencias p50/p95/p99.
+"""
+
+import os
+import random
+import signal
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from werkzeug.serving import BaseWSGIServer
+
+from models import db
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI de Werkzeug que atiende las conexiones con un pool de hilos"""
+
+    def __init__(self, *args, threads=1, **kwargs):
+        self.pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        if self.pool is None:
+            return super().process_request(request, client_address)
+        self.pool.submit(self._process_in_thread, request, client_address)
+
+    def _process_in_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def close(self):
+        """Esperar a las peticiones en curso y cerrar el socket"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        self.server_close()
+
+
+class RequestCounter:
+    """Middleware WSGI que pide el reciclado del proceso tras `limite` peticiones"""
+
+    def __init__(self, app, limite, al_llegar):
+        self.app = app
+        self.limite = limite
+        self.al_llegar = al_llegar
+        self.atendidas = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self.lock:
+                self.atendidas += 1
+                if self.limite and self.atendidas == self.limite:
+                    self.al_llegar()
+
+
+def _run_worker(app, host, port, fd, threads, max_requests):
+    """Bucle de un proceso hijo hasta recibir SIGTERM o alcanzar max_requests"""
+    # Las conexiones del pool se abrieron en el padre: no se comparten entre procesos
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    servidor = None
+    parar = threading.Event()
+
+    def detener(*args):
+        parar.set()
+        # shutdown() espera al bucle de serve_forever, se llama desde otro hilo
+        if servidor is not None:
+            threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    wsgi_app = RequestCounter(app, max_requests, detener) if max_requests else app
+    servidor = PooledWSGIServer(host, port, wsgi_app, fd=fd, threads=threads)
+
+    try:
+        # Una señal recibida mientras se creaba el servidor no llegó a pararlo
+        if not parar.is_set():
+            servidor.serve_forever(poll_interval=0.5)
+    finally:
+        servidor.close()
+
+
+def run_server(app, host='127.0.0.1', port=8000, workers=None, threads=None,
+               max_requests=None, max_requests_jitter=None):
+    """Arrancar el proceso padre y mantener `workers` hijos vivos"""
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("El servidor prefork requiere os.fork() (Linux/macOS)")
+
+    config = app.config
+    workers = workers or config.get('SERVER_WORKERS', 2)
+    threads = threads or config.get('SERVER_THREADS', 1)
+    max_requests = max_requests if max_requests is not None else config.get('SERVER_MAX_REQUESTS', 0)
+    jitter = max_requests_jitter if max_requests_jitter is not None else config.get('SERVER_MAX_REQUESTS_JITTER', 0)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    fd = sock.fileno()
+
+    hijos = set()
+    estado = {'parar': False, 'reiniciar': False}
+
+    def lanzar():
+        limite = max_requests + random.randint(0, jitter) if max_requests else 0
+        pid = os.fork()
+        if pid == 0:
+            codigo = 1
+            try:
+                _run_worker(app, host, port, fd, threads, limite)
+                codigo = 0
+            finally:
+                # El hijo nunca debe volver al bucle del padre
+                os._exit(codigo)
+        hijos.add(pid)
+        return pid
+
+    def on_stop(*args):
+        estado['parar'] = True
+
+    def on_hup(*args):
+        estado['reiniciar'] = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_hup)
+
+    print(f"Servidor en http://{host}:{port} - {workers} proceso(s) x {threads} hilo(s), "
+          f"reciclado cada {max_requests or '∞'} peticiones (pid {os.getpid()})")
+    for _ in range(workers):
+        lanzar()
+
+    while True:
+        if estado['parar']:
+            break
+
+        if estado['reiniciar']:
+            estado['reiniciar'] = False
+            viejos = set(hijos)
+            for _ in range(workers):
+                lanzar()
+            for pid in viejos:
+                os.kill(pid, signal.SIGTERM)
+            print(f"Reinicio ordenado: {len(viejos)} proceso(s) retirados")
+
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in hijos:
+            hijos.discard(pid)
+        # Reponer los procesos reciclados o caídos
+        while not estado['parar'] and len(hijos) < workers:
+            lanzar()
+        time.sleep(0.2)
+
+    for pid in hijos:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in hijos:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def run_benchmark(url, total=1000, concurrencia=16, timeout=30):
+    """Lanzar `total` GET contra `url` con `concurrencia` hilos y medir"""
+    latencias = []
+    errores = [0]
+    lock = threading.Lock()
+
+    def una():
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as respuesta:
+                respuesta.read()
+            duracion = time.perf_counter() - inicio
+            with lock:
+                latencias.append(duracion)
+        except Exception:
+            with lock:
+                errores[0] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        for _ in range(total):
+            pool.submit(una)
+    duracion = time.perf_counter() - inicio
+
+    percentiles = statistics.quantiles(latencias, n=100) if len(latencias) >= 2 else [0] * 99
+    return {
+        'peticiones': total,
+        'errores': errores[0],
+        'segundos': round(duracion, 3),
+        'rps': round(len(latencias) / duracion, 1) if duracion else 0,
+        'p50_ms': round(percentiles[49] * 1000, 1),
+        'p95_ms': round(percentiles[94] * 1000, 1),
+        'p99_ms': round(percentiles[98] * 1000, 1)
+    }
+
+
+def init_app(app):
+    """Registrar los comandos `flask serve` y `flask bench`"""
+
+    @app.cli.command('serve')
+    @click.option('--host', default='127.0.0.1')
+    @click.option('--port', type=int, default=8000)
+    @click.option('--workers', type=int, default=None, help='Procesos hijo')
+    @click.option('--threads', type=int, default=None, help='Hilos por proceso')
+    @click.option('--max-requests', type=int, default=None, help='Reciclar tras N peticiones (0 = nunca)')
+    @click.option('--max-requests-jitter', type=int, default=None, help='Margen aleatorio del reciclado')
+    def serve_command(host, port, workers, threads, max_requests, max_requests_jitter):
+        """Servidor de producción multiproceso"""
+        try:
+            run_server(app, host, port, workers, threads, max_requests, max_requests_jitter)
+        except RuntimeError as e:
+            click.echo(str(e))
+            sys.exit(1)
+
+    @app.cli.command('bench')
+    @click.argument('url')
+    @click.option('-n', '--total', type=int, default=1000, help='Número de peticiones')
+    @click.option('-c', '--concurrencia', type=int, default=16, help='Peticiones simultáneas')
+    def bench_command(url, total, concurrencia):
+        """Medir rendimiento de una URL (peticiones/s y latencias)"""
+        resultado = run_benchmark(url, total, concurrencia)
+        for clave, valor in resultado.items():
+            click.echo(f"{clave:>10}: {valor}")
@@ -0,0 +1,47 @@
+"""
+Pedidos repartidos en varias bases de datos (shards) por usuario_id
+
+PEDIDOS_SHARDS es la lista de URIs de los shards, separadas por comas; el
+orden define el número de cada shard y no debe cambiar una vez que hay datos.
+Para probarlo en local con varios archivos SQLite:
+
+    PEDIDOS_SHARDS=sqlite:////tmp/pedidos_0.db,sqlite:////tmp/pedidos_1.db \
+        flask --app app shards crear
+
+    flask --app app shards info        # pedidos por shard
+
+Ver models/shard_router.py para el reparto y Pedido para las operaciones que
+van a un solo shard y las que consultan todos en paralelo.
+"""
+
+import click
+
+from models.shard_router import shard_router
+
+
+def init_app(app):
+    """Conectar con los shards configurados y registrar los comandos `flask shards`"""
+    shard_router.configure(app.config.get('PEDIDOS_SHARDS') or [])
+    if shard_router.enabled:
+        shard_router.create_all()
+
+    @app.cli.group('shards')
+    def shards():
+        """Shards de pedidos"""
+
+    @shards.command('crear')
+    def create_command():
+        """Crear el esquema de pedidos en todos los shards"""
+        if not shard_router.enabled:
+            raise click.ClickException("No hay shards configurados (PEDIDOS_SHARDS)")
+        shard_router.create_all()
+        click.echo(f"Esquema creado en {len(shard_router.engines)} shard(s)")
+
+    @shards.command('info')
+    def info_command():
+        """Número de pedidos en cada shard"""
+        if not shard_router.enabled:
+            click.echo("Sin shards: los pedidos están en la base principal")
+            return
+        for indice, (engine, total) in enumerate(zip(shard_router.engines, shard_router.counts())):
+            click.echo(f"Shard {indice}: {total} pedido(s)  {engine.url.render_as_string()}")
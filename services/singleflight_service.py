@@ -0,0 +1,212 @@
+"""
+Coalescencia de lecturas simultáneas (single-flight)
+
+Cuando varias peticiones necesitan a la vez el mismo resultado (por ejemplo la
+lista de productos justo después de que caduque la caché), solo una lo calcula
+y las demás esperan y reciben ese mismo valor. Las que esperan más de
+SINGLEFLIGHT_TIMEOUT segundos lo calculan por su cuenta.
+
+Con SINGLEFLIGHT_SHARED la coalescencia se extiende a todos los procesos del
+servidor (`flask serve --workers N`): un bloqueo de archivo por clave decide
+quién calcula y el resultado se deja en SINGLEFLIGHT_DIR (por defecto un
+directorio privado del usuario, ver services/runtime_dir.py) para los procesos
+que estaban esperando. Igual que dentro del proceso, solo se reutiliza un
+resultado que terminó de calcularse mientras se esperaba; los resultados
+anteriores a la llamada se ignoran.
+
+Los resultados se comparten como JSON, nunca con pickle: leer un archivo no
+puede ejecutar código. Un resultado que no se puede representar en JSON no se
+comparte y cada proceso lo calcula por su cuenta.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+from markupsafe import Markup
+
+from services.runtime_dir import private_dir
+
+
+class _Llamada:
+    """Cálculo en curso dentro del proceso"""
+
+    def __init__(self):
+        self.terminada = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class SingleFlight:
+    """Ejecuta una sola vez cada cálculo simultáneo con la misma clave"""
+
+    def __init__(self, timeout=5.0, compartido=False, directorio=None):
+        self.habilitado = True
+        self.timeout = timeout
+        self.compartido = compartido
+        self.directorio = directorio
+        self._llamadas = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, config):
+        """Leer la configuración de la aplicación (se llama desde init_app)"""
+        self.habilitado = config.get('SINGLEFLIGHT_ENABLED', True)
+        self.timeout = config.get('SINGLEFLIGHT_TIMEOUT', 5.0)
+        self.compartido = config.get('SINGLEFLIGHT_SHARED', False)
+        self.directorio = config.get('SINGLEFLIGHT_DIR')
+        if self.habilitado and self.compartido:
+            # Un directorio inseguro se detecta al arrancar, no en cada petición
+            private_dir('singleflight', self.directorio)
+
+    def reset_stats(self):
+        """Reiniciar los contadores"""
+        with self._lock:
+            self._stats = {'calculos': 0, 'coalescidas': 0, 'coalescidas_procesos': 0,
+                           'timeouts': 0, 'errores': 0}
+
+    def stats(self):
+        """Contadores del proceso actual"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['en_curso'] = len(self._llamadas)
+        return stats
+
+    def _count(self, contador):
+        with self._lock:
+            self._stats[contador] += 1
+
+    def do(self, clave, funcion):
+        """Devolver `funcion()`, compartiendo el cálculo con las llamadas simultáneas"""
+        if not self.habilitado:
+            return funcion()
+
+        with self._lock:
+            llamada = self._llamadas.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._llamadas[clave] = _Llamada()
+
+        if not lider:
+            if not llamada.terminada.wait(self.timeout):
+                self._count('timeouts')
+                return funcion()
+            self._count('coalescidas')
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            if self.compartido:
+                llamada.resultado = self._do_shared(clave, funcion)
+            else:
+                llamada.resultado = self._compute(funcion)
+            return llamada.resultado
+        except Exception as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._llamadas[clave]
+            llamada.terminada.set()
+
+    def _compute(self, funcion):
+        self._count('calculos')
+        try:
+            return funcion()
+        except Exception:
+            self._count('errores')
+            raise
+
+    def _rutas(self, clave):
+        directorio = private_dir('singleflight', self.directorio)
+        nombre = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        base = os.path.join(directorio, nombre)
+        return base + '.lock', base + '.json'
+
+    def _do_shared(self, clave, funcion):
+        """Coalescer también con los demás procesos mediante un bloqueo de archivo"""
+        ruta_lock, ruta_resultado = self._rutas(clave)
+        inicio = time.time()
+        with open(ruta_lock, 'a') as archivo_lock:
+            if not self._lock_file(archivo_lock, inicio + self.timeout):
+                self._count('timeouts')
+                return self._compute(funcion)
+            try:
+                # Otro proceso calculó el resultado mientras esperábamos
+                resultado = self._read_result(ruta_resultado, inicio)
+                if resultado is not None:
+                    self._count('coalescidas_procesos')
+                    return resultado[0]
+
+                valor = self._compute(funcion)
+                self._write_result(ruta_resultado, valor)
+                return valor
+            finally:
+                fcntl.flock(archivo_lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _lock_file(archivo, limite):
+        pausa = 0.005
+        while True:
+            try:
+                fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.time() >= limite:
+                    return False
+                time.sleep(pausa)
+                pausa = min(pausa * 2, 0.05)
+
+    @staticmethod
+    def _read_result(ruta, desde):
+        """Resultado terminado después de `desde`, como tupla (valor,), o None"""
+        try:
+            with open(ruta, 'r', encoding='utf-8') as archivo:
+                datos = json.load(archivo, object_hook=_decode)
+            terminado_en, valor = datos['terminado_en'], datos['valor']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return (valor,) if terminado_en >= desde else None
+
+    @staticmethod
+    def _write_result(ruta, valor):
+        # Escritura atómica: los lectores ven el archivo anterior o el nuevo completo
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            contenido = json.dumps({'terminado_en': time.time(), 'valor': _encode(valor)})
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"No se pudo compartir el resultado de single-flight: {e}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+
+def _encode(valor):
+    """Marcar el HTML seguro (Markup) para que siga siéndolo al leerlo"""
+    if isinstance(valor, Markup):
+        return {'__markup__': str(valor)}
+    if isinstance(valor, dict):
+        return {clave: _encode(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_encode(v) for v in valor]
+    return valor
+
+
+def _decode(objeto):
+    if len(objeto) == 1 and '__markup__' in objeto:
+        return Markup(objeto['__markup__'])
+    return objeto
+
+
+single_flight = SingleFlight()
+
+
+def init_app(app):
+    """Configurar la coalescencia de lecturas"""
+    single_flight.configure(app.config)
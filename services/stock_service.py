@@ -0,0 +1,111 @@
+"""
+Libro de movimientos y reservas de stock
+
+    flask --app app stock expirar               # liberar reservas vencidas
+    flask --app app stock conciliar [--corregir]
+    flask --app app stock ajustar recuento.csv [--motivo TEXTO] [--lote N]
+
+`conciliar` compara `productos.stock` con la suma de `movimientos_stock`. Los
+productos creados antes de existir el libro no tienen movimientos; con
+--corregir se les registra un ajuste por la diferencia (el stock no cambia).
+
+`ajustar` aplica un recuento de inventario leído sobre la marcha (o desde la
+entrada estándar con `-`). El CSV lleva cabecera con `producto_id` y una
+columna `stock` (stock contado) y/o `delta` (diferencia); en cada fila se
+rellena una de las dos. También acepta JSON por líneas (--formato ndjson) con
+objetos {"producto_id": 1, "stock": 10} o {"producto_id": 2, "delta": -3}.
+"""
+
+import csv
+import json
+
+import click
+
+from models import db
+from models.movimiento_stock_model import MovimientoStock
+from models.reserva_stock_model import ReservaStock
+
+
+def reconcile(corregir=False):
+    """Comparar el stock cacheado con el libro y, opcionalmente, corregir el libro
+
+    Devuelve la lista [(producto_id, stock, saldo_libro)] de diferencias.
+    """
+    diferencias = MovimientoStock.find_mismatches()
+    if corregir and diferencias:
+        for producto_id, stock, saldo in diferencias:
+            MovimientoStock.record(producto_id, 'ajuste', (stock or 0) - saldo,
+                                   motivo='Conciliación con el stock existente')
+        db.session.commit()
+    return diferencias
+
+
+def read_adjustments(lineas, formato='csv'):
+    """Filas (producto_id, nuevo_stock, delta) de un recuento, sin cargarlo entero
+
+    Las filas mal formadas se devuelven igualmente para que
+    MovimientoStock.apply_bulk las cuente como inválidas. Lanza ValueError si
+    la cabecera del CSV no tiene las columnas necesarias.
+    """
+    if formato == 'ndjson':
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                datos = json.loads(linea)
+                yield datos.get('producto_id'), datos.get('stock'), datos.get('delta')
+            except (ValueError, AttributeError):
+                yield None, None, None
+        return
+
+    lector = csv.DictReader(lineas)
+    columnas = set(lector.fieldnames or [])
+    if 'producto_id' not in columnas or not columnas & {'stock', 'delta'}:
+        raise ValueError("El CSV debe tener las columnas producto_id y stock y/o delta")
+    for fila in lector:
+        yield fila.get('producto_id'), fila.get('stock'), fila.get('delta')
+
+
+def init_app(app):
+    """Registrar los comandos `flask stock expirar|conciliar`"""
+
+    @app.cli.group('stock')
+    def stock():
+        """Movimientos y reservas de stock"""
+
+    @stock.command('expirar')
+    @click.option('--lote', type=int, default=None, help='Reservas por transacción')
+    def expire_command(lote):
+        """Liberar las reservas de stock vencidas"""
+        expiradas, message = ReservaStock.expire_due(tamano_lote=lote)
+        click.echo(message)
+
+    @stock.command('ajustar')
+    @click.argument('archivo', type=click.File('r', encoding='utf-8'))
+    @click.option('--formato', type=click.Choice(['csv', 'ndjson']), default='csv')
+    @click.option('--motivo', default=None, help='Motivo de los movimientos de ajuste')
+    @click.option('--lote', type=int, default=None, help='Filas por transacción')
+    def adjust_command(archivo, formato, motivo, lote):
+        """Fijar o corregir el stock de muchos productos desde ARCHIVO (- = stdin)"""
+        try:
+            resumen, message = MovimientoStock.apply_bulk(
+                read_adjustments(archivo, formato), motivo=motivo, tamano_lote=lote
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if resumen is None:
+            raise click.ClickException(message)
+        click.echo(message)
+        for clave in ('desconocidos', 'rechazados', 'invalidas'):
+            if resumen[clave]:
+                click.echo(f"{clave}: {', '.join(map(str, resumen[clave]))}")
+
+    @stock.command('conciliar')
+    @click.option('--corregir', is_flag=True, help='Registrar ajustes para las diferencias')
+    def reconcile_command(corregir):
+        """Comparar productos.stock con el libro de movimientos"""
+        diferencias = reconcile(corregir)
+        for producto_id, stock, saldo in diferencias:
+            click.echo(f"Producto {producto_id}: stock {stock}, libro {saldo}")
+        click.echo(f"{len(diferencias)} producto(s) con diferencias"
+                   + (" corregidos" if corregir and diferencias else ""))
@@ -0,0 +1,183 @@
+"""
+Procesamiento de pedidos en segundo plano
+
+Los trabajadores reclaman tareas de la tabla `tareas` (ver models/tarea_model.py)
+y ejecutan el handler registrado para su tipo. Se pueden lanzar como pool de
+hilos dentro de un proceso con `flask --app app worker --concurrencia 4`.
+"""
+
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import click
+from flask import current_app
+
+from models import db
+from models.tarea_model import Tarea
+
+# Registro de handlers: tipo de tarea -> función(payload)
+HANDLERS = {}
+
+
+def register_handler(tipo):
+    """Decorador para registrar el handler de un tipo de tarea"""
+    def decorator(func):
+        HANDLERS[tipo] = func
+        return func
+    return decorator
+
+
+@register_handler('procesar_pedido')
+def procesar_pedido(payload):
+    """Avanzar un pedido recién creado de 'pendiente' a 'procesando'"""
+    from models.pedido_model import Pedido
+
+    pedido = Pedido.get_by_id(payload['pedido_id'])
+    if not pedido:
+        return True, "Pedido no encontrado, nada que procesar"
+    if pedido.estado != 'pendiente':
+        return True, f"Pedido en estado '{pedido.estado}', no se procesa"
+
+    return pedido.update_status('procesando')
+
+
+@register_handler('notificar_pedido')
+def notificar_pedido(payload):
+    """Enviar el pedido al webhook ORDER_WEBHOOK_URL con un POST JSON
+
+    Una respuesta que no sea 2xx o un error de red se reintentan con el
+    backoff de la cola.
+    """
+    from models.pedido_model import Pedido
+
+    url = current_app.config.get('ORDER_WEBHOOK_URL')
+    if not url:
+        return True, "Sin webhook configurado, nada que notificar"
+    pedido = Pedido.get_by_id(payload['pedido_id'])
+    if not pedido:
+        return True, "Pedido no encontrado, nada que notificar"
+
+    cuerpo = json.dumps({'evento': payload.get('evento'), 'pedido': pedido.to_dict()})
+    peticion = urllib.request.Request(url, data=cuerpo.encode('utf-8'), method='POST',
+                                      headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(peticion, timeout=current_app.config.get(
+                'ORDER_WEBHOOK_TIMEOUT', 5)) as respuesta:
+            estado = respuesta.status
+    except (urllib.error.URLError, OSError) as e:
+        return False, f"Error al notificar el pedido: {e}"
+    if not 200 <= estado < 300:
+        return False, f"El webhook respondió {estado}"
+    return True, "Notificación enviada"
+
+
+@register_handler('expirar_reservas')
+def expirar_reservas(payload):
+    """Liberar las reservas de stock vencidas (se programa al crear cada reserva)"""
+    from models.reserva_stock_model import ReservaStock
+
+    expiradas, message = ReservaStock.expire_due()
+    return expiradas is not None, message
+
+
+def run_task(tarea):
+    """Ejecutar una tarea reclamada y registrar el resultado"""
+    handler = HANDLERS.get(tarea.tipo)
+    if handler is None:
+        tarea.fail(f"Tipo de tarea desconocido: {tarea.tipo}")
+        return False
+
+    try:
+        success, message = handler(tarea.get_payload())
+    except Exception as e:
+        db.session.rollback()
+        success, message = False, f"Error inesperado: {str(e)}"
+
+    if success:
+        guardado, mensaje = tarea.complete()
+    else:
+        guardado, mensaje = tarea.fail(message)
+    if not guardado:
+        print(f"No se pudo registrar el resultado de la tarea {tarea.id}: {mensaje}")
+    return success
+
+
+def process_pending(trabajador='local', limite=100, lease_segundos=60):
+    """Procesar tareas disponibles en el hilo actual; devuelve cuántas se ejecutaron"""
+    procesadas = 0
+    while procesadas < limite:
+        tareas = Tarea.claim(trabajador, limite=1, lease_segundos=lease_segundos)
+        if not tareas:
+            break
+        for tarea in tareas:
+            run_task(tarea)
+            procesadas += 1
+    return procesadas
+
+
+class WorkerPool:
+    """Pool de hilos que consume la cola de tareas"""
+
+    def __init__(self, app, concurrencia=None, intervalo=None, lease_segundos=None):
+        self.app = app
+        self.concurrencia = concurrencia or app.config.get('WORKER_CONCURRENCY', 4)
+        self.intervalo = intervalo or app.config.get('WORKER_POLL_INTERVAL', 1.0)
+        self.lease_segundos = lease_segundos or app.config.get('WORKER_LEASE_SECONDS', 60)
+        self.detener = threading.Event()
+        self.hilos = []
+
+    def _loop(self, nombre):
+        with self.app.app_context():
+            while not self.detener.is_set():
+                tareas = []
+                try:
+                    tareas = Tarea.claim(nombre, limite=1, lease_segundos=self.lease_segundos)
+                    for tarea in tareas:
+                        run_task(tarea)
+                except Exception as e:
+                    print(f"Error en trabajador {nombre}: {e}")
+                finally:
+                    db.session.remove()
+                if not tareas:
+                    self.detener.wait(self.intervalo)
+
+    def start(self):
+        """Arrancar los hilos trabajadores"""
+        base = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(self.concurrencia):
+            hilo = threading.Thread(target=self._loop, args=(f"{base}:{i}",), daemon=True)
+            hilo.start()
+            self.hilos.append(hilo)
+
+    def stop(self, timeout=None):
+        """Detener los hilos y esperar a que terminen la tarea en curso"""
+        self.detener.set()
+        for hilo in self.hilos:
+            hilo.join(timeout)
+        self.hilos = []
+
+
+def init_app(app):
+    """Registrar el comando `worker` en la CLI de Flask"""
+
+    @app.cli.command('worker')
+    @click.option('--concurrencia', type=int, default=None, help='Número de hilos trabajadores')
+    def worker_command(concurrencia):
+        """Procesar la cola de tareas hasta recibir SIGINT/SIGTERM"""
+        pool = WorkerPool(app, concurrencia=concurrencia)
+        signal.signal(signal.SIGTERM, lambda *args: pool.detener.set())
+        pool.start()
+        click.echo(f"Trabajadores iniciados: {pool.concurrencia}")
+        try:
+            while not pool.detener.is_set():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        click.echo("Deteniendo trabajadores...")
+        pool.stop()
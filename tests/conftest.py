@@ -6,12 +6,33 @@ from unittest.mock import MagicMock
 # Agregar el directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from models import db
+from tests.database import create_test_app, rollback_transaction
+
 @pytest.fixture
 def mock_db():
     """Mock de la base de datos para testing"""
     db_mock = MagicMock()
     return db_mock
 
+@pytest.fixture(scope='session')
+def test_app():
+    """Aplicación con base SQLite real, una por proceso de tests"""
+    app = create_test_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+@pytest.fixture
+def db_session(test_app):
+    """Sesión real cuyos cambios se deshacen al terminar el test"""
+    with test_app.app_context():
+        with rollback_transaction() as session:
+            yield session
+
 @pytest.fixture
 def sample_producto_data():
     """Datos de ejemplo para tests de productos"""
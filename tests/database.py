@@ -0,0 +1,126 @@
+"""
+Base de datos real para los tests
+
+Cada proceso de tests usa su propia base SQLite: en memoria por defecto, o la
+indicada en TEST_DATABASE_URI, donde `{worker}` se sustituye por el proceso
+(por ejemplo sqlite:////tmp/tests_{worker}.db). El esquema se crea una vez por
+clase y cada test se ejecuta dentro de una transacción que se deshace al
+terminar: los commit() del código probado solo liberan un SAVEPOINT, así que
+los tests no se ven entre sí y no hace falta recrear las tablas.
+
+    class TestAlgo(DatabaseTestCase):
+        CONFIG = {'ASYNC_ORDER_PROCESSING': False}
+
+        def setUp(self):
+            super().setUp()
+            ...datos de ejemplo...
+"""
+
+import os
+import sys
+import unittest
+from contextlib import contextmanager
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from models import db
+import models.models  # registrar todas las tablas
+
+
+def database_uri():
+    """URI de la base de pruebas de este proceso"""
+    uri = os.environ.get('TEST_DATABASE_URI', 'sqlite://')
+    worker = os.environ.get('PYTEST_XDIST_WORKER') or str(os.getpid())
+    return uri.replace('{worker}', worker)
+
+
+def _enable_sqlite_savepoints(engine):
+    # pysqlite abre sus propias transacciones e impide usar SAVEPOINT;
+    # se desactiva ese comportamiento y se emite BEGIN explícitamente
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _begin(conexion):
+        conexion.exec_driver_sql('BEGIN')
+
+
+def create_test_app(**config):
+    """Crear una aplicación mínima conectada a la base de pruebas"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            _enable_sqlite_savepoints(db.engine)
+    return app
+
+
+class _BoundSession(Session):
+    """Sesión que usa siempre la conexión de la transacción del test"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind or self.bind or super().get_bind(mapper, clause, **kwargs)
+
+
+@contextmanager
+def rollback_transaction():
+    """Ejecutar el bloque en una transacción que se deshace al salir
+
+    Requiere un contexto de aplicación activo. Mientras dura, `db.session` está
+    ligada a una única conexión y cada commit() se convierte en un SAVEPOINT.
+    """
+    conexion = db.engine.connect()
+    transaccion = conexion.begin()
+    sesion_original = db.session
+    db.session = db._make_scoped_session({
+        'class_': _BoundSession,
+        'bind': conexion,
+        'join_transaction_mode': 'create_savepoint'
+    })
+    try:
+        yield db.session
+    finally:
+        db.session.remove()
+        db.session = sesion_original
+        transaccion.rollback()
+        conexion.close()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """TestCase con base de datos real y rollback al final de cada test"""
+
+    # Configuración extra de la aplicación para la clase
+    CONFIG = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.app = create_test_app(**cls.CONFIG)
+        with cls.app.app_context():
+            db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        super().tearDownClass()
+
+    def setUp(self):
+        """Abrir el contexto de aplicación y la transacción del test"""
+        # Con addCleanup se libera todo aunque falle el setUp de la subclase
+        ctx = self.app.app_context()
+        ctx.push()
+        self.addCleanup(ctx.pop)
+        transaccion = rollback_transaction()
+        transaccion.__enter__()
+        self.addCleanup(transaccion.__exit__, None, None, None)
@@ -0,0 +1,42 @@
+import unittest
+import sys
+import os
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.producto_model import Producto
+
+
+class TestDatabaseIsolation(DatabaseTestCase):
+    """Tests del aislamiento de cada test con rollback de su transacción"""
+
+    def test_commits_are_rolled_back_after_the_test(self):
+        """Test: Lo confirmado dentro de la transacción del test desaparece al salir"""
+        producto, mensaje = Producto.create_product('Temporal', 5)
+        self.assertIsNotNone(producto)
+        self.assertEqual(Producto.count(), 1)
+
+        # Cerrar la transacción y el contexto del test como al terminar
+        self.doCleanups()
+
+        with self.app.app_context():
+            self.assertEqual(Producto.count(), 0)
+
+    def test_rollback_keeps_previous_commits(self):
+        """Test: Un rollback del código probado solo deshace hasta el último commit"""
+        sesion = db.session
+        Producto.create_product('Confirmado', 5)
+
+        db.session.add(Producto(nombre='Pendiente', precio=1))
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual([p.nombre for p in Producto.get_all()], ['Confirmado'])
+        self.assertIs(db.session, sesion)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.base_model import MENSAJE_CONFLICTO, get_write_stats, is_transient_error
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.evento_pedido_model import EventoPedido
+from models.movimiento_stock_model import MovimientoStock
+
+
+def _deadlock():
+    return OperationalError('COMMIT', {}, Exception(1213, 'Deadlock found when trying to get lock'))
+
+
+class TestBaseModelWrites(DatabaseTestCase):
+    """Tests del bloqueo optimista y de los reintentos de escritura"""
+
+    CONFIG = {'WRITE_RETRY_BACKOFF': 0}
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=10)
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+        self.pedido = Pedido(usuario_id=self.usuario.id, producto_id=self.producto.id,
+                             cantidad=1, precio_total=Decimal('10.00'), estado='pendiente')
+        self.pedido.save()
+
+    def test_concurrent_change_is_a_conflict(self):
+        """Test: Escribir sobre una versión antigua no sobrescribe el cambio concurrente"""
+        conflictos = get_write_stats()['conflictos']
+        # Otra operación cambia el pedido sin pasar por esta instancia
+        db.session.execute(
+            update(Pedido).where(Pedido.id == self.pedido.id)
+            .values(estado='procesando', version=Pedido.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        # La instancia conserva lo que leyó antes del cambio
+        set_committed_value(self.pedido, 'estado', 'pendiente')
+        set_committed_value(self.pedido, 'version', 1)
+
+        success, mensaje = self.pedido.update(estado='cancelado')
+
+        self.assertFalse(success)
+        self.assertEqual(mensaje, MENSAJE_CONFLICTO)
+        self.assertEqual(Pedido.get_by_id(self.pedido.id).estado, 'procesando')
+        self.assertEqual(get_write_stats()['conflictos'], conflictos + 1)
+
+    def test_version_increments_on_update(self):
+        """Test: Cada actualización incrementa la versión"""
+        self.assertEqual(self.pedido.version, 1)
+        self.pedido.update_status('procesando')
+        self.assertEqual(self.pedido.version, 2)
+
+    def test_deadlock_is_retried(self):
+        """Test: Un deadlock en el commit se reintenta"""
+        reintentos = get_write_stats()['reintentos']
+        commit = db.session.commit
+        fallos = [_deadlock()]
+
+        def commit_con_deadlock():
+            if fallos:
+                raise fallos.pop()
+            commit()
+
+        with patch.object(db.session, 'commit', side_effect=commit_con_deadlock):
+            success, mensaje = self.producto.update(nombre='Renombrado')
+
+        self.assertTrue(success, mensaje)
+        self.assertEqual(Producto.get_by_id(self.producto.id).nombre, 'Renombrado')
+        self.assertEqual(get_write_stats()['reintentos'], reintentos + 1)
+
+    def test_no_retry_when_transaction_had_other_writes(self):
+        """Test: No se reintenta si el rollback descartó otras escrituras"""
+        db.session.add(Producto(nombre='Pendiente', precio=Decimal('1.00')))
+        db.session.flush()
+
+        with patch.object(db.session, 'commit', side_effect=_deadlock()) as commit:
+            success, mensaje = self.producto.update(nombre='Renombrado')
+
+        self.assertFalse(success)
+        self.assertEqual(commit.call_count, 1)
+
+    def test_no_retry_after_statement_write(self):
+        """Test: Un UPDATE ejecutado directamente también impide el reintento"""
+        db.session.execute(
+            update(Producto).where(Producto.id == self.producto.id)
+            .values(stock=99)
+            .execution_options(synchronize_session=False)
+        )
+
+        with patch.object(db.session, 'commit', side_effect=_deadlock()) as commit:
+            success, mensaje = self.usuario.update(nombre='Renombrado')
+
+        self.assertFalse(success)
+        self.assertEqual(commit.call_count, 1)
+
+    def test_no_retry_with_pending_objects(self):
+        """Test: Un objeto añadido y sin flush también impide el reintento"""
+        db.session.add(Producto(nombre='Pendiente', precio=Decimal('1.00')))
+
+        with patch.object(db.session, 'commit', side_effect=_deadlock()) as commit:
+            success, mensaje = self.usuario.update(nombre='Renombrado')
+
+        self.assertFalse(success)
+        self.assertEqual(commit.call_count, 1)
+
+    def test_deadlock_retries_whole_cancellation(self):
+        """Test: Al reintentar una cancelación se repiten stock, evento y movimiento"""
+        producto_id = self.producto.id
+        pedido_id = self.pedido.id
+        commit = db.session.commit
+        fallos = [_deadlock()]
+
+        def commit_con_deadlock():
+            if fallos:
+                raise fallos.pop()
+            commit()
+
+        with patch.object(db.session, 'commit', side_effect=commit_con_deadlock):
+            success, mensaje = self.pedido.cancel_order()
+
+        self.assertTrue(success, mensaje)
+        self.assertEqual(Pedido.get_by_id(pedido_id).estado, 'cancelado')
+        self.assertEqual(Producto.get_by_id(producto_id).stock, 11)
+        eventos = EventoPedido.query.filter_by(pedido_id=pedido_id, tipo='cancelado').count()
+        self.assertEqual(eventos, 1)
+        movimientos = MovimientoStock.query.filter_by(pedido_id=pedido_id, tipo='cancelacion').all()
+        self.assertEqual([m.cantidad for m in movimientos], [1])
+
+    def test_is_transient_error(self):
+        """Test: Clasificación de errores transitorios"""
+        self.assertTrue(is_transient_error(_deadlock()))
+        self.assertFalse(is_transient_error(
+            OperationalError('INSERT', {}, Exception(1062, 'Duplicate entry'))
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
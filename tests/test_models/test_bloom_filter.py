@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.bloom_filter import BloomFilter, email_filter
+
+
+class TestBloomFilter(unittest.TestCase):
+    """Tests del filtro de Bloom"""
+
+    def test_no_false_negatives_and_bounded_fp_rate(self):
+        """Test: Todo lo añadido está y los falsos positivos rondan la tasa pedida"""
+        filtro = BloomFilter(1000, tasa_fp=0.01)
+        for i in range(1000):
+            filtro.add(f'usuario{i}@example.com')
+
+        self.assertTrue(all(f'usuario{i}@example.com' in filtro for i in range(1000)))
+        falsos = sum(f'otro{i}@example.com' in filtro for i in range(10000))
+        self.assertLess(falsos / 10000, 0.03)
+        self.assertLess(filtro.memory_bytes, 1300)  # ~9,6 bits por elemento
+
+    def test_invalid_rate(self):
+        """Test: La tasa de falsos positivos debe estar entre 0 y 1"""
+        with self.assertRaises(ValueError):
+            BloomFilter(100, tasa_fp=0)
+
+
+class TestEmailFilter(DatabaseTestCase):
+    """Tests del filtro de emails en el alta de usuarios"""
+
+    def setUp(self):
+        """Filtro habilitado y construido con un usuario existente"""
+        super().setUp()
+        db.session.add(Usuario(nombre='Existente', email='existe@example.com'))
+        db.session.commit()
+        email_filter.configure({'EMAIL_FILTER_ENABLED': True, 'EMAIL_FILTER_MIN_CAPACITY': 100})
+        email_filter.reset_stats()
+        email_filter.rebuild()
+        self.addCleanup(email_filter.configure, {'EMAIL_FILTER_ENABLED': False})
+
+    def test_new_email_skips_lookup(self):
+        """Test: Un email seguro nuevo no consulta la base antes del INSERT"""
+        with patch.object(Usuario, 'get_by_email') as get_by_email:
+            usuario, _ = Usuario.create_user('Nuevo', ' Nuevo@Example.com ')
+
+        self.assertIsNotNone(usuario)
+        get_by_email.assert_not_called()
+        self.assertEqual(email_filter.stats()['ahorradas'], 1)
+        # El alta queda en el filtro: repetir el email sí consulta
+        self.assertFalse(email_filter.definitely_new('nuevo@example.com'))
+
+    def test_existing_email_is_rejected(self):
+        """Test: Un email registrado se sigue rechazando con el mensaje de siempre"""
+        usuario, mensaje = Usuario.create_user('Otro', 'EXISTE@example.com')
+
+        self.assertIsNone(usuario)
+        self.assertEqual(mensaje, "El email ya está registrado")
+        self.assertEqual(email_filter.stats()['ahorradas'], 0)
+
+    def test_unique_constraint_catches_unknown_email(self):
+        """Test: Si otro proceso dio de alta el email, lo detecta la restricción UNIQUE"""
+        db.session.execute(Usuario.__table__.insert().values(nombre='Otro proceso',
+                                                             email='carrera@example.com'))
+        db.session.commit()
+
+        usuario, mensaje = Usuario.create_user('Carrera', 'carrera@example.com')
+
+        self.assertIsNone(usuario)
+        self.assertEqual(mensaje, "El email ya está registrado")
+        self.assertEqual(email_filter.stats()['conflictos'], 1)
+        self.assertEqual(Usuario.query.filter_by(email='carrera@example.com').count(), 1)
+
+    def test_stats_report_memory(self):
+        """Test: Las estadísticas incluyen memoria y ocupación del filtro"""
+        stats = email_filter.stats()
+
+        self.assertEqual(stats['elementos'], 1)
+        self.assertEqual(stats['capacidad'], 100)
+        self.assertGreater(stats['memoria_bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
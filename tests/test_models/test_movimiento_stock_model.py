@@ -0,0 +1,212 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import set_committed_value
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.movimiento_stock_model import MovimientoStock
+from models.reserva_stock_model import ReservaStock
+from services import stock_service
+
+
+class TestMovimientoStock(DatabaseTestCase):
+    """Tests del libro de movimientos y de las reservas de stock"""
+
+    CONFIG = {'ASYNC_ORDER_PROCESSING': False}
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=10)
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+
+    def _tipos(self):
+        return [m.tipo for m in reversed(MovimientoStock.get_by_product(self.producto.id))]
+
+    def test_reduce_and_increase_stock(self):
+        """Test: Cada cambio de stock queda en el libro y el saldo coincide"""
+        self.assertTrue(self.producto.reduce_stock(3)[0])
+        self.assertTrue(self.producto.increase_stock(5)[0])
+
+        self.assertEqual(self.producto.stock, 12)
+        self.assertEqual(self._tipos(), ['inicial', 'pedido', 'reposicion'])
+        self.assertEqual(MovimientoStock.balance(self.producto.id), 12)
+
+    def test_stale_instance_cannot_oversell(self):
+        """Test: El UPDATE condicional no deja el stock negativo aunque el valor leído sea antiguo"""
+        MovimientoStock.apply(self.producto.id, -8, 'pedido')
+        set_committed_value(self.producto, 'stock', 10)  # valor desactualizado en memoria
+
+        success, mensaje = self.producto.reduce_stock(5)
+
+        self.assertFalse(success)
+        self.assertEqual(mensaje, "Stock insuficiente")
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 2)
+
+    def test_orders_and_cancellations_are_recorded(self):
+        """Test: Crear y cancelar pedidos registra sus movimientos"""
+        pedido, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, 4)
+        otro, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, 2)
+        pedido.cancel_order()
+        Pedido.bulk_cancel(pedido_ids=[otro.id])
+
+        self.assertEqual(self.producto.stock, 10)
+        self.assertEqual(self._tipos(), ['inicial', 'pedido', 'pedido', 'cancelacion', 'cancelacion'])
+        self.assertEqual(stock_service.reconcile(), [])
+
+    def test_reservation_is_consumed_by_order(self):
+        """Test: Una reserva descuenta stock y el pedido la consume"""
+        reserva, mensaje = ReservaStock.reserve(self.producto.id, 6, usuario_id=self.usuario.id)
+        self.assertEqual(self.producto.stock, 4)
+        self.assertIsNone(ReservaStock.reserve(self.producto.id, 5)[0])
+
+        pedido, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, 6,
+                                              reserva_id=reserva.id)
+
+        self.assertIsNotNone(pedido, mensaje)
+        self.assertEqual(reserva.estado, 'confirmada')
+        self.assertEqual(self.producto.stock, 4)
+        self.assertFalse(reserva.release()[0])
+        self.assertEqual(MovimientoStock.balance(self.producto.id), 4)
+
+    def test_reservation_of_another_user_is_rejected(self):
+        """Test: Un usuario no puede consumir la reserva de otro"""
+        otro = Usuario(nombre='Otro', email='otro@example.com')
+        db.session.add(otro)
+        db.session.commit()
+        reserva, mensaje = ReservaStock.reserve(self.producto.id, 2, usuario_id=self.usuario.id)
+
+        pedido, mensaje = Pedido.create_order(otro.id, self.producto.id, 2, reserva_id=reserva.id)
+
+        self.assertIsNone(pedido)
+        self.assertEqual(mensaje, "La reserva pertenece a otro usuario")
+        self.assertEqual(reserva.estado, 'activa')
+
+    def test_failed_release_keeps_reservation_active(self):
+        """Test: Si no se puede devolver el stock la reserva sigue activa"""
+        reserva, mensaje = ReservaStock.reserve(self.producto.id, 3)
+
+        with patch.object(MovimientoStock, 'apply', return_value=(False, "El producto no existe")):
+            success, mensaje = reserva.release()
+
+        self.assertFalse(success)
+        self.assertEqual(reserva.estado, 'activa')
+        self.assertTrue(reserva.release()[0])
+        self.assertEqual(self.producto.stock, 10)
+
+    def test_apply_without_commit_leaves_rollback_to_caller(self):
+        """Test: Un error en apply(commit=False) no descarta los cambios pendientes del llamador"""
+        producto_id = self.producto.id
+        pendiente = Usuario(nombre='Pendiente', email='pendiente@example.com')
+        db.session.add(pendiente)
+        error = OperationalError('UPDATE', {}, Exception('fallo'))
+
+        with patch.object(db.session, 'execute', side_effect=error):
+            success, mensaje = MovimientoStock.apply(producto_id, 1, 'reposicion', commit=False)
+
+        self.assertFalse(success)
+        self.assertIn(pendiente, db.session.new)
+
+    def test_expired_reservations_return_stock(self):
+        """Test: El barrido libera solo las reservas vencidas"""
+        vencida, mensaje = ReservaStock.reserve(self.producto.id, 3)
+        vigente, mensaje = ReservaStock.reserve(self.producto.id, 2)
+        vencida.update(expira_en=datetime.utcnow() - timedelta(seconds=1))
+
+        expiradas, mensaje = ReservaStock.expire_due()
+
+        self.assertEqual(expiradas, 1)
+        self.assertEqual(vencida.estado, 'expirada')
+        self.assertEqual(vigente.estado, 'activa')
+        self.assertEqual(self.producto.stock, 8)
+        self.assertEqual(ReservaStock.expire_due()[0], 0)
+
+    def test_reconcile_legacy_stock(self):
+        """Test: Conciliar registra un ajuste para el stock sin movimientos"""
+        db.session.execute(
+            Producto.__table__.update().where(Producto.id == self.producto.id).values(stock=15)
+        )
+        db.session.commit()
+
+        self.assertEqual(stock_service.reconcile(), [(self.producto.id, 15, 10)])
+        stock_service.reconcile(corregir=True)
+        self.assertEqual(stock_service.reconcile(), [])
+
+    def test_bulk_adjustment_from_csv(self):
+        """Test: Un recuento por CSV fija o corrige el stock por lotes y lo anota en el libro"""
+        otro = Producto(nombre='Otro', precio=Decimal('5.00'), stock=4)
+        vacio = Producto(nombre='Vacío', precio=Decimal('5.00'), stock=0)
+        db.session.add_all([otro, vacio])
+        db.session.commit()
+        lineas = [
+            'producto_id,stock,delta\n',
+            f'{self.producto.id},25,\n',      # stock contado
+            f'{otro.id},,-1\n',               # diferencia
+            f'{otro.id},,-1\n',               # repetido: se acumula
+            f'{vacio.id},0,\n',               # sin cambios
+            '999999,3,\n',                    # producto desconocido
+            'abc,1,\n',                       # fila inválida
+            f'{vacio.id},,-5\n',              # dejaría el stock negativo
+        ]
+
+        resumen, _ = MovimientoStock.apply_bulk(stock_service.read_adjustments(lineas),
+                                                motivo='Recuento', tamano_lote=3)
+
+        self.assertEqual(resumen['lotes'], 3)
+        self.assertEqual(resumen['cambiados'], 2)
+        self.assertEqual(resumen['sin_cambios'], 1)
+        self.assertEqual(resumen['desconocidos'], [999999])
+        self.assertEqual(resumen['rechazados'], [vacio.id])
+        self.assertEqual(resumen['invalidas'], [6])
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 25)
+        self.assertEqual(otro.stock, 2)
+        self.assertEqual(self._tipos(), ['inicial', 'ajuste'])
+        self.assertEqual(stock_service.reconcile(), [])
+
+    def test_bulk_recount_keeps_active_reservations(self):
+        """Test: Un recuento físico no duplica las unidades retenidas por reservas activas"""
+        reserva, mensaje = ReservaStock.reserve(self.producto.id, 3)
+        self.assertEqual(self.producto.stock, 7)
+
+        # En el almacén siguen las 10 unidades: 3 apartadas para la reserva
+        resumen, _ = MovimientoStock.apply_bulk([(self.producto.id, 10, None)])
+        self.assertEqual(resumen['sin_cambios'], 1)
+
+        resumen, _ = MovimientoStock.apply_bulk([(self.producto.id, 12, None)])
+        self.assertEqual(resumen['cambiados'], 1)
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 9)
+
+        self.assertTrue(reserva.release()[0])
+        self.assertEqual(self.producto.stock, 12)
+        self.assertEqual(stock_service.reconcile(), [])
+
+        # Un recuento por debajo de lo reservado se rechaza
+        otra, mensaje = ReservaStock.reserve(self.producto.id, 5)
+        resumen, _ = MovimientoStock.apply_bulk([(self.producto.id, 4, None)])
+        self.assertEqual(resumen['rechazados'], [self.producto.id])
+
+    def test_bulk_adjustment_csv_requires_columns(self):
+        """Test: Un CSV sin columnas de stock se rechaza antes de tocar nada"""
+        with self.assertRaises(ValueError):
+            MovimientoStock.apply_bulk(stock_service.read_adjustments(['producto_id,cantidad\n']))
+
+
+if __name__ == '__main__':
+    unittest.main()
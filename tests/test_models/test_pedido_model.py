@@ -0,0 +1,339 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy import delete, event, update
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.evento_pedido_model import EventoPedido
+from controllers.pedido_controller import PedidoController
+from services.archive_service import archive_batch
+
+
+class TestPedidoModel(DatabaseTestCase):
+    """Tests del modelo Pedido contra una base SQLite en memoria"""
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=100)
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+
+    def _crear_pedidos(self, cantidad, estado='pendiente'):
+        pedidos = [
+            Pedido(usuario_id=self.usuario.id, producto_id=self.producto.id,
+                   cantidad=1, precio_total=Decimal('10.00'), estado=estado)
+            for _ in range(cantidad)
+        ]
+        db.session.add_all(pedidos)
+        db.session.commit()
+        return [p.id for p in pedidos]
+
+    def test_bulk_update_status_success(self):
+        """Test: Cambio masivo de pendiente a procesando"""
+        ids = self._crear_pedidos(3)
+
+        resultados, mensaje = Pedido.bulk_update_status('procesando', pedido_ids=ids)
+
+        self.assertEqual(len(resultados), 3)
+        self.assertTrue(all(r['exito'] for r in resultados.values()))
+        self.assertEqual(len(Pedido.get_by_status('procesando')), 3)
+
+    def test_bulk_update_status_invalid_transition(self):
+        """Test: Los pedidos con estado de origen no permitido no cambian"""
+        pendientes = self._crear_pedidos(2)
+        entregados = self._crear_pedidos(1, estado='entregado')
+
+        resultados, mensaje = Pedido.bulk_update_status(
+            'procesando', pedido_ids=pendientes + entregados + [9999]
+        )
+
+        self.assertTrue(resultados[pendientes[0]]['exito'])
+        self.assertFalse(resultados[entregados[0]]['exito'])
+        self.assertEqual(resultados[entregados[0]]['estado'], 'entregado')
+        self.assertFalse(resultados[9999]['exito'])
+        self.assertEqual(Pedido.get_by_id(entregados[0]).estado, 'entregado')
+
+    def test_bulk_update_status_by_filter(self):
+        """Test: Cambio masivo usando el estado actual como filtro"""
+        self._crear_pedidos(2, estado='procesando')
+        self._crear_pedidos(1)
+
+        resultados, mensaje = Pedido.bulk_update_status('enviado', estado_actual='procesando')
+
+        self.assertEqual(len(resultados), 2)
+        self.assertEqual(len(Pedido.get_by_status('enviado')), 2)
+        self.assertEqual(len(Pedido.get_by_status('pendiente')), 1)
+
+    def test_bulk_update_status_rejects_cancelado(self):
+        """Test: La cancelación masiva no se hace con cambio de estado"""
+        ids = self._crear_pedidos(1)
+
+        resultados, mensaje = Pedido.bulk_update_status('cancelado', pedido_ids=ids)
+
+        self.assertIsNone(resultados)
+        self.assertEqual(Pedido.get_by_id(ids[0]).estado, 'pendiente')
+
+    def test_bulk_update_status_invalid_state(self):
+        """Test: Estado destino inválido"""
+        resultados, mensaje = Pedido.bulk_update_status('perdido', pedido_ids=[1])
+
+        self.assertIsNone(resultados)
+        self.assertIn("Estado inválido", mensaje)
+
+    def test_bulk_update_status_ignores_concurrent_change(self):
+        """Test: Un pedido que otro proceso ya pasó al estado destino no cuenta como cambiado"""
+        ids = self._crear_pedidos(3)
+        original = Pedido._update_from
+
+        def con_escritura_concurrente(lote, origen, nuevo_estado):
+            # Otro proceso cambia el primer pedido después de la lectura
+            db.session.execute(
+                update(Pedido).where(Pedido.id == ids[0])
+                .values(estado='procesando', version=Pedido.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            return original(lote, origen, nuevo_estado)
+
+        with patch.object(Pedido, '_update_from', side_effect=con_escritura_concurrente):
+            resultados, mensaje = Pedido.bulk_update_status('procesando', pedido_ids=ids)
+
+        self.assertFalse(resultados[ids[0]]['exito'])
+        self.assertEqual(resultados[ids[0]]['estado'], 'procesando')
+        self.assertTrue(resultados[ids[1]]['exito'])
+        self.assertIn("2 de 3", mensaje)
+        eventos = [e.pedido_id for e in EventoPedido.get_since(0)]
+        self.assertEqual(eventos, ids[1:])
+
+    def test_bulk_cancel_restores_stock(self):
+        """Test: Cancelación masiva restaura el stock agregado"""
+        ids = self._crear_pedidos(3)
+        cancelado = self._crear_pedidos(1, estado='cancelado')
+
+        resultados, mensaje = Pedido.bulk_cancel(pedido_ids=ids + cancelado)
+
+        self.assertTrue(all(resultados[i]['exito'] for i in ids))
+        self.assertFalse(resultados[cancelado[0]]['exito'])
+        self.assertEqual(Producto.get_by_id(self.producto.id).stock, 103)
+        self.assertEqual(len(Pedido.get_by_status('cancelado')), 4)
+
+    def test_bulk_cancel_by_producto(self):
+        """Test: Cancelación masiva de todos los pedidos de un producto"""
+        self._crear_pedidos(2)
+        self._crear_pedidos(1, estado='enviado')
+
+        resultados, mensaje = Pedido.bulk_cancel(producto_id=self.producto.id)
+
+        self.assertEqual(len(resultados), 3)
+        self.assertEqual(Producto.get_by_id(self.producto.id).stock, 103)
+
+        # Repetir la operación no vuelve a restaurar stock
+        resultados, mensaje = Pedido.bulk_cancel(producto_id=self.producto.id)
+        self.assertEqual(resultados, {})
+        self.assertEqual(Producto.get_by_id(self.producto.id).stock, 103)
+
+    def test_bulk_cancel_concurrent_cancel_restores_stock_once(self):
+        """Test: Un pedido cancelado por otro proceso tras la lectura no repone stock dos veces"""
+        ids = self._crear_pedidos(2)
+        original = Pedido._update_from
+
+        def con_cancelacion_concurrente(lote, origen, nuevo_estado):
+            # Otro proceso cancela el primer pedido (y repone su stock) tras la lectura
+            db.session.execute(
+                update(Pedido).where(Pedido.id == ids[0])
+                .values(estado='cancelado', version=Pedido.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                update(Producto).where(Producto.id == self.producto.id)
+                .values(stock=Producto.stock + 1)
+                .execution_options(synchronize_session=False)
+            )
+            return original(lote, origen, nuevo_estado)
+
+        with patch.object(Pedido, '_update_from', side_effect=con_cancelacion_concurrente):
+            resultados, mensaje = Pedido.bulk_cancel(pedido_ids=ids)
+
+        self.assertFalse(resultados[ids[0]]['exito'])
+        self.assertEqual(resultados[ids[0]]['estado'], 'cancelado')
+        self.assertTrue(resultados[ids[1]]['exito'])
+        self.assertIn("1 de 2", mensaje)
+        self.assertEqual(Producto.get_by_id(self.producto.id).stock, 102)
+        eventos = [e.pedido_id for e in EventoPedido.get_since(0)]
+        self.assertEqual(eventos, ids[1:])
+
+    def test_outbox_records_order_changes(self):
+        """Test: Crear, actualizar y cancelar pedidos registra eventos en orden"""
+        pedido, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, 2)
+        pedido.update_status('procesando')
+        pedido.cancel_order()
+        otros = self._crear_pedidos(2)
+        Pedido.bulk_update_status('procesando', pedido_ids=otros)
+
+        eventos = EventoPedido.get_since(0)
+
+        self.assertEqual(
+            [(e.pedido_id, e.tipo, e.estado) for e in eventos],
+            [(pedido.id, 'creado', 'pendiente'),
+             (pedido.id, 'estado_actualizado', 'procesando'),
+             (pedido.id, 'cancelado', 'cancelado'),
+             (otros[0], 'estado_actualizado', 'procesando'),
+             (otros[1], 'estado_actualizado', 'procesando')]
+        )
+        self.assertEqual(EventoPedido.get_since(eventos[2].id), eventos[3:])
+        self.assertEqual(EventoPedido.get_last_cursor(), eventos[-1].id)
+
+
+    def _evento(self, id, antiguedad=0):
+        evento = EventoPedido(id=id, pedido_id=1, tipo='creado', estado='pendiente',
+                              fecha_evento=datetime.utcnow() - timedelta(seconds=antiguedad))
+        db.session.add(evento)
+        db.session.commit()
+        return evento
+
+    def test_outbox_feed_waits_for_id_gaps(self):
+        """Test: El feed no salta un id que puede confirmarse más tarde"""
+        self._evento(1)
+        self._evento(3)
+
+        # El id 2 puede ser una transacción aún abierta
+        self.assertEqual([e.id for e in EventoPedido.get_since(0)], [1])
+        self.assertEqual(EventoPedido.get_since(1), [])
+
+        # Se confirma: el feed continúa sin perderlo
+        self._evento(2)
+        self.assertEqual([e.id for e in EventoPedido.get_since(1)], [2, 3])
+
+    def test_outbox_feed_skips_old_gaps(self):
+        """Test: Un hueco más antiguo que el margen es un id perdido y se salta"""
+        self._evento(1, antiguedad=60)
+        self._evento(5, antiguedad=60)
+
+        self.assertEqual([e.id for e in EventoPedido.get_since(0, margen=10)], [1, 5])
+        self.assertEqual([e.id for e in EventoPedido.get_since(0, margen=120)], [1])
+
+    def test_outbox_stream_ends_after_max_duration(self):
+        """Test: El stream SSE se cierra al cumplir su duración máxima"""
+        self._evento(1)
+
+        mensajes = list(PedidoController._stream_changes(0, 100, intervalo=0.01, duracion=0.05))
+
+        self.assertEqual(len(mensajes), 1)
+        self.assertTrue(mensajes[0].startswith("id: 1\n"))
+
+    def test_changes_limit_is_validated_and_clamped(self):
+        """Test: El límite del feed se acota entre 1 y 1000 y un valor no numérico es un 400"""
+        for i in range(3):
+            self._evento(i + 1)
+
+        for limite, esperados in (('0', 1), ('-1', 1), ('2', 2), ('5000', 3)):
+            with self.app.test_request_context(f'/?limit={limite}'):
+                datos = PedidoController.changes().get_json()
+            self.assertEqual(len(datos['eventos']), esperados, limite)
+
+        for consulta in ('limit=abc', 'limit=', 'wait=xyz'):
+            with self.app.test_request_context(f'/?{consulta}'):
+                respuesta, codigo = PedidoController.changes()
+            self.assertEqual(codigo, 400, consulta)
+
+    def _count_queries(self, funcion):
+        consultas = []
+        conexion = db.session.connection()
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        event.listen(conexion, 'before_cursor_execute', contar)
+        try:
+            resultado = funcion()
+        finally:
+            event.remove(conexion, 'before_cursor_execute', contar)
+        return resultado, len(consultas)
+
+    def test_user_history_loads_products_in_fixed_queries(self):
+        """Test: El historial carga usuario, pedidos y productos sin una consulta por pedido"""
+        otro = Producto(nombre='Otro', precio=Decimal('5.00'), stock=10)
+        db.session.add(otro)
+        db.session.commit()
+        self._crear_pedidos(3)
+        db.session.add_all([Pedido(usuario_id=self.usuario.id, producto_id=otro.id,
+                                   cantidad=2, precio_total=Decimal('10.00'))])
+        db.session.commit()
+        usuario_id = self.usuario.id
+
+        for estrategia, esperadas in [('selectin', 4), ('joined', 3)]:
+            db.session.expunge_all()
+
+            def historial():
+                usuario, paginacion = Pedido.get_user_history(
+                    usuario_id, pagina=1, por_pagina=3, estrategia=estrategia
+                )
+                return usuario, paginacion, [p.producto.nombre for p in paginacion.items]
+
+            (usuario, paginacion, nombres), consultas = self._count_queries(historial)
+
+            self.assertEqual(usuario.id, usuario_id)
+            self.assertEqual(paginacion.total, 4)
+            self.assertEqual(paginacion.pages, 2)
+            self.assertEqual(len(nombres), 3)
+            self.assertEqual(consultas, esperadas, estrategia)
+
+    def test_user_history_api_without_product(self):
+        """Test: Un pedido cuyo producto ya no existe se lista con producto null"""
+        activo = self._crear_pedidos(1)
+        db.session.execute(delete(Producto).where(Producto.id == self.producto.id))
+        db.session.commit()
+        db.session.expire_all()
+
+        with self.app.test_request_context('/'):
+            datos = PedidoController.user_history_api(self.usuario.id).get_json()
+
+        self.assertEqual([p['id'] for p in datos['pedidos']], activo)
+        self.assertIsNone(datos['pedidos'][0]['producto'])
+
+    def test_user_history_unknown_user(self):
+        """Test: Un usuario inexistente no tiene historial"""
+        self.assertEqual(Pedido.get_user_history(9999), (None, None))
+
+    def test_archived_history_is_listed_apart(self):
+        """Test: Con archivados=1 el historial incluye, aparte, los pedidos archivados"""
+        cerrados = self._crear_pedidos(2, estado='entregado')
+        activo = self._crear_pedidos(1)
+        archivados, _ = archive_batch(datetime.utcnow() + timedelta(seconds=1))
+        self.assertEqual(archivados, 2)
+
+        historial = Pedido.get_archived_history(self.usuario.id)
+        self.assertEqual(sorted(p.id for p, _ in historial), cerrados)
+        self.assertTrue(all(producto.id == self.producto.id for _, producto in historial))
+
+        with self.app.test_request_context('/?archivados=1'):
+            datos = PedidoController.user_history_api(self.usuario.id).get_json()
+        self.assertEqual([p['id'] for p in datos['pedidos']], activo)
+        self.assertEqual(sorted(p['id'] for p in datos['archivados']), cerrados)
+        self.assertEqual(datos['archivados'][0]['producto']['nombre'], 'Producto Test')
+
+        with self.app.test_request_context('/'):
+            datos = PedidoController.user_history_api(self.usuario.id).get_json()
+        self.assertNotIn('archivados', datos)
+
+    def test_eager_rejects_unknown_strategy(self):
+        """Test: Una estrategia de carga desconocida es un error"""
+        with self.assertRaises(ValueError):
+            Pedido.eager(Pedido.producto, estrategia='subquery')
+
+
+if __name__ == '__main__':
+    unittest.main()
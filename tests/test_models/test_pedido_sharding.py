@@ -0,0 +1,201 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, delete, text
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.evento_pedido_model import EventoPedido
+from models.shard_router import shard_router
+from services import archive_service, reporting_service
+
+
+class TestPedidoSharding(DatabaseTestCase):
+    """Tests de los pedidos repartidos en dos shards SQLite"""
+
+    CONFIG = {'ASYNC_ORDER_PROCESSING': False}
+
+    def setUp(self):
+        """Dos shards en archivos temporales y datos de ejemplo en la base principal"""
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.uris = [f"sqlite:///{os.path.join(directorio, f'pedidos_{i}.db')}" for i in range(2)]
+        shard_router.configure(self.uris)
+        self.addCleanup(shard_router.configure, [])
+        shard_router.create_all()
+
+        self.usuarios = [Usuario(nombre=f'Usuario {i}', email=f'u{i}@example.com')
+                         for i in range(4)]
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=100)
+        db.session.add_all(self.usuarios + [self.producto])
+        db.session.commit()
+
+    def _ids_in_shard(self, indice):
+        engine = create_engine(self.uris[indice])
+        try:
+            with engine.connect() as conexion:
+                return {fila[0] for fila in conexion.execute(text('SELECT id FROM pedidos'))}
+        finally:
+            engine.dispose()
+
+    def _crear(self, usuario, cantidad=1):
+        pedido, mensaje = Pedido.create_order(usuario.id, self.producto.id, cantidad)
+        self.assertIsNotNone(pedido, mensaje)
+        return pedido
+
+    def test_orders_are_routed_by_user(self):
+        """Test: Cada pedido se guarda en el shard de su usuario y su id lo indica"""
+        pedidos = [self._crear(usuario) for usuario in self.usuarios]
+
+        for pedido in pedidos:
+            indice = pedido.usuario_id % 2
+            self.assertEqual(shard_router.shard_for_id(pedido.id), indice)
+            self.assertIn(pedido.id, self._ids_in_shard(indice))
+        self.assertEqual(shard_router.counts(), [2, 2])
+        self.assertEqual(Pedido.query.count(), 0)  # nada en la base principal
+
+        # Stock y outbox siguen en la base principal
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 96)
+        self.assertEqual(EventoPedido.query.filter_by(tipo='creado').count(), 4)
+
+    def test_single_user_reads_use_one_shard(self):
+        """Test: get_by_user, get_by_id y el historial leen del shard del usuario"""
+        usuario = self.usuarios[1]
+        creados = [self._crear(usuario).id for _ in range(3)]
+        self._crear(self.usuarios[0])
+
+        self.assertEqual(sorted(p.id for p in Pedido.get_by_user(usuario.id)), sorted(creados))
+        self.assertEqual(Pedido.get_by_id(creados[0]).usuario_id, usuario.id)
+        self.assertIsNone(Pedido.get_by_id(max(creados) + 64))  # id libre en el shard
+        self.assertIsNone(Pedido.get_by_id(2))  # id de un shard que no existe
+
+        _, paginacion = Pedido.get_user_history(usuario.id, pagina=1, por_pagina=2)
+        self.assertEqual(paginacion.total, 3)
+        self.assertEqual([p.producto.nombre for p in paginacion.items], ['Producto Test'] * 2)
+
+    def test_cross_shard_reads_are_merged(self):
+        """Test: get_all, get_by_status y los contadores reúnen todos los shards"""
+        pedidos = [self._crear(usuario, cantidad=2) for usuario in self.usuarios]
+        pedidos[0].update_status('procesando')
+
+        self.assertEqual({p.id for p in Pedido.get_all()}, {p.id for p in pedidos})
+        self.assertEqual([p.id for p in Pedido.get_by_status('procesando')], [pedidos[0].id])
+        self.assertEqual(Pedido.count_by_status(), 4)
+        self.assertEqual(Pedido.count_by_status('pendiente'), 3)
+        self.assertEqual(Pedido.total_revenue(), Decimal('80.00'))
+        detalles = Pedido.get_orders_with_details()
+        self.assertEqual(len(detalles), 4)
+        self.assertTrue(all(pedido.usuario_id == usuario.id for pedido, usuario, _ in detalles))
+
+    def test_cancel_order_updates_shard_and_restores_stock(self):
+        """Test: Cancelar cambia el estado en el shard y devuelve el stock en la base principal"""
+        pedido = self._crear(self.usuarios[2], cantidad=5)
+
+        success, mensaje = pedido.cancel_order()
+
+        self.assertTrue(success, mensaje)
+        self.assertEqual(Pedido.get_by_id(pedido.id).estado, 'cancelado')
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 100)
+
+    def test_stale_update_is_rejected(self):
+        """Test: Un cambio de estado sobre una versión antigua es un conflicto"""
+        pedido = self._crear(self.usuarios[0])
+        copia = Pedido.get_by_id(pedido.id)
+        self.assertTrue(pedido.update_status('procesando')[0])
+
+        success, _ = copia.update_status('enviado')
+
+        self.assertFalse(success)
+        self.assertEqual(Pedido.get_by_id(pedido.id).estado, 'procesando')
+
+    def test_failed_stock_leaves_no_order(self):
+        """Test: Si no se puede descontar el stock no queda el pedido en el shard"""
+        pedido, _ = Pedido.create_order(self.usuarios[0].id, self.producto.id, 1000)
+
+        self.assertIsNone(pedido)
+        self.assertEqual(shard_router.counts(), [0, 0])
+
+    def test_bulk_operations_are_rejected(self):
+        """Test: Los cambios masivos no se aplican sobre pedidos repartidos"""
+        resultados, _ = Pedido.bulk_update_status('procesando', estado_actual='pendiente')
+        self.assertIsNone(resultados)
+
+    def test_delete_is_blocked_by_orders_in_shards(self):
+        """Test: No se borra un usuario o producto con pedidos en algún shard"""
+        self._crear(self.usuarios[1])
+        libre_id = self.usuarios[2].id
+
+        success, mensaje = self.usuarios[1].delete()
+        self.assertFalse(success)
+        self.assertIn('tiene pedidos', mensaje)
+        success, mensaje = self.producto.delete()
+        self.assertFalse(success)
+
+        success, mensaje = self.usuarios[2].delete()
+        self.assertTrue(success, mensaje)
+        self.assertIsNone(Usuario.get_by_id(libre_id))
+
+    def test_orders_of_missing_user_keep_placeholder_details(self):
+        """Test: Un pedido cuyo usuario ya no existe sigue en el listado con un sustituto"""
+        pedido = self._crear(self.usuarios[1])
+        usuario_id = self.usuarios[1].id
+        db.session.execute(delete(Usuario).where(Usuario.id == usuario_id))
+        db.session.commit()
+
+        detalles = {p.id: (usuario, producto) for p, usuario, producto
+                    in Pedido.get_orders_with_details()}
+
+        usuario, producto = detalles[pedido.id]
+        self.assertEqual((usuario.id, usuario.nombre), (usuario_id, 'Usuario eliminado'))
+        self.assertEqual(producto.nombre, 'Producto Test')
+
+    def test_user_orders_are_read_from_shard(self):
+        """Test: get_pedidos del usuario devuelve los pedidos guardados en su shard"""
+        creados = [self._crear(self.usuarios[1]).id for _ in range(2)]
+
+        self.assertEqual(sorted(p.id for p in self.usuarios[1].get_pedidos()), sorted(creados))
+        self.assertEqual(self.usuarios[0].get_pedidos(), [])
+
+    def test_rebuild_rollups_reads_every_shard(self):
+        """Test: Los resúmenes reconstruidos cuentan los pedidos de todos los shards"""
+        self.producto.categoria = 'Periféricos'
+        db.session.commit()
+        for usuario in self.usuarios:
+            self._crear(usuario, cantidad=2)
+        Pedido.get_by_id(self._crear(self.usuarios[1]).id).cancel_order()
+
+        success, mensaje = reporting_service.rebuild_rollups()
+        self.assertTrue(success, mensaje)
+
+        ventas = reporting_service.sales_report()
+        self.assertEqual(sum(fila['pedidos'] for fila in ventas), 4)
+        self.assertEqual(sum(fila['unidades'] for fila in ventas), 8)
+        self.assertEqual({cat for _, cat in reporting_service.raw_sales_by_category()},
+                         {'Periféricos'})
+        estados = {fila['estado']: fila['pedidos'] for fila in reporting_service.status_report()}
+        self.assertEqual(estados, {'pendiente': 4, 'cancelado': 1})
+
+    def test_archive_is_refused(self):
+        """Test: El archivado se rechaza en lugar de no mover nada"""
+        archivados, mensaje = archive_service.archive_batch(datetime.utcnow())
+
+        self.assertIsNone(archivados)
+        self.assertIn('shards', mensaje)
+
+
+if __name__ == '__main__':
+    unittest.main()
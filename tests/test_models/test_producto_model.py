@@ -162,18 +162,6 @@ class TestProductoModel(unittest.TestCase):
         self.assertEqual(len(result), 1)
         mock_search.assert_called_once_with("Test")
     
-    def test_reduce_stock_success(self):
-        """Test: Reducir stock exitosamente"""
-        # Crear producto mock
-        producto = Producto()
-        producto.stock = 10
-        
-        with patch.object(producto, 'update', return_value=(True, "Actualizado")):
-            result, message = producto.reduce_stock(3)
-            
-            self.assertTrue(result)
-            self.assertEqual(producto.stock, 7)
-    
     def test_reduce_stock_insufficient(self):
         """Test: Reducir stock insuficiente"""
         producto = Producto()
@@ -185,17 +173,6 @@ class TestProductoModel(unittest.TestCase):
         self.assertEqual(message, "Stock insuficiente")
         self.assertEqual(producto.stock, 2)  # Stock no debe cambiar
     
-    def test_increase_stock_success(self):
-        """Test: Aumentar stock exitosamente"""
-        producto = Producto()
-        producto.stock = 5
-        
-        with patch.object(producto, 'update', return_value=(True, "Actualizado")):
-            result, message = producto.increase_stock(3)
-            
-            self.assertTrue(result)
-            self.assertEqual(producto.stock, 8)
-    
     def test_is_available_true(self):
         """Test: Producto disponible"""
         producto = Producto()
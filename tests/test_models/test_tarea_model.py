@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import json
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.tarea_model import Tarea
+from services import worker_service
+
+
+class TestTareaModel(DatabaseTestCase):
+    """Tests de la cola de tareas y del procesamiento en segundo plano"""
+
+    def test_claim_and_complete(self):
+        """Test: Una tarea reclamada no se vuelve a entregar"""
+        tarea, mensaje = Tarea.enqueue('notificar_pedido', {'pedido_id': 1})
+
+        reclamadas = Tarea.claim('trabajador-1', limite=5)
+        self.assertEqual([t.id for t in reclamadas], [tarea.id])
+        self.assertEqual(reclamadas[0].estado, 'en_proceso')
+        self.assertEqual(reclamadas[0].intentos, 1)
+        self.assertEqual(Tarea.claim('trabajador-2'), [])
+
+        reclamadas[0].complete()
+        self.assertEqual(Tarea.count_by_status(), {'completada': 1})
+
+    def test_claim_respects_delay(self):
+        """Test: Las tareas con retraso no se reclaman antes de tiempo"""
+        Tarea.enqueue('notificar_pedido', retraso=3600)
+
+        self.assertEqual(Tarea.claim('trabajador-1'), [])
+
+    def test_fail_retries_then_gives_up(self):
+        """Test: Un fallo reprograma la tarea hasta agotar los intentos"""
+        tarea, mensaje = Tarea.enqueue('notificar_pedido', max_intentos=2)
+
+        Tarea.claim('trabajador-1')[0].fail('error temporal')
+        self.assertEqual(tarea.estado, 'pendiente')
+        self.assertEqual(tarea.ultimo_error, 'error temporal')
+
+        tarea.update(disponible_en=tarea.fecha_creacion)
+        Tarea.claim('trabajador-1')[0].fail('error definitivo')
+        self.assertEqual(tarea.estado, 'fallida')
+
+    def test_create_order_is_processed_in_background(self):
+        """Test: Crear un pedido encola su procesamiento"""
+        usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=5)
+        db.session.add_all([usuario, producto])
+        db.session.commit()
+
+        pedido, mensaje = Pedido.create_order(usuario.id, producto.id, 2)
+        self.assertEqual(pedido.estado, 'pendiente')
+        self.assertEqual(Tarea.count_by_status(), {'pendiente': 1})
+
+        procesadas = worker_service.process_pending()
+
+        self.assertEqual(procesadas, 1)
+        self.assertEqual(Pedido.get_by_id(pedido.id).estado, 'procesando')
+        self.assertEqual(Tarea.count_by_status(), {'completada': 1})
+
+    def test_expired_lease_cannot_overwrite_new_claim(self):
+        """Test: Un trabajador con el lease vencido no pisa la tarea reclamada por otro"""
+        Tarea.enqueue('notificar_pedido', {'pedido_id': 1})
+        lento = Tarea.claim('trabajador-1', lease_segundos=-1)[0]
+        db.session.expunge(lento)
+
+        actual = Tarea.claim('trabajador-2')[0]
+        success, mensaje = lento.complete()
+
+        self.assertFalse(success)
+        self.assertIn("lease", mensaje)
+        self.assertFalse(lento.fail('tarde')[0])
+        self.assertEqual(Tarea.count_by_status(), {'en_proceso': 1})
+        self.assertTrue(actual.complete()[0])
+        self.assertEqual(Tarea.count_by_status(), {'completada': 1})
+
+    def test_order_notification_is_posted_to_webhook(self):
+        """Test: Con ORDER_WEBHOOK_URL el pedido creado se envía al webhook"""
+        usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=5)
+        db.session.add_all([usuario, producto])
+        db.session.commit()
+        respuesta = MagicMock(status=204)
+        respuesta.__enter__.return_value = respuesta
+
+        with patch.dict(self.app.config, {'ORDER_WEBHOOK_URL': 'http://hooks.test/pedidos'}):
+            with patch('urllib.request.urlopen', return_value=respuesta) as urlopen:
+                pedido, mensaje = Pedido.create_order(usuario.id, producto.id, 1)
+                procesadas = worker_service.process_pending()
+
+        self.assertEqual(procesadas, 2)
+        peticion = urlopen.call_args[0][0]
+        self.assertEqual(peticion.full_url, 'http://hooks.test/pedidos')
+        cuerpo = json.loads(peticion.data)
+        self.assertEqual(cuerpo['evento'], 'creado')
+        self.assertEqual(cuerpo['pedido']['id'], pedido.id)
+        self.assertEqual(Tarea.count_by_status(), {'completada': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
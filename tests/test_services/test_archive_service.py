@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.pedido_archivado_model import PedidoArchivado
+from services import archive_service
+
+
+class TestArchiveService(DatabaseTestCase):
+    """Tests del archivado de pedidos cerrados"""
+
+    CONFIG = {'ARCHIVE_PAUSE_SECONDS': 0}
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=100)
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+
+        antiguo = datetime.utcnow() - timedelta(days=400)
+        reciente = datetime.utcnow() - timedelta(days=5)
+        datos = [('entregado', antiguo)] * 3 + [('cancelado', antiguo), ('pendiente', antiguo),
+                                                 ('entregado', reciente)]
+        db.session.add_all(
+            Pedido(usuario_id=self.usuario.id, producto_id=self.producto.id, cantidad=1,
+                   precio_total=Decimal('10.00'), estado=estado, fecha_pedido=fecha)
+            for estado, fecha in datos
+        )
+        db.session.commit()
+
+    def test_archive_moves_only_old_closed_orders(self):
+        """Test: Solo se archivan pedidos cerrados más antiguos que el corte"""
+        total, mensaje = archive_service.archive_closed_orders(dias=180, tamano_lote=2)
+
+        self.assertEqual(total, 4)
+        self.assertEqual(Pedido.count_by_status(), 2)
+        self.assertEqual(PedidoArchivado.count(), 4)
+        self.assertEqual({p.estado for p in Pedido.get_all()}, {'pendiente', 'entregado'})
+
+    def test_queries_opt_in_to_archived_orders(self):
+        """Test: Las consultas incluyen el archivo solo si se pide"""
+        archive_service.archive_closed_orders(dias=180)
+
+        self.assertEqual(len(Pedido.get_by_status('entregado')), 1)
+        self.assertEqual(len(Pedido.get_by_status('entregado', include_archived=True)), 4)
+        self.assertEqual(len(Pedido.get_by_user(self.usuario.id)), 2)
+        self.assertEqual(len(Pedido.get_by_user(self.usuario.id, include_archived=True)), 6)
+        self.assertEqual(len(Pedido.get_orders_with_details(include_archived=True)), 6)
+        self.assertEqual(Pedido.count_by_status(include_archived=True), 6)
+        self.assertEqual(Pedido.total_revenue(include_archived=True), Decimal('60.00'))
+
+    def test_partition_ddl(self):
+        """Test: DDL de particionado por rango de fecha_pedido"""
+        ddl = archive_service.mysql_partition_ddl(2023, 2024)
+
+        self.assertIn("PARTITION BY RANGE (TO_DAYS(fecha_pedido))", ddl)
+        self.assertIn("PARTITION p2024 VALUES LESS THAN (TO_DAYS('2025-01-01'))", ddl)
+        self.assertIn("PARTITION pmax VALUES LESS THAN MAXVALUE", ddl)
+
+
+if __name__ == '__main__':
+    unittest.main()
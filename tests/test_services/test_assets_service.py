@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+import gzip
+import shutil
+import tempfile
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, url_for
+from services import assets_service
+
+
+class TestAssetsService(unittest.TestCase):
+    """Tests de los estáticos con huella de contenido"""
+
+    def setUp(self):
+        """Crear una carpeta static temporal con un CSS"""
+        self.static = tempfile.mkdtemp()
+        with open(os.path.join(self.static, 'style.css'), 'w') as f:
+            f.write('body { color: red; }\n' * 50)
+        self.app = Flask(__name__, static_folder=self.static, static_url_path='/static')
+        assets_service.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.static)
+
+    def test_url_for_uses_hashed_name(self):
+        """Test: url_for('static') devuelve el nombre con hash"""
+        with self.app.test_request_context():
+            url = url_for('static', filename='style.css')
+
+        self.assertRegex(url, r'^/static/dist/style\.[0-9a-f]{12}\.css$')
+
+    def test_serves_precompressed_with_immutable_cache(self):
+        """Test: Se sirve la variante gzip con caché inmutable"""
+        with self.app.test_request_context():
+            url = url_for('static', filename='style.css')
+
+        respuesta = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', respuesta.headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(respuesta.data), b'body { color: red; }\n' * 50)
+        respuesta.close()
+
+    def test_rebuild_changes_hash_when_content_changes(self):
+        """Test: Cambiar el contenido genera un nombre distinto"""
+        anterior = assets_service.build_assets(self.static)['style.css']
+        with open(os.path.join(self.static, 'style.css'), 'a') as f:
+            f.write('h1 { color: blue; }\n')
+
+        nuevo = assets_service.build_assets(self.static)['style.css']
+
+        self.assertNotEqual(anterior, nuevo)
+        self.assertNotIn('dist/manifest.json', assets_service.build_assets(self.static))
+
+
+if __name__ == '__main__':
+    unittest.main()
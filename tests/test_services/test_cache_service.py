@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.producto_model import Producto
+from services.cache_service import FragmentCache, table_version
+
+
+class TestFragmentCache(DatabaseTestCase):
+    """Tests de la caché de fragmentos y su invalidación"""
+
+    def setUp(self):
+        """Crear una caché pequeña sin caducidad"""
+        super().setUp()
+        self.cache = FragmentCache(max_entradas=2, ttl=0)
+        self.renders = 0
+
+    def _render(self):
+        self.renders += 1
+        return [p.nombre for p in Producto.get_all()]
+
+    def test_hit_until_table_changes(self):
+        """Test: Se reutiliza el fragmento hasta que cambia la tabla"""
+        self.cache.get_or_render('lista', ['productos'], {}, self._render)
+        self.cache.get_or_render('lista', ['productos'], {}, self._render)
+        self.assertEqual(self.renders, 1)
+
+        Producto.create_product('Nuevo', 5)
+        resultado = self.cache.get_or_render('lista', ['productos'], {}, self._render)
+
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(resultado, ['Nuevo'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_bulk_update_invalidates(self):
+        """Test: Un UPDATE masivo también invalida"""
+        Producto.create_product('Nuevo', 5)
+        version = table_version('productos')
+
+        Producto.query.update({Producto.precio: Decimal('7.00')})
+        db.session.commit()
+
+        self.assertGreater(table_version('productos'), version)
+
+    def test_rollback_does_not_invalidate(self):
+        """Test: Un rollback no cambia la versión"""
+        version = table_version('productos')
+
+        db.session.add(Producto(nombre='Temporal', precio=Decimal('1.00')))
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual(table_version('productos'), version)
+
+    def test_params_and_lru(self):
+        """Test: Los parámetros forman parte de la clave y se respeta el tamaño máximo"""
+        for q in ('a', 'b', 'c'):
+            self.cache.get_or_render('buscar', ['productos'], {'q': q}, self._render)
+        self.cache.get_or_render('buscar', ['productos'], {'q': 'a'}, self._render)
+
+        self.assertEqual(self.renders, 4)
+        self.assertEqual(self.cache.stats()['entradas'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import shutil
+import stat
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.producto_model import Producto
+from services import catalog_service
+from services.catalog_service import CatalogSnapshot, ProductoCatalogo
+
+
+class TestCatalogSnapshot(DatabaseTestCase):
+    """Tests de la instantánea del catálogo mapeada en memoria"""
+
+    def setUp(self):
+        """Instantánea en un directorio temporal y productos de ejemplo"""
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.ruta = os.path.join(directorio, 'catalogo.bin')
+        catalog_service.catalog_snapshot.configure({'CATALOG_SNAPSHOT_PATH': self.ruta})
+        self.addCleanup(catalog_service.catalog_snapshot.configure, {})
+        catalog_service.on_tables_changed(catalog_service._on_tables_changed)
+        self.catalogo = catalog_service.catalog_snapshot
+
+        self.teclado = Producto(nombre='Teclado', precio=Decimal('25.50'), stock=4,
+                                categoria='Periféricos')
+        self.raton = Producto(nombre='Ratón óptico', precio=Decimal('9.99'), stock=0,
+                              categoria='Periféricos')
+        self.libro = Producto(nombre='Libro', precio=Decimal('12.00'), stock=7)
+        db.session.add_all([self.teclado, self.raton, self.libro])
+        db.session.commit()
+
+    def test_lookup_by_id(self):
+        """Test: Se obtiene un producto por id con sus datos exactos"""
+        producto = self.catalogo.get(self.raton.id)
+
+        self.assertEqual(producto, ProductoCatalogo(self.raton.id, 'Ratón óptico',
+                                                    Decimal('9.99'), 0, 'Periféricos'))
+        self.assertIsNone(self.catalogo.get(9999))
+        self.assertIsNone(self.catalogo.get(-1))
+
+    def test_by_category_and_available(self):
+        """Test: Filtrar por categoría y por stock disponible"""
+        self.assertEqual([p.nombre for p in self.catalogo.by_category('Periféricos')],
+                         ['Teclado', 'Ratón óptico'])
+        self.assertEqual(self.catalogo.by_category('Otra'), [])
+        self.assertEqual([p.nombre for p in self.catalogo.available()], ['Teclado', 'Libro'])
+
+    def test_rebuilds_after_product_changes(self):
+        """Test: Un cambio de stock o un producto nuevo caduca la instantánea"""
+        self.catalogo.available()
+        reconstrucciones = self.catalogo.reconstrucciones
+
+        self.raton.increase_stock(3)
+        Producto.create_product('Monitor', 150, stock=2, categoria='Pantallas')
+
+        disponibles = {p.nombre: p.stock for p in self.catalogo.available()}
+        self.assertEqual(disponibles, {'Teclado': 4, 'Ratón óptico': 3, 'Libro': 7, 'Monitor': 2})
+        self.assertEqual(self.catalogo.reconstrucciones, reconstrucciones + 1)
+
+        # Sin cambios se reutiliza la misma instantánea
+        self.catalogo.get(self.libro.id)
+        self.assertEqual(self.catalogo.reconstrucciones, reconstrucciones + 1)
+
+    def test_shared_between_processes(self):
+        """Test: Otro proceso usa el mismo archivo y ve las invalidaciones"""
+        self.catalogo.available()
+        otro_proceso = CatalogSnapshot(self.ruta)
+
+        self.assertEqual(otro_proceso.get(self.libro.id).precio, Decimal('12.00'))
+        self.assertEqual(otro_proceso.reconstrucciones, 0)
+
+        self.teclado.reduce_stock(4)
+
+        self.assertEqual(otro_proceso.get(self.teclado.id).stock, 0)
+        self.assertEqual([p.nombre for p in self.catalogo.available()], ['Libro'])
+
+    def test_disabled_falls_back_to_database(self):
+        """Test: Deshabilitada, available() devuelve las filas de Producto"""
+        self.catalogo.habilitada = False
+        self.addCleanup(setattr, self.catalogo, 'habilitada', True)
+
+        productos = self.catalogo.available()
+
+        self.assertTrue(all(isinstance(p, Producto) for p in productos))
+        self.assertEqual(len(productos), 2)
+
+    def test_default_path_is_private(self):
+        """Test: Sin CATALOG_SNAPSHOT_PATH la instantánea va al directorio privado del usuario"""
+        temporal = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temporal)
+
+        with patch('tempfile.gettempdir', return_value=temporal):
+            ruta = CatalogSnapshot()._path()
+
+        directorio = os.path.join(temporal, f'flask-app-{os.getuid()}', 'catalogo')
+        self.assertEqual(ruta, os.path.join(directorio, 'catalogo.bin'))
+        self.assertEqual(stat.S_IMODE(os.stat(directorio).st_mode), 0o700)
+
+    def test_configured_path_in_planted_dir_is_rejected(self):
+        """Test: Una ruta configurada en un directorio que otros pueden escribir no se usa"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        os.chmod(directorio, 0o777)
+
+        with self.assertRaises(RuntimeError):
+            CatalogSnapshot().configure({'CATALOG_SNAPSHOT_PATH':
+                                         os.path.join(directorio, 'catalogo.bin')})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from services.dashboard_service import DashboardData
+
+
+class TestDashboardData(unittest.TestCase):
+    """Tests del cálculo en paralelo de las estadísticas del dashboard"""
+
+    def setUp(self):
+        """Aplicación mínima y un DashboardData propio para cada test"""
+        self.app = Flask(__name__)
+        ctx = self.app.app_context()
+        ctx.push()
+        self.addCleanup(ctx.pop)
+        self.dashboard = DashboardData()
+        self.dashboard.configure({'DASHBOARD_BUDGET_MS': 200, 'DASHBOARD_WORKERS': 3})
+        self.liberar = threading.Event()
+        self.addCleanup(self.liberar.set)
+
+    def _lento(self, valor):
+        def calcular():
+            self.liberar.wait(5)
+            return valor
+        return calcular
+
+    def test_groups_run_concurrently(self):
+        """Test: Tres grupos de 0,1 s tardan en total bastante menos que 0,3 s"""
+        def grupo(valor):
+            def calcular():
+                time.sleep(0.1)
+                return valor
+            return calcular
+
+        inicio = time.perf_counter()
+        resultado = self.dashboard.fetch({'a': grupo(1), 'b': grupo(2), 'c': grupo(3)})
+
+        self.assertLess(time.perf_counter() - inicio, 0.25)
+        self.assertEqual(resultado['datos'], {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(set(resultado['estado'].values()), {'ok'})
+
+    def test_slow_group_falls_back_to_stale_value(self):
+        """Test: Un grupo fuera de presupuesto devuelve el último valor conocido"""
+        self.dashboard.fetch({'pedidos': lambda: 10})
+
+        inicio = time.perf_counter()
+        resultado = self.dashboard.fetch({'pedidos': self._lento(20), 'usuarios': lambda: 5},
+                                         presupuesto=0.05)
+
+        self.assertLess(time.perf_counter() - inicio, 0.2)
+        self.assertEqual(resultado['datos'], {'pedidos': 10, 'usuarios': 5})
+        self.assertEqual(resultado['estado'], {'pedidos': 'stale', 'usuarios': 'ok'})
+        self.assertIn('pedidos', resultado['edad_s'])
+
+        # El cálculo sigue en segundo plano y sirve para la siguiente petición;
+        # mientras está en curso no se lanza otro igual
+        segundo = self.dashboard.fetch({'pedidos': lambda: 99}, presupuesto=0)
+        self.assertEqual(segundo['datos']['pedidos'], 10)
+        self.liberar.set()
+        tercero = self.dashboard.fetch({'pedidos': lambda: 30}, presupuesto=0.5)
+        self.assertIn(tercero['datos']['pedidos'], (20, 30))
+
+    def test_missing_and_failed_groups(self):
+        """Test: Sin valor anterior se indica sin_datos o error"""
+        def fallar():
+            raise RuntimeError('base caída')
+
+        resultado = self.dashboard.fetch({'lento': self._lento(1), 'roto': fallar},
+                                         presupuesto=0.05)
+
+        self.assertEqual(resultado['datos'], {'lento': None, 'roto': None})
+        self.assertEqual(resultado['estado'], {'lento': 'sin_datos', 'roto': 'error'})
+
+    def test_sequential_mode(self):
+        """Test: Con DASHBOARD_PARALLEL desactivado se calcula en el hilo de la petición"""
+        self.dashboard.configure({'DASHBOARD_PARALLEL': False})
+        hilos = []
+
+        resultado = self.dashboard.fetch({'a': lambda: hilos.append(threading.get_ident()) or 1})
+
+        self.assertEqual(resultado['datos'], {'a': 1})
+        self.assertEqual(hilos, [threading.get_ident()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import database_service
+
+
+class TestSqliteProfile(unittest.TestCase):
+    """Tests del perfil de rendimiento de SQLite"""
+
+    def setUp(self):
+        """Base SQLite en un directorio temporal"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.uri = f"sqlite:///{os.path.join(directorio, 'app.db')}"
+
+    def test_only_sqlite_files_are_tuned(self):
+        """Test: El perfil se aplica a archivos SQLite, no a memoria ni a MySQL"""
+        self.assertTrue(database_service.is_sqlite_file(self.uri))
+        self.assertFalse(database_service.is_sqlite_file('sqlite://'))
+        self.assertFalse(database_service.is_sqlite_file('sqlite:///:memory:'))
+        self.assertFalse(database_service.is_sqlite_file('mysql+pymysql://u:p@host/db'))
+
+        opciones = database_service.engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        self.assertEqual(opciones, {})
+
+    def test_engine_options_by_pool_mode(self):
+        """Test: QueuePool LIFO por defecto y una conexión por hilo con SQLITE_POOL=thread"""
+        config = {'SQLALCHEMY_DATABASE_URI': self.uri, 'SQLITE_POOL_SIZE': 4}
+
+        cola = database_service.engine_options(config)
+        self.assertIs(cola['poolclass'], QueuePool)
+        self.assertTrue(cola['pool_use_lifo'])
+        self.assertEqual(cola['pool_size'], 4)
+
+        por_hilo = database_service.engine_options(dict(config, SQLITE_POOL='thread'))
+        self.assertIs(por_hilo['poolclass'], SingletonThreadPool)
+
+        sin_perfil = database_service.engine_options(dict(config, SQLITE_TUNING=False))
+        self.assertEqual(sin_perfil, {})
+
+    def test_pragmas_applied_to_new_connections(self):
+        """Test: Cada conexión nueva se abre con los PRAGMAs del perfil"""
+        engine = create_engine(self.uri)
+        self.addCleanup(engine.dispose)
+        database_service.tune_engine(engine, {'SQLITE_MMAP_SIZE': 1048576,
+                                              'SQLITE_CACHE_SIZE': -2048,
+                                              'SQLITE_BUSY_TIMEOUT': 1234})
+
+        pragmas = database_service.current_pragmas(engine)
+
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['mmap_size'], 1048576)
+        self.assertEqual(pragmas['cache_size'], -2048)
+        self.assertEqual(pragmas['busy_timeout'], 1234)
+
+    def test_defaults_untouched_without_profile(self):
+        """Test: Sin el perfil SQLite conserva sus valores por defecto"""
+        engine = create_engine(self.uri)
+        self.addCleanup(engine.dispose)
+
+        pragmas = database_service.current_pragmas(engine)
+
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+        self.assertEqual(pragmas['synchronous'], 2)  # FULL
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from services import export_service
+
+
+class TestExportService(DatabaseTestCase):
+    """Tests de la exportación masiva de pedidos por meses"""
+
+    def setUp(self):
+        """Pedidos de ejemplo en dos meses y un directorio de salida temporal"""
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+        usuario = Usuario(nombre='Ana', email='ana@example.com')
+        producto = Producto(nombre='Teclado', precio=Decimal('20.00'), stock=100,
+                            categoria='Periféricos')
+        db.session.add_all([usuario, producto])
+        db.session.flush()
+        fechas = [datetime(2026, 1, dia) for dia in (3, 10, 20, 28)] + [datetime(2026, 2, 5)]
+        db.session.add_all(
+            Pedido(usuario_id=usuario.id, producto_id=producto.id, cantidad=1,
+                   precio_total=Decimal('20.00'), estado='entregado', fecha_pedido=fecha)
+            for fecha in fechas
+        )
+        db.session.commit()
+
+    def _read(self, mes):
+        with gzip.open(os.path.join(self.directorio, f'pedidos-{mes}.csv.gz'), 'rt') as archivo:
+            return list(csv.DictReader(archivo))
+
+    def test_export_by_month(self):
+        """Test: Cada mes va a su CSV comprimido con los datos de usuario y producto"""
+        resumen, _ = export_service.export_orders(self.directorio, tamano_lote=2)
+
+        self.assertEqual(resumen['meses'], 2)
+        self.assertEqual(resumen['filas'], 5)
+        enero = self._read('2026-01')
+        self.assertEqual(len(enero), 4)
+        self.assertEqual(enero[0]['usuario_email'], 'ana@example.com')
+        self.assertEqual(enero[0]['producto_categoria'], 'Periféricos')
+        self.assertEqual(len(self._read('2026-02')), 1)
+
+    def test_resume_after_interruption(self):
+        """Test: Tras una interrupción se recorta el lote a medias y no se repiten filas"""
+        escribir = export_service._CsvMonth.write_batch
+        llamadas = []
+
+        def fallar_en_el_tercer_lote(escritor, filas, cabecera=False):
+            llamadas.append(1)
+            if len(llamadas) == 4:  # cabecera + 2 lotes confirmados
+                escritor.archivo.write(b'lote a medias')
+                raise OSError('disco desconectado')
+            return escribir(escritor, filas, cabecera)
+
+        with patch.object(export_service._CsvMonth, 'write_batch', fallar_en_el_tercer_lote):
+            resumen, mensaje = export_service.export_orders(self.directorio, tamano_lote=1)
+        self.assertIsNone(resumen)
+
+        resumen, _ = export_service.export_orders(self.directorio, tamano_lote=1)
+
+        self.assertEqual(resumen['filas'], 3)  # 2 de enero + 1 de febrero
+        ids = [fila['id'] for fila in self._read('2026-01')]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+        # Una tercera ejecución no vuelve a exportar los meses terminados
+        resumen, _ = export_service.export_orders(self.directorio)
+        self.assertEqual((resumen['meses'], resumen['meses_omitidos']), (0, 2))
+
+    def test_month_range_and_format_check(self):
+        """Test: Se respetan los límites de meses y no se mezclan formatos en un directorio"""
+        resumen, _ = export_service.export_orders(self.directorio, desde='2026-02', hasta='2026-02')
+        self.assertEqual(resumen['filas'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.directorio, 'pedidos-2026-01.csv.gz')))
+
+        if export_service.pyarrow is not None:
+            resumen, mensaje = export_service.export_orders(self.directorio, formato='parquet')
+            self.assertIsNone(resumen)
+        self.assertIsNone(export_service.export_orders(self.directorio, desde='2026-13')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
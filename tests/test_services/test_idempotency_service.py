@@ -0,0 +1,153 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.clave_idempotencia_model import ClaveIdempotencia
+from services import idempotency_service
+
+
+class TestIdempotencyService(DatabaseTestCase):
+    """Tests de las claves de idempotencia en la creación de pedidos"""
+
+    CONFIG = {'ASYNC_ORDER_PROCESSING': False, 'IDEMPOTENCY_WAIT_SECONDS': 0}
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.producto = Producto(nombre='Producto Test', precio=Decimal('10.00'), stock=10)
+        db.session.add_all([self.usuario, self.producto])
+        db.session.commit()
+        self.ejecuciones = 0
+
+    def _crear(self, clave, cantidad=2):
+        def ejecutar(registro):
+            self.ejecuciones += 1
+            pedido, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, cantidad,
+                                                  clave_idempotencia=registro)
+            return {'exito': pedido is not None,
+                    'pedido_id': pedido.id if pedido else None,
+                    'mensaje': mensaje}
+
+        datos = {'usuario_id': self.usuario.id, 'producto_id': self.producto.id,
+                 'cantidad': cantidad}
+        return idempotency_service.run_once(clave, 'pedidos.crear', datos, ejecutar)
+
+    def test_repeated_key_returns_stored_result(self):
+        """Test: Repetir la clave devuelve el mismo pedido sin crear otro ni descontar stock"""
+        primero, situacion = self._crear('clave-1')
+        self.assertEqual(situacion, 'ejecutada')
+        self.assertTrue(primero['exito'])
+
+        repetido, situacion = self._crear('clave-1')
+
+        self.assertEqual(situacion, 'repetida')
+        self.assertEqual(repetido['pedido_id'], primero['pedido_id'])
+        self.assertEqual(self.ejecuciones, 1)
+        self.assertEqual(Pedido.query.count(), 1)
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 8)
+
+    def test_same_key_with_other_data_is_conflict(self):
+        """Test: Reutilizar la clave con otros datos se rechaza"""
+        self._crear('clave-1', cantidad=2)
+
+        resultado, situacion = self._crear('clave-1', cantidad=3)
+
+        self.assertIsNone(resultado)
+        self.assertEqual(situacion, 'conflicto')
+        self.assertEqual(self.ejecuciones, 1)
+
+    def test_failed_execution_releases_key(self):
+        """Test: Un pedido fallido no guarda resultado y la clave se puede reintentar"""
+        resultado, situacion = self._crear('clave-1', cantidad=50)
+        self.assertFalse(resultado['exito'])
+        self.assertIsNone(db.session.get(ClaveIdempotencia, 'clave-1'))
+
+        self.producto.increase_stock(50)
+        resultado, situacion = self._crear('clave-1', cantidad=50)
+
+        self.assertEqual(situacion, 'ejecutada')
+        self.assertTrue(resultado['exito'])
+        self.assertEqual(self.ejecuciones, 2)
+
+    def test_in_progress_duplicate_does_not_execute(self):
+        """Test: Con la clave en proceso en otra petición no se ejecuta de nuevo"""
+        ClaveIdempotencia.claim('clave-1', 'pedidos.crear',
+                                idempotency_service.fingerprint('pedidos.crear', {
+                                    'usuario_id': self.usuario.id,
+                                    'producto_id': self.producto.id,
+                                    'cantidad': 2}))
+
+        resultado, situacion = self._crear('clave-1')
+
+        self.assertIsNone(resultado)
+        self.assertEqual(situacion, 'en_proceso')
+        self.assertEqual(self.ejecuciones, 0)
+
+    def test_abandoned_key_is_taken_over(self):
+        """Test: Una clave en proceso más antigua que el lease se retoma"""
+        huella = idempotency_service.fingerprint('pedidos.crear', {
+            'usuario_id': self.usuario.id, 'producto_id': self.producto.id, 'cantidad': 2})
+        registro, _ = ClaveIdempotencia.claim('clave-1', 'pedidos.crear', huella)
+        registro.fecha_creacion = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+
+        resultado, situacion = self._crear('clave-1')
+
+        self.assertEqual(situacion, 'ejecutada')
+        self.assertTrue(resultado['exito'])
+
+    def test_expired_lease_cannot_record_result(self):
+        """Test: Tras perder la clave, el pedido de la petición anterior se deshace"""
+        huella = idempotency_service.fingerprint('pedidos.crear', {
+            'usuario_id': self.usuario.id, 'producto_id': self.producto.id, 'cantidad': 2})
+        registro, _ = ClaveIdempotencia.claim('clave-1', 'pedidos.crear', huella)
+        token = registro.token
+        # Otra petición retoma la clave tras el lease
+        ClaveIdempotencia.query.filter_by(clave='clave-1').update(
+            {'fecha_creacion': datetime.utcnow() - timedelta(minutes=5)})
+        db.session.commit()
+        nuevo, situacion = ClaveIdempotencia.claim('clave-1', 'pedidos.crear', huella)
+        self.assertEqual(situacion, 'nueva')
+        self.assertNotEqual(nuevo.token, token)
+        # La petición anterior conserva su copia con el token viejo
+        registro = ClaveIdempotencia(clave='clave-1', token=token)
+
+        pedido, mensaje = Pedido.create_order(self.usuario.id, self.producto.id, 2,
+                                              clave_idempotencia=registro)
+
+        self.assertIsNone(pedido)
+        self.assertIn('lease vencido', mensaje)
+        self.assertEqual(Pedido.query.count(), 0)
+        db.session.expire_all()
+        self.assertEqual(self.producto.stock, 10)
+        self.assertEqual(db.session.get(ClaveIdempotencia, 'clave-1').estado, 'en_proceso')
+
+    def test_expired_keys_are_reusable_and_purged(self):
+        """Test: Las claves caducadas se pueden reutilizar y se purgan"""
+        self._crear('clave-1')
+        self._crear('clave-2')
+        db.session.query(ClaveIdempotencia).update(
+            {'expira_en': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+        resultado, situacion = self._crear('clave-1')
+        self.assertEqual(situacion, 'ejecutada')
+
+        self.assertEqual(ClaveIdempotencia.purge_expired(), 1)
+        self.assertIsNone(db.session.get(ClaveIdempotencia, 'clave-2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import cProfile
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify, render_template_string
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.producto_model import Producto
+from services import profiling_service
+
+
+class TestProfilingService(DatabaseTestCase):
+    """Tests del perfilado de peticiones bajo demanda"""
+
+    CONFIG = {'PROFILING_ENABLED': True, 'PROFILING_SECRET': 'secreto'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        profiling_service.init_app(cls.app)
+
+        @cls.app.route('/lista')
+        def lista():
+            productos = Producto.get_all()
+            html = render_template_string(
+                '{% for p in productos %}<li>{{ p.nombre }}</li>{% endfor %}', productos=productos
+            )
+            return jsonify({'html': html, 'productos': [p.to_dict() for p in productos]})
+
+    def setUp(self):
+        """Directorio temporal de perfiles y productos de ejemplo"""
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        self.app.config['PROFILING_DIR'] = self.directorio
+        self.app.config['PROFILING_SAMPLE_RATE'] = 0.0
+        db.session.add_all([Producto(nombre=f'Producto {i}', precio=Decimal('1.00'), stock=i)
+                            for i in range(5)])
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def test_signed_header_profiles_request(self):
+        """Test: Una petición con la cabecera firmada guarda su perfil y el desglose"""
+        firma = profiling_service.sign('/lista', 'secreto')
+
+        respuesta = self.client.get('/lista', headers={'X-Profile': firma})
+
+        self.assertEqual(respuesta.status_code, 200)
+        perfiles = profiling_service.list_profiles(self.directorio)
+        self.assertEqual(len(perfiles), 1)
+        perfil = perfiles[0]
+        self.assertEqual(perfil['nombre'], respuesta.headers['X-Profile-Id'])
+        self.assertEqual(perfil['motivo'], 'cabecera')
+        self.assertGreaterEqual(perfil['consultas'], 1)
+        self.assertEqual(set(perfil['fases_ms']), {'db', 'orm', 'render', 'serialize', 'otros'})
+        self.assertGreater(perfil['fases_ms']['render'], 0)
+        self.assertTrue(os.path.exists(os.path.join(self.directorio, perfil['nombre'] + '.prof')))
+        self.assertIn('function calls',
+                      profiling_service.top_functions(self.directorio, perfil['nombre'], 5))
+
+    def test_invalid_or_expired_signature_is_ignored(self):
+        """Test: Una firma inválida, de otra ruta o caducada no activa el perfilado"""
+        caducada = profiling_service.sign('/lista', 'secreto', time.time() - 3600)
+        for valor in ['basura', profiling_service.sign('/otra', 'secreto'),
+                      profiling_service.sign('/lista', 'otro-secreto'), caducada]:
+            respuesta = self.client.get('/lista', headers={'X-Profile': valor})
+            self.assertNotIn('X-Profile-Id', respuesta.headers)
+
+        self.assertEqual(profiling_service.list_profiles(self.directorio), [])
+
+    def test_header_ignored_without_profiling_secret(self):
+        """Test: Sin PROFILING_SECRET una firma con SECRET_KEY no activa el perfilado"""
+        secret_key = self.app.config.get('SECRET_KEY')
+        self.app.config.update({'PROFILING_SECRET': None, 'SECRET_KEY': 'clave-por-defecto'})
+        self.addCleanup(self.app.config.update,
+                        {'PROFILING_SECRET': 'secreto', 'SECRET_KEY': secret_key})
+        firma = profiling_service.sign('/lista', 'clave-por-defecto')
+
+        respuesta = self.client.get('/lista', headers={'X-Profile': firma})
+
+        self.assertNotIn('X-Profile-Id', respuesta.headers)
+        self.assertEqual(profiling_service.list_profiles(self.directorio), [])
+
+    def test_planted_profiles_dir_is_rejected(self):
+        """Test: Un PROFILING_DIR en el que otros pueden escribir no se usa"""
+        os.chmod(self.directorio, 0o777)
+
+        with self.assertRaises(RuntimeError):
+            profiling_service.profiles_dir(self.app.config)
+
+    def test_sampling_profiles_requests(self):
+        """Test: Con muestreo se perfilan peticiones sin cabecera"""
+        self.app.config['PROFILING_SAMPLE_RATE'] = 1.0
+
+        self.client.get('/lista')
+
+        perfiles = profiling_service.list_profiles(self.directorio)
+        self.assertEqual([p['motivo'] for p in perfiles], ['muestreo'])
+
+    def test_only_one_request_profiled_at_a_time(self):
+        """Test: Con otra petición perfilándose, la petición se atiende sin perfil"""
+        self.app.config['PROFILING_SAMPLE_RATE'] = 1.0
+        self.assertTrue(profiling_service._perfilando.acquire(blocking=False))
+        try:
+            respuesta = self.client.get('/lista')
+        finally:
+            profiling_service._perfilando.release()
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('X-Profile-Id', respuesta.headers)
+        self.assertIn('X-Profile-Id', self.client.get('/lista').headers)
+
+    def test_profiler_error_does_not_fail_request(self):
+        """Test: Si el perfilador no puede activarse la petición se atiende igual"""
+        self.app.config['PROFILING_SAMPLE_RATE'] = 1.0
+
+        with patch.object(cProfile.Profile, 'enable',
+                          side_effect=ValueError('Another profiling tool is already active')):
+            respuesta = self.client.get('/lista')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('X-Profile-Id', respuesta.headers)
+        # El bloqueo se liberó: la siguiente petición sí se perfila
+        self.assertIn('X-Profile-Id', self.client.get('/lista').headers)
+
+    def test_disabled_does_not_profile(self):
+        """Test: Sin PROFILING_ENABLED no se perfila aunque la firma sea válida"""
+        self.app.config['PROFILING_ENABLED'] = False
+        self.addCleanup(self.app.config.update, {'PROFILING_ENABLED': True})
+
+        self.client.get('/lista', headers={'X-Profile': profiling_service.sign('/lista', 'secreto')})
+
+        self.assertEqual(profiling_service.list_profiles(self.directorio), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Blueprint, Flask
+from services.ratelimit_service import AdmissionControl, MemoryStore, SQLiteStore
+
+
+class TestTokenBucketStores(unittest.TestCase):
+    """Tests de los almacenes de token buckets"""
+
+    def _check_refill(self, store):
+        # Ráfaga de 2 y 1 token por segundo
+        self.assertEqual(store.consume('c', 1, 2, ahora=100)[0], True)
+        self.assertEqual(store.consume('c', 1, 2, ahora=100)[0], True)
+        permitido, espera = store.consume('c', 1, 2, ahora=100)
+        self.assertFalse(permitido)
+        self.assertAlmostEqual(espera, 1.0)
+        self.assertTrue(store.consume('c', 1, 2, ahora=101)[0])
+        self.assertTrue(store.consume('otro', 1, 2, ahora=101)[0])
+
+    def test_memory_store(self):
+        """Test: El bucket en memoria se vacía y se rellena con el tiempo"""
+        self._check_refill(MemoryStore())
+
+    def test_sqlite_store_is_shared(self):
+        """Test: Dos instancias sobre el mismo archivo comparten los buckets"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'buckets.db')
+            self._check_refill(SQLiteStore(ruta))
+            self.assertFalse(SQLiteStore(ruta).consume('c', 1, 2, ahora=101)[0])
+
+    def test_sqlite_store_rejects_planted_dir(self):
+        """Test: El archivo de buckets no se usa en un directorio que otros pueden escribir"""
+        with tempfile.TemporaryDirectory() as directorio:
+            os.chmod(directorio, 0o777)
+            control = AdmissionControl()
+
+            with self.assertRaises(RuntimeError):
+                control.configure({'RATE_LIMIT_STORE': 'sqlite',
+                                   'RATE_LIMIT_STORE_PATH': os.path.join(directorio, 'b.db')})
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Tests del filtro de escrituras sobre un blueprint"""
+
+    def setUp(self):
+        """Crear una aplicación con un blueprint `main` de prueba"""
+        self.app = Flask(__name__)
+        self.app.config.update(RATE_LIMIT_CLIENT_RATE=0.001, RATE_LIMIT_CLIENT_BURST=2,
+                               RATE_LIMIT_GLOBAL_RATE=0.001, RATE_LIMIT_GLOBAL_BURST=3,
+                               RATE_LIMIT_CLIENT_HEADER='X-Client-Id')
+        self.control = AdmissionControl()
+        self.control.configure(self.app.config)
+        self.app.before_request(self.control.admit)
+
+        main = Blueprint('main', __name__)
+        main.add_url_rule('/nuevo', 'nuevo', lambda: 'ok', methods=['GET', 'POST'])
+        self.app.register_blueprint(main)
+        self.client = self.app.test_client()
+
+    def test_client_bucket_returns_429(self):
+        """Test: Se rechaza al cliente que agota su ráfaga, con Retry-After"""
+        cabeceras = {'X-Client-Id': 'a'}
+        self.assertEqual(self.client.post('/nuevo', headers=cabeceras).status_code, 200)
+        self.assertEqual(self.client.post('/nuevo', headers=cabeceras).status_code, 200)
+
+        respuesta = self.client.post('/nuevo', headers=cabeceras)
+
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertGreaterEqual(int(respuesta.headers['Retry-After']), 1)
+        self.assertEqual(self.client.get('/nuevo', headers=cabeceras).status_code, 200)
+        self.assertEqual(self.control.stats()['rechazadas_cliente'], 1)
+
+    def test_global_bucket_limits_all_clients(self):
+        """Test: El bucket global limita la suma de todos los clientes"""
+        codigos = [self.client.post('/nuevo', headers={'X-Client-Id': str(i)}).status_code
+                   for i in range(4)]
+
+        self.assertEqual(codigos, [200, 200, 200, 429])
+        self.assertEqual(self.control.stats(),
+                         {'admitidas': 3, 'rechazadas_cliente': 0, 'rechazadas_global': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
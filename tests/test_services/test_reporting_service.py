@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.database import DatabaseTestCase
+from models import db
+from models.usuario_model import Usuario
+from models.producto_model import Producto
+from models.pedido_model import Pedido
+from models.evento_pedido_model import EventoPedido
+from models.reporte_model import ResumenVentasProducto, ResumenVentasCategoria, ResumenPedidosEstado
+from services import reporting_service
+
+
+class TestReportingService(DatabaseTestCase):
+    """Tests de los resúmenes de ventas incrementales"""
+
+    def setUp(self):
+        """Crear datos de ejemplo dentro de la transacción del test"""
+        super().setUp()
+
+        self.usuario = Usuario(nombre='Usuario Test', email='test@example.com')
+        self.libro = Producto(nombre='Libro', precio=Decimal('12.50'), stock=100, categoria='Libros')
+        self.lapiz = Producto(nombre='Lápiz', precio=Decimal('1.20'), stock=100)
+        db.session.add_all([self.usuario, self.libro, self.lapiz])
+        db.session.commit()
+
+    def _rollups(self):
+        """Leer los resúmenes con el mismo formato que la agregación directa"""
+        productos = {
+            (f.fecha, f.producto_id): (f.pedidos, f.unidades, f.ingresos)
+            for f in ResumenVentasProducto.query.all() if f.pedidos
+        }
+        categorias = {
+            (f.fecha, f.categoria): (f.pedidos, f.unidades, f.ingresos)
+            for f in ResumenVentasCategoria.query.all() if f.pedidos
+        }
+        estados = {
+            f.estado: (f.pedidos, f.importe)
+            for f in ResumenPedidosEstado.query.all() if f.pedidos
+        }
+        return productos, categorias, estados
+
+    def _raw(self):
+        return (reporting_service.raw_sales_by_product(),
+                reporting_service.raw_sales_by_category(),
+                reporting_service.raw_orders_by_status())
+
+    def test_incremental_refresh_matches_raw_aggregation(self):
+        """Test: Los resúmenes incrementales coinciden con la agregación directa"""
+        # Pedidos anteriores a la primera reconstrucción
+        antiguo, _ = Pedido.create_order(self.usuario.id, self.libro.id, 2)
+        antiguo.update(fecha_pedido=datetime.utcnow() - timedelta(days=3))
+        success, mensaje = reporting_service.rebuild_rollups()
+        self.assertTrue(success)
+        self.assertEqual(self._rollups(), self._raw())
+
+        # Cambios posteriores que se acumulan de forma incremental
+        pedidos = [Pedido.create_order(self.usuario.id, producto.id, cantidad)[0]
+                   for producto, cantidad in ((self.libro, 1), (self.lapiz, 5), (self.lapiz, 3))]
+        pedidos[0].update_status('procesando')
+        pedidos[1].cancel_order()
+        antiguo.cancel_order()
+        Pedido.bulk_update_status('procesando', pedido_ids=[pedidos[2].id])
+        Pedido.bulk_update_status('enviado', pedido_ids=[pedidos[0].id, pedidos[2].id])
+        Pedido.bulk_cancel(pedido_ids=[pedidos[2].id])
+
+        procesados, mensaje = reporting_service.refresh_rollups(tamano_lote=2)
+
+        self.assertGreater(procesados, 0)
+        self.assertEqual(self._rollups(), self._raw())
+
+        # Una segunda pasada sin eventos nuevos no cambia nada
+        procesados, mensaje = reporting_service.refresh_rollups()
+        self.assertEqual(procesados, 0)
+        self.assertEqual(self._rollups(), self._raw())
+
+    def _hide_event(self, evento_id, nuevo_id):
+        """Cambiar el id de un evento, como si su transacción no se hubiera confirmado"""
+        db.session.query(EventoPedido).filter_by(id=evento_id).update({'id': nuevo_id})
+        db.session.commit()
+        db.session.expire_all()
+
+    def test_refresh_does_not_skip_late_commits(self):
+        """Test: Un evento confirmado después de otro con id mayor se acumula igualmente"""
+        reporting_service.rebuild_rollups()
+        for producto in (self.libro, self.lapiz, self.libro):
+            Pedido.create_order(self.usuario.id, producto.id, 1)
+        primero, segundo, tercero = [e.id for e in EventoPedido.get_since(0)]
+
+        # El segundo evento aún no es visible: ni refresh ni rebuild pasan por encima
+        self._hide_event(segundo, 1000)
+        procesados, mensaje = reporting_service.refresh_rollups()
+        self.assertEqual(procesados, 1)
+        self.assertFalse(reporting_service.rebuild_rollups()[0])
+
+        self._hide_event(1000, segundo)
+        procesados, mensaje = reporting_service.refresh_rollups()
+
+        self.assertEqual(procesados, 2)
+        self.assertEqual(self._rollups(), self._raw())
+
+    def test_sales_report_groupings(self):
+        """Test: Reporte de ventas agrupado por producto, categoría y semana"""
+        Pedido.create_order(self.usuario.id, self.libro.id, 2)
+        Pedido.create_order(self.usuario.id, self.lapiz.id, 10)
+        reporting_service.refresh_rollups()
+
+        por_producto = {f['clave']: f for f in reporting_service.sales_report('producto')}
+        self.assertEqual(por_producto[self.libro.id]['ingresos'], 25.0)
+        self.assertEqual(por_producto[self.lapiz.id]['unidades'], 10)
+
+        por_categoria = {f['clave']: f['ingresos'] for f in reporting_service.sales_report('categoria')}
+        self.assertEqual(por_categoria, {'Libros': 25.0, reporting_service.SIN_CATEGORIA: 12.0})
+
+        semanas = reporting_service.sales_report('semana')
+        self.assertEqual(len(semanas), 1)
+        self.assertEqual(semanas[0]['pedidos'], 2)
+
+        with self.assertRaises(ValueError):
+            reporting_service.sales_report('mes')
+
+
+if __name__ == '__main__':
+    unittest.main()
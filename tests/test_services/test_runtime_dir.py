@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import shutil
+import stat
+import tempfile
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from services import cache_service
+from services.runtime_dir import private_dir
+
+
+class TestPrivateDir(unittest.TestCase):
+    """Tests de los directorios de trabajo privados"""
+
+    def setUp(self):
+        self.temporal = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temporal)
+
+    def test_default_dir_is_private_per_user(self):
+        """Test: Sin ruta se crea un directorio 0700 propio del usuario"""
+        with patch('tempfile.gettempdir', return_value=self.temporal):
+            ruta = private_dir('cache')
+
+        self.assertEqual(ruta, os.path.join(self.temporal, f'flask-app-{os.getuid()}', 'cache'))
+        for directorio in (ruta, os.path.dirname(ruta)):
+            self.assertEqual(stat.S_IMODE(os.stat(directorio).st_mode), 0o700)
+
+    def test_rejects_dir_writable_by_others(self):
+        """Test: Un directorio existente en el que otros pueden escribir no se usa"""
+        ruta = os.path.join(self.temporal, 'plantado')
+        os.mkdir(ruta)
+        os.chmod(ruta, 0o777)
+
+        with self.assertRaises(RuntimeError):
+            private_dir('cache', ruta)
+
+    def test_rejects_dir_of_another_user(self):
+        """Test: Un directorio de otro usuario no se usa"""
+        ruta = os.path.join(self.temporal, 'ajeno')
+        os.mkdir(ruta, 0o700)
+
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(RuntimeError):
+                private_dir('cache', ruta)
+
+    def test_jinja_cache_rejects_planted_dir(self):
+        """Test: La caché de bytecode no usa un directorio configurado inseguro"""
+        ruta = os.path.join(self.temporal, 'jinja')
+        os.mkdir(ruta)
+        os.chmod(ruta, 0o777)
+        app = Flask(__name__)
+        app.config['JINJA_BYTECODE_CACHE_DIR'] = ruta
+
+        with self.assertRaises(RuntimeError):
+            cache_service.init_app(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
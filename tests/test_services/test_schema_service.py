@@ -0,0 +1,110 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import (Column, DateTime, ForeignKey, Integer, MetaData, Numeric, String, Table,
+                        Text, create_engine, insert, inspect, select)
+from sqlalchemy.orm import Session
+
+from models import db
+import models.models  # registrar todas las tablas
+from models.pedido_model import Pedido
+from models.producto_model import Producto
+from services import schema_service
+
+
+def _baseline_metadata():
+    """Tablas usuarios, productos y pedidos tal como se desplegaron al principio"""
+    metadata = MetaData()
+    Table('usuarios', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nombre', String(100), nullable=False),
+          Column('email', String(120), unique=True, nullable=False),
+          Column('telefono', String(20)),
+          Column('fecha_registro', DateTime))
+    Table('productos', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nombre', String(100), nullable=False),
+          Column('descripcion', Text),
+          Column('precio', Numeric(10, 2), nullable=False),
+          Column('stock', Integer),
+          Column('categoria', String(50)),
+          Column('fecha_creacion', DateTime))
+    Table('pedidos', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('usuario_id', Integer, ForeignKey('usuarios.id'), nullable=False),
+          Column('producto_id', Integer, ForeignKey('productos.id'), nullable=False),
+          Column('cantidad', Integer, nullable=False),
+          Column('precio_total', Numeric(10, 2), nullable=False),
+          Column('estado', String(20)),
+          Column('fecha_pedido', DateTime))
+    return metadata
+
+
+class TestSchemaService(unittest.TestCase):
+    """Tests de la actualización del esquema de tablas ya desplegadas"""
+
+    def setUp(self):
+        """Base SQLite en archivo con el esquema original y una fila por tabla"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.engine = create_engine(f"sqlite:///{os.path.join(directorio, 'app.db')}")
+        self.addCleanup(self.engine.dispose)
+        baseline = _baseline_metadata()
+        baseline.create_all(self.engine)
+        tablas = baseline.tables
+        with self.engine.begin() as conexion:
+            conexion.execute(insert(tablas['usuarios']).values(id=1, nombre='Ana',
+                                                               email='ana@example.com'))
+            conexion.execute(insert(tablas['productos']).values(id=1, nombre='Teclado',
+                                                                precio=Decimal('10.00'), stock=5))
+            conexion.execute(insert(tablas['pedidos']).values(
+                id=1, usuario_id=1, producto_id=1, cantidad=1,
+                precio_total=Decimal('10.00'), estado='pendiente'))
+
+    def test_pending_changes_on_baseline_schema(self):
+        """Test: Sobre el esquema original faltan `version` y el índice de estado"""
+        sentencias = schema_service.pending_changes(self.engine, db.metadata)
+
+        self.assertIn("ALTER TABLE pedidos ADD COLUMN version INTEGER DEFAULT '1' NOT NULL",
+                      sentencias)
+        self.assertIn("ALTER TABLE productos ADD COLUMN version INTEGER DEFAULT '1' NOT NULL",
+                      sentencias)
+        self.assertIn("CREATE INDEX ix_pedidos_estado_fecha ON pedidos (estado, fecha_pedido)",
+                      sentencias)
+        # Las tablas que no existen las crea create_all, no la actualización
+        self.assertFalse(any('tareas' in sentencia for sentencia in sentencias))
+
+    def test_upgrade_makes_existing_rows_usable(self):
+        """Test: Tras actualizar, el ORM lee y modifica las filas existentes"""
+        schema_service.upgrade(self.engine, db.metadata)
+        db.metadata.create_all(self.engine)
+
+        self.assertEqual(schema_service.pending_changes(self.engine, db.metadata), [])
+        indices = {i['name'] for i in inspect(self.engine).get_indexes('pedidos')}
+        self.assertIn('ix_pedidos_estado_fecha', indices)
+        with Session(self.engine) as sesion:
+            pedido = sesion.scalars(select(Pedido)).one()
+            producto = sesion.scalars(select(Producto)).one()
+            self.assertEqual((pedido.version, producto.version), (1, 1))
+            pedido.estado = 'procesando'
+            sesion.commit()
+            self.assertEqual(pedido.version, 2)
+
+    def test_column_without_default_is_rejected(self):
+        """Test: Una columna NOT NULL sin valor por defecto no se añade a ciegas"""
+        metadata = _baseline_metadata()
+        metadata.tables['productos'].append_column(Column('obligatoria', Integer, nullable=False))
+
+        with self.assertRaises(RuntimeError):
+            schema_service.pending_changes(self.engine, metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+import signal
+import socket
+import threading
+import time
+import urllib.request
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from tests.database import create_test_app
+from services.server_service import PooledWSGIServer, RequestCounter, _run_worker, run_benchmark
+
+
+def _slow_app(espera):
+    app = Flask(__name__)
+
+    @app.route('/')
+    def index():
+        time.sleep(espera)
+        return 'ok'
+
+    return app
+
+
+class TestServerService(unittest.TestCase):
+    """Tests del servidor multiproceso y del benchmark"""
+
+    def _serve(self, app, threads):
+        servidor = PooledWSGIServer('127.0.0.1', 0, app, threads=threads)
+        hilo = threading.Thread(target=servidor.serve_forever, kwargs={'poll_interval': 0.05},
+                                daemon=True)
+        hilo.start()
+
+        def cerrar():
+            servidor.shutdown()
+            servidor.close()
+        self.addCleanup(cerrar)
+        return f"http://127.0.0.1:{servidor.server_port}/"
+
+    def test_request_counter_fires_once_at_limit(self):
+        """Test: El reciclado se pide una sola vez, al llegar al límite"""
+        avisos = []
+        contador = RequestCounter(lambda environ, start_response: [b'ok'], 3,
+                                  lambda: avisos.append(True))
+
+        for _ in range(5):
+            contador({}, None)
+
+        self.assertEqual(contador.atendidas, 5)
+        self.assertEqual(avisos, [True])
+
+    def test_pooled_server_handles_requests_concurrently(self):
+        """Test: Con varios hilos las peticiones lentas se atienden a la vez"""
+        url = self._serve(_slow_app(0.2), threads=4)
+
+        resultado = run_benchmark(url, total=4, concurrencia=4)
+
+        self.assertEqual(resultado['errores'], 0)
+        self.assertLess(resultado['segundos'], 0.6)
+
+    def test_benchmark_counts_errors(self):
+        """Test: El benchmark cuenta las peticiones fallidas y mide las correctas"""
+        url = self._serve(_slow_app(0), threads=2)
+
+        correcto = run_benchmark(url, total=20, concurrencia=4)
+        fallido = run_benchmark(url + 'no-existe', total=5, concurrencia=2)
+
+        self.assertEqual(correcto['errores'], 0)
+        self.assertGreater(correcto['rps'], 0)
+        self.assertGreaterEqual(correcto['p99_ms'], correcto['p50_ms'])
+        self.assertEqual(fallido['errores'], 5)
+
+    def test_worker_stops_after_max_requests(self):
+        """Test: Un proceso hijo termina al atender max_requests peticiones"""
+        app = create_test_app()
+        app.add_url_rule('/', 'index', lambda: 'ok')
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(16)
+        self.addCleanup(sock.close)
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+        for senal in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            self.addCleanup(signal.signal, senal, signal.getsignal(senal))
+
+        respuestas = []
+
+        def peticiones():
+            for _ in range(2):
+                with urllib.request.urlopen(url, timeout=5) as respuesta:
+                    respuestas.append(respuesta.read())
+        cliente = threading.Thread(target=peticiones, daemon=True)
+        cliente.start()
+
+        # Bloquea hasta que el contador de peticiones detiene el servidor
+        _run_worker(app, '127.0.0.1', 0, sock.fileno(), threads=1, max_requests=2)
+        cliente.join(5)
+
+        self.assertEqual(respuestas, [b'ok', b'ok'])
+
+
+if __name__ == '__main__':
+    unittest.main()
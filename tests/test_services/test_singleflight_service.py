@@ -0,0 +1,173 @@
+import unittest
+import sys
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markupsafe import Markup
+from services.singleflight_service import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests de la coalescencia de lecturas simultáneas"""
+
+    def setUp(self):
+        """Crear una instancia propia y un cálculo que espera a una señal"""
+        self.flight = SingleFlight(timeout=2.0)
+        self.liberar = threading.Event()
+        self.llamadas = 0
+
+    def _lento(self):
+        self.llamadas += 1
+        self.liberar.wait(2)
+        return ['producto']
+
+    def _run_concurrently(self, flight, n, funcion):
+        resultados = []
+        hilos = [threading.Thread(target=lambda: resultados.append(flight.do('clave', funcion)))
+                 for _ in range(n)]
+        for hilo in hilos:
+            hilo.start()
+        return hilos, resultados
+
+    def _wait_for_waiters(self, flight, n):
+        # Dar tiempo a que todos los hilos lleguen a esperar al líder
+        limite = time.monotonic() + 2
+        while flight.stats()['en_curso'] == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+    def test_concurrent_calls_share_one_computation(self):
+        """Test: Las llamadas simultáneas con la misma clave comparten un solo cálculo"""
+        hilos, resultados = self._run_concurrently(self.flight, 10, self._lento)
+        self._wait_for_waiters(self.flight, 10)
+        self.liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(resultados, [['producto']] * 10)
+        stats = self.flight.stats()
+        self.assertEqual(stats['calculos'], 1)
+        self.assertEqual(stats['coalescidas'], 9)
+        self.assertEqual(stats['en_curso'], 0)
+
+    def test_sequential_calls_are_not_shared(self):
+        """Test: Sin concurrencia cada llamada calcula su propio resultado"""
+        self.flight.do('clave', lambda: 1)
+        self.flight.do('clave', lambda: 2)
+
+        self.assertEqual(self.flight.do('clave', lambda: 3), 3)
+        self.assertEqual(self.flight.stats()['calculos'], 3)
+
+    def test_waiter_timeout_computes_itself(self):
+        """Test: Quien espera más del timeout calcula el resultado por su cuenta"""
+        self.flight.timeout = 0.05
+        hilos, resultados = self._run_concurrently(self.flight, 1, self._lento)
+        self._wait_for_waiters(self.flight, 1)
+
+        resultado = self.flight.do('clave', lambda: ['propio'])
+        self.liberar.set()
+        hilos[0].join()
+
+        self.assertEqual(resultado, ['propio'])
+        self.assertEqual(self.flight.stats()['timeouts'], 1)
+
+    def test_errors_are_shared_with_waiters(self):
+        """Test: Un error del cálculo llega a todas las llamadas que esperaban"""
+        def falla():
+            self.liberar.wait(2)
+            raise ValueError('fallo')
+
+        errores = []
+
+        def llamar():
+            try:
+                self.flight.do('clave', falla)
+            except ValueError as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=llamar) for _ in range(3)]
+        for hilo in hilos:
+            hilo.start()
+        self._wait_for_waiters(self.flight, 3)
+        self.liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(errores), 3)
+        self.assertEqual(self.flight.stats()['errores'], 1)
+
+    def test_shared_result_across_processes(self):
+        """Test: Con el modo compartido otro proceso reutiliza el resultado del que calculó"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        # Dos instancias simulan dos procesos del servidor
+        proceso_a = SingleFlight(timeout=2.0, compartido=True, directorio=directorio)
+        proceso_b = SingleFlight(timeout=2.0, compartido=True, directorio=directorio)
+
+        hilos, _ = self._run_concurrently(proceso_a, 1, self._lento)
+        self._wait_for_waiters(proceso_a, 1)
+        hilo_b, resultados_b = self._run_concurrently(proceso_b, 1, lambda: ['de b'])
+        time.sleep(0.05)
+        self.liberar.set()
+        for hilo in hilos + hilo_b:
+            hilo.join()
+
+        self.assertEqual(resultados_b, [['producto']])
+        self.assertEqual(proceso_b.stats()['coalescidas_procesos'], 1)
+        self.assertEqual(proceso_b.stats()['calculos'], 0)
+
+        # Un resultado anterior a la llamada no se reutiliza
+        self.assertEqual(proceso_b.do('clave', lambda: ['nuevo']), ['nuevo'])
+
+    def test_shared_result_is_json_and_keeps_markup(self):
+        """Test: El resultado compartido se guarda como JSON y conserva el HTML seguro"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        flight = SingleFlight(compartido=True, directorio=directorio)
+        valor = {'html': Markup('<td>a</td>'), 'total': 1}
+        flight.do('clave', lambda: valor)
+
+        _, ruta = flight._rutas('clave')
+        with open(ruta, encoding='utf-8') as archivo:
+            self.assertIn('<td>a</td>', archivo.read())
+        leido = flight._read_result(ruta, 0)[0]
+        self.assertEqual(leido, valor)
+        self.assertIsInstance(leido['html'], Markup)
+
+    def test_shared_mode_uses_private_dir(self):
+        """Test: Sin SINGLEFLIGHT_DIR se usa el directorio privado del usuario"""
+        temporal = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temporal)
+        flight = SingleFlight(compartido=True)
+
+        with patch('tempfile.gettempdir', return_value=temporal):
+            self.assertEqual(flight.do('clave', lambda: 1), 1)
+            ruta_lock, _ = flight._rutas('clave')
+
+        directorio = os.path.dirname(ruta_lock)
+        self.assertEqual(directorio, os.path.join(temporal, f'flask-app-{os.getuid()}',
+                                                  'singleflight'))
+        self.assertEqual(stat.S_IMODE(os.stat(directorio).st_mode), 0o700)
+
+    def test_shared_mode_rejects_planted_dir(self):
+        """Test: Un SINGLEFLIGHT_DIR en el que otros pueden escribir no se usa"""
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        os.chmod(directorio, 0o777)
+        flight = SingleFlight(compartido=True, directorio=directorio)
+
+        with self.assertRaises(RuntimeError):
+            flight.do('clave', lambda: 1)
+
+
+if __name__ == '__main__':
+    unittest.main()